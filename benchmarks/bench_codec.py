@@ -0,0 +1,68 @@
+""" Microbenchmark of the CPU spent decoding the recorded responses of a status poll, and encoding its payloads """
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import json
+import timeit
+
+from lavviebot.codec import JsonCodec, MsgspecCodec, OrjsonCodec, StdlibJsonCodec
+from lavviebot.exceptions import LavviebotError
+
+NUMBER = 2_000
+FIXTURES = Path(__file__).parent / 'fixtures'
+# Responses of a status poll of an account with a litter box, a LavvieScanner, a LavvieTAG, two cats and the Unknown cat
+POLL = [
+    'GetLavviebotDetails', 'GetIotPoopRecord', 'GetIotErrorLog', 'GetLavvieScannerDetails',
+    'GetLavvieTagDetails', 'GetUnknownPoopData', 'GetCatHealthInfo', 'GetCatHealthInfo',
+]
+VARIABLES = {"petId": 7, "days": "days", "weight": "weight", "poopCount": "poopCount", "poopDuration": "duration"}
+
+
+class ResponseJson(JsonCodec):
+    """ Decoding as it was: aiohttp's resp.json() decodes the body to str before handing it to json.loads """
+
+    name = 'resp.json()'
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data.decode('utf-8'))
+
+
+def codecs() -> list[JsonCodec]:
+    """ Baseline and every codec that is installed """
+
+    installed: list[JsonCodec] = [ResponseJson(), StdlibJsonCodec()]
+    for codec_type in (OrjsonCodec, MsgspecCodec):
+        try:
+            installed.append(codec_type())
+        except LavviebotError as error:
+            print(f'Skipping {codec_type.name}: {error}')
+    return installed
+
+
+def main() -> None:
+    bodies = {name: json.dumps(json.loads((FIXTURES / f'{name}.json').read_text()),
+                               separators=(',', ':')).encode() for name in dict.fromkeys(POLL)}
+    installed = codecs()
+    for codec in installed:
+        assert [codec.decode(bodies[name]) for name in POLL] == [json.loads(bodies[name]) for name in POLL]
+
+    print(f'Decoding the {len(POLL)} responses of a status poll ({sum(len(bodies[name]) for name in POLL)} bytes), '
+          f'{NUMBER} iterations')
+    print(f'  {"codec":<14}{"GetCatHealthInfo":>18}{"poll":>12}{"encode":>12}')
+    baseline = 0.0
+    for codec in installed:
+        cat = timeit.timeit(lambda: codec.decode(bodies['GetCatHealthInfo']), number=NUMBER) / NUMBER
+        poll = timeit.timeit(lambda: [codec.decode(bodies[name]) for name in POLL], number=NUMBER) / NUMBER
+        encode = timeit.timeit(lambda: codec.encode(VARIABLES), number=NUMBER * 10) / (NUMBER * 10)
+        baseline = baseline or poll
+        print(f'  {codec.name:<14}{cat * 1e6:15.2f} us{poll * 1e6:9.2f} us{encode * 1e6:9.2f} us'
+              f'  ({baseline / poll:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+""" Memory held by 10k snapshots of a litter box and a cat, kept as models or in a reading window """
+from __future__ import annotations
+
+from dataclasses import fields, make_dataclass
+from datetime import datetime, timedelta
+
+import gc
+import tracemalloc
+
+from lavviebot.history import ReadingWindow
+from lavviebot.model import Cat, LavviebotData, LitterBox
+
+SNAPSHOTS = 10_000
+START = datetime(2024, 1, 1).astimezone()
+
+
+def dict_variant(cls: type) -> type:
+    """ The model as it was before, a plain dataclass whose instances carry a __dict__ """
+
+    return make_dataclass(f'Dict{cls.__name__}', [(model_field.name, model_field.type) for model_field in fields(cls)])
+
+
+DictLitterBox = dict_variant(LitterBox)
+DictCat = dict_variant(Cat)
+
+
+def snapshot(index: int, litter_box_type: type, cat_type: type) -> tuple:
+    """ Litter box and cat with fresh readings, as parsed from a poll """
+
+    taken = START + timedelta(seconds=30 * index)
+    litter_box = litter_box_type(
+        1, 'Litter box', 'abcd', '1.0.0', 'wifi', 2.0, None, '1.0.0', 0, 0, 0, 5, 1,
+        3.0 + index / 1000, 40 + index % 20, 20 + index % 5, taken, 'Tom', 30, taken, index % 10, [],
+    )
+    cat = cat_type(7, 100, 'Tom', True, 10.0 + index / 10000, 45.0, index % 5, 1, 2, 3, 4, 5)
+    return litter_box, cat
+
+
+def measure(build) -> int:
+    """ Bytes still allocated by what build() returns """
+
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def models(litter_box_type: type, cat_type: type) -> list:
+    return [snapshot(index, litter_box_type, cat_type) for index in range(SNAPSHOTS)]
+
+
+def window() -> ReadingWindow:
+    readings = ReadingWindow(capacity=SNAPSHOTS)
+    for index in range(SNAPSHOTS):
+        litter_box, cat = snapshot(index, LitterBox, Cat)
+        readings.record(
+            LavviebotData(litterboxes={1: litter_box}, lavvie_scanners={}, lavvie_tags={}, cats={7: cat}),
+            timestamp=litter_box.last_seen
+        )
+    return readings
+
+
+def main() -> None:
+    with_dict = measure(lambda: models(DictLitterBox, DictCat))
+    slotted = measure(lambda: models(LitterBox, Cat))
+    columns = measure(window)
+    print(f'{SNAPSHOTS} snapshots of a litter box and a cat')
+    print(f'  dataclasses with __dict__: {with_dict / 1024:10.1f} KiB')
+    print(f'  slotted dataclasses:       {slotted / 1024:10.1f} KiB ({with_dict / slotted:.1f}x less)')
+    print(f'  reading window:            {columns / 1024:10.1f} KiB ({with_dict / columns:.1f}x less, readings only)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+""" Microbenchmark of the per-request CPU spent building headers and encoding payloads """
+from __future__ import annotations
+
+import json
+import timeit
+
+from lavviebot.constants import (ACCEPT, ACCEPT_ENCODING, ACCEPT_LANGUAGE, CAT_STATUS,
+                                 CONNECTION, CONTENT_TYPE, USER_AGENT,)
+from lavviebot.operations import GET_CAT_HEALTH_INFO, build_headers
+
+NUMBER = 100_000
+COOKIE = 'sid=abc'
+TOKEN = 'token'
+
+
+def rebuilt_request() -> bytes:
+    """ Headers and payload rebuilt for every request and serialized with json.dumps, as aiohttp's json= does """
+
+    headers = {
+        'Accept': ACCEPT,
+        'Cookie': COOKIE,
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'Accept-Language': ACCEPT_LANGUAGE,
+        'Authorization': TOKEN,
+        'Connection': CONNECTION,
+        'Content-Type': CONTENT_TYPE,
+        'User-Agent': USER_AGENT
+    }
+    payload = {
+        "operationName": "GetCatHealthInfo",
+        "variables": {
+            "locationId": 1,
+            "petId": 7,
+            "days": "days",
+            "weight": "weight",
+            "poopCount": "poopCount",
+            "poopDuration": "duration"
+        },
+        "query": CAT_STATUS
+    }
+    assert headers
+    return json.dumps(payload).encode()
+
+
+HEADERS = build_headers(None, TOKEN)
+
+
+def registry_request() -> bytes:
+    """ Cached headers and a pre-encoded query with only the variables serialized """
+
+    assert HEADERS
+    return GET_CAT_HEALTH_INFO.bind({
+        "locationId": 1,
+        "petId": 7,
+        "days": "days",
+        "weight": "weight",
+        "poopCount": "poopCount",
+        "poopDuration": "duration"
+    }).body
+
+
+def main() -> None:
+    assert json.loads(rebuilt_request()) == json.loads(registry_request())
+    rebuilt = timeit.timeit(rebuilt_request, number=NUMBER) / NUMBER
+    registry = timeit.timeit(registry_request, number=NUMBER) / NUMBER
+    print(f'GetCatHealthInfo request, {NUMBER} iterations')
+    print(f'  rebuilt per request: {rebuilt * 1e6:8.2f} us')
+    print(f'  operation registry:  {registry * 1e6:8.2f} us')
+    print(f'  saved per request:   {(rebuilt - registry) * 1e6:8.2f} us ({rebuilt / registry:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
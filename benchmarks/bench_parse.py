@@ -0,0 +1,138 @@
+""" Microbenchmark of the CPU spent parsing the responses of a litter box and a cat into models """
+from __future__ import annotations
+
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import time
+import timeit
+
+from lavviebot.lavviebot_client import LOGGER, LavviebotClient
+from lavviebot.model import Cat, LitterBox
+
+NUMBER = 20_000
+NOW = str(int(time.time() * 1000))
+
+LITTER_BOX = {'id': 1, 'lavviebot': {'nickname': 'Litter box'}}
+LITTER_BOX_STATE = [
+    {'data': {'getIotDetail': {
+        'id': 1, 'iotCodeTail': 'abcd', 'latestFirmwareVersion': '1.0.0',
+        'lavviebot': {
+            'routerSSID': 'wifi', 'minBottomWeight': 910.2, 'beaconBattery': None,
+            'recentLavviebotLog': {
+                'currentFirmwareVersion': '1.0.0', 'motorState': 0, 'topLitterStatus': 0, 'wasteDrawerStatus': 0,
+                'waitTime': 5, 'litterType': 1, 'litterBottomAmount': 1365.3, 'humidity': 50, 'temperature': 22,
+                'creationTime': NOW,
+            },
+        },
+    }}},
+    {'data': {'getIotPoopRecord': {
+        'catUsageHistory': [
+            {'petId': 7, 'nickname': 'Tom', 'duration': 30, 'creationTime': str(int(NOW) - index * 60_000)}
+            for index in range(10)
+        ],
+        'nextCursor': None,
+    }}},
+    {'data': {'getIotErrorLog': {'errorLogs': [], 'cursor': None, 'hasMore': False}}},
+]
+CAT = {'id': 7, 'location_id': 100, 'is_unknown': False, 'has_lavvietag': True, 'cat': {'nickname': 'Tom'}}
+CAT_STATUS = {'data': {
+    'weightData': {'today': 4551}, 'poopCount': {'today': 3}, 'poopDuration': {'today': 50},
+    'todayActivity': [{'woodadaCount': 1, 'run': 2, 'walk': 3, 'rest': 4, 'grooming': 5}],
+}}
+
+
+def traversal_parse_litter_box(litter_box: dict, state: list) -> LitterBox:
+    """
+    Litter box parsing as it was: the response is rendered for the debug log even when it's disabled,
+    every path is walked from the top and the time zone is built for every timestamp
+    """
+
+    recent_log = 'recentLavviebotLog'
+    LOGGER.debug(f'Litter box {litter_box["lavviebot"].get("nickname")} response: {state}')
+    nickname = state[1]['data']['getIotPoopRecord']['catUsageHistory'][00].get('nickname')
+    today_usage_list: list = []
+    for usage_record in state[1]['data']['getIotPoopRecord']['catUsageHistory']:
+        if datetime.fromtimestamp(int(usage_record['creationTime']) / 1000).date() == date.today():
+            today_usage_list.append(usage_record)
+        else:
+            break
+    return LitterBox(
+        device_id=litter_box.get('id'),
+        device_name=litter_box['lavviebot'].get('nickname'),
+        iot_code_tail=state[0]['data']['getIotDetail'].get('iotCodeTail'),
+        latest_firmware=state[0]['data']['getIotDetail'].get('latestFirmwareVersion'),
+        router_ssid=state[0]['data']['getIotDetail']['lavviebot'].get('routerSSID'),
+        min_bottom_weight_pnds=state[0]['data']['getIotDetail']['lavviebot'].get('minBottomWeight') / 455.1,
+        beacon_battery=state[0]['data']['getIotDetail']['lavviebot'].get('beaconBattery'),
+        current_firmware=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('currentFirmwareVersion'),
+        motor_state=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('motorState'),
+        top_litter_status=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('topLitterStatus'),
+        waste_drawer_status=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('wasteDrawerStatus'),
+        wait_time=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('waitTime'),
+        litter_type=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('litterType'),
+        litter_bottom_amount_pnds=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get(
+            'litterBottomAmount') / 455.1,
+        humidity=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('humidity'),
+        temperature_c=state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('temperature'),
+        last_seen=datetime.fromtimestamp(
+            int(state[0]['data']['getIotDetail']['lavviebot'][recent_log].get('creationTime')) / 1000,
+            tz=ZoneInfo('Asia/Seoul')).astimezone(),
+        last_cat_used_name='Unknown' if nickname is None else nickname,
+        last_used_duration=state[1]['data']['getIotPoopRecord']['catUsageHistory'][00].get('duration'),
+        last_used=datetime.fromtimestamp(
+            int(state[1]['data']['getIotPoopRecord']['catUsageHistory'][00].get('creationTime')) / 1000,
+            tz=ZoneInfo('Asia/Seoul')).astimezone(),
+        times_used_today=len(today_usage_list),
+        error_log=state[2]['data']['getIotErrorLog']['errorLogs'],
+    )
+
+
+def traversal_parse_cat(cat: dict, status: dict) -> Cat:
+    """ Cat parsing as it was, checking every total by hand """
+
+    LOGGER.debug(f'Cat {cat["cat"].get("nickname")} status response: {status}')
+    weight_data = status['data']['weightData']
+    duration_data = status['data']['poopDuration']
+    count_data = status['data']['poopCount']
+    activity = {'woodadaCount': 0, 'run': 0, 'walk': 0, 'rest': 0, 'grooming': 0}
+    for data in status['data']['todayActivity']:
+        for key in activity:
+            if data[key]:
+                activity[key] += data[key]
+    return Cat(
+        cat_id=cat.get('id'),
+        location_id=cat.get('location_id'),
+        cat_name=cat['cat'].get('nickname'),
+        has_lavvietag=cat.get('has_lavvietag'),
+        cat_weight_pnds=0.0 if not weight_data or weight_data['today'] is None else weight_data['today'] / 455.1,
+        duration=0.0 if not duration_data or duration_data['today'] is None else duration_data['today'],
+        poop_count=0 if not count_data or count_data['today'] is None else count_data['today'],
+        zoomies=activity['woodadaCount'],
+        running=activity['run'],
+        walking=activity['walk'],
+        resting=activity['grooming'],
+        sleeping=activity['rest'],
+    )
+
+
+def traversal() -> tuple:
+    return traversal_parse_litter_box(LITTER_BOX, LITTER_BOX_STATE), traversal_parse_cat(CAT, CAT_STATUS)
+
+
+def schema() -> tuple:
+    return LavviebotClient._parse_litter_box(LITTER_BOX, LITTER_BOX_STATE), LavviebotClient._parse_cat(CAT, CAT_STATUS)
+
+
+def main() -> None:
+    assert traversal() == schema()
+    before = timeit.timeit(traversal, number=NUMBER) / NUMBER
+    after = timeit.timeit(schema, number=NUMBER) / NUMBER
+    print(f'Parsing a litter box and a cat, {NUMBER} iterations')
+    print(f'  deep dict traversal: {before * 1e6:8.2f} us')
+    print(f'  compiled schemas:    {after * 1e6:8.2f} us')
+    print(f'  saved per snapshot:  {(before - after) * 1e6:8.2f} us ({before / after:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark of async_get_data against the PurrSong stand-in, as the devices and cats of an account scale.
+
+Every scenario starts a stand-in in its own process, so that the latency and allocations measured
+are the client's alone, then polls it with a client whose scheduler doesn't hold requests back.
+Reported per poll: latency, requests and operations sent, response bytes received, and the peak
+memory allocated while polling. Failed polls are counted and left out of the latencies.
+With --operations, the client is instrumented and the three operations that took the most time are
+listed under every scenario. An operation's time is summed over the requests carrying it, and as
+requests are sent concurrently and batched, it can exceed the latency of the poll.
+
+    python -m benchmarks.bench_polling
+    python -m benchmarks.bench_polling --sizes 1 10 100 --polls 20 --profile lean --operations
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+
+from aiohttp import ClientSession
+
+from benchmarks.standin import StandInConfig
+from lavviebot.exceptions import LavviebotError
+from lavviebot.instrumentation import Instrumentation
+from lavviebot.lavviebot_client import LavviebotClient
+from lavviebot.scheduler import RequestScheduler
+
+ROOT = Path(__file__).parent.parent
+# Size of the account every fault is injected into
+FAULT_SIZE = 10
+
+
+@dataclass
+class Scenario:
+    """ Dataclass for a stand-in configuration to poll. """
+
+    name: str
+    config: StandInConfig
+
+
+def scenarios(sizes: list[int]) -> list[Scenario]:
+    """ Accounts with as many litter boxes, LavvieScanners, LavvieTAGs and cats as every size, then the faults """
+
+    def account(size: int, **faults) -> StandInConfig:
+        return StandInConfig(litter_boxes=size, lavvie_scanners=size, lavvie_tags=size, cats=size, **faults)
+
+    return [Scenario(f'{size} of each', account(size)) for size in sizes] + [
+        Scenario('50 ms latency', account(FAULT_SIZE, latency=0.05)),
+        Scenario('5% server errors', account(FAULT_SIZE, error_rate=0.05)),
+        Scenario('20 requests/s limit', account(FAULT_SIZE, rate_limit=20)),
+        Scenario('token lasts 10 requests', account(FAULT_SIZE, token_lifetime=10)),
+    ]
+
+
+async def start_standin(config: StandInConfig) -> tuple[asyncio.subprocess.Process, str]:
+    """ Start a stand-in in its own process and return it with its URL """
+
+    arguments = []
+    for name, value in asdict(config).items():
+        option = '--' + name.replace('_', '-')
+        if isinstance(value, bool):
+            arguments.append(option if value else '--no-' + option[2:])
+        elif value is not None:
+            arguments.extend([option, str(value)])
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'benchmarks.standin', *arguments, cwd=ROOT, stdout=asyncio.subprocess.PIPE
+    )
+    url = (await process.stdout.readline()).decode().strip()
+    return process, url
+
+
+async def standin_stats(session: ClientSession, url: str) -> dict:
+    async with session.get(f'{url}/stats') as response:
+        return await response.json()
+
+
+async def run(scenario: Scenario, polls: int, profile: str, operations: bool = False) -> str:
+    """ Poll a scenario and return its row of the report, followed by its slowest operations when asked """
+
+    process, url = await start_standin(scenario.config)
+    instrumentation = Instrumentation() if operations else None
+    try:
+        async with ClientSession() as session, ClientSession() as stats_session:
+            client = LavviebotClient(
+                'email', 'password', session, base_url=url, query_profile=profile, instrumentation=instrumentation,
+                scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000, backoff=0.05, max_backoff=0.5)
+            )
+            await client.login()
+            if instrumentation is not None:
+                instrumentation.reset()
+            latencies: list[float] = []
+            failed = 0
+            before = await standin_stats(stats_session, url)
+            for _ in range(polls):
+                start = time.perf_counter()
+                try:
+                    await client.async_get_data()
+                except LavviebotError:
+                    failed += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            after = await standin_stats(stats_session, url)
+            slowest = [] if instrumentation is None else [
+                f'      {stats.name:<26}{stats.latency.total * 1000 / polls:>8.1f} ms/poll'
+                f'{stats.latency.quantile(0.95) * 1000:>9.1f} ms p95{stats.requests / polls:>8.1f} requests'
+                f'{stats.response_bytes / polls / 1024:>9.1f} KiB'
+                for stats in instrumentation.slowest(3)
+            ]
+
+            tracemalloc.start()
+            try:
+                await client.async_get_data()
+            except LavviebotError:
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        process.terminate()
+        await process.wait()
+
+    requests = (after['requests'] - before['requests']) / polls
+    sent = (sum(after['operations'].values()) - sum(before['operations'].values())) / polls
+    received = (after['bytes_sent'] - before['bytes_sent']) / polls
+    p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+    p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else float('nan')
+    row = (f'  {scenario.name:<24}{p50:>9.1f}{p95:>9.1f}{requests:>10.1f}{sent:>8.0f}'
+           f'{received / 1024:>12.1f}{peak / 1024:>12.0f}{failed:>8}')
+    return '\n'.join([row] + slowest)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--polls', type=int, default=10)
+    parser.add_argument('--profile', choices=['full', 'lean'], default='full')
+    parser.add_argument('--operations', action='store_true', help='list the slowest operations of every scenario')
+    arguments = parser.parse_args()
+
+    print(f'async_get_data against the stand-in, {arguments.polls} polls per scenario, {arguments.profile} queries')
+    print(f'  {"scenario":<24}{"p50 ms":>9}{"p95 ms":>9}{"requests":>10}{"ops":>8}'
+          f'{"KiB in":>12}{"peak KiB":>12}{"failed":>8}')
+    for scenario in scenarios(arguments.sizes):
+        print(await run(scenario, arguments.polls, arguments.profile, arguments.operations), flush=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
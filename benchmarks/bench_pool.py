@@ -0,0 +1,81 @@
+"""
+Benchmark of LavviebotClientPool polling many accounts from one process against the PurrSong stand-in.
+
+The stand-in runs in its own process and serves every account the same small household. Every account
+is logged in first, then the pool polls them all for a number of rounds, refreshing the roster and every
+section of every account each round. Reported per pool size: the median wall time of a round and the
+polls per second over the rounds, the throughput and latency percentiles of PoolStats, and the failed
+polls. PoolStats observes throughput over at least a second, so it reads low for rounds shorter than that.
+
+    python -m benchmarks.bench_pool
+    python -m benchmarks.bench_pool --accounts 100 1000 2000 --rounds 5 --latency 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.bench_polling import start_standin
+from benchmarks.standin import StandInConfig
+from lavviebot.polling import PollingIntervals
+from lavviebot.pool import LavviebotClientPool
+from lavviebot.scheduler import RequestScheduler
+
+
+async def run(accounts: int, rounds: int, config: StandInConfig, max_concurrent_polls: int) -> str:
+    """ Poll a pool of accounts and return its row of the report """
+
+    process, url = await start_standin(config)
+    pool = LavviebotClientPool(
+        max_concurrent_polls=max_concurrent_polls, latency_samples=accounts * rounds,
+        intervals=PollingIntervals(roster=0, litterboxes=0, lavvie_scanners=0, lavvie_tags=0, cats=0)
+    )
+    try:
+        for index in range(accounts):
+            pool.add_account(
+                f'account-{index}@example.com', 'password', base_url=url,
+                scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+            )
+        logins = asyncio.Semaphore(max_concurrent_polls)
+
+        async def login(client) -> None:
+            async with logins:
+                await client.login()
+
+        await asyncio.gather(*[login(client) for client in pool.clients.values()])
+        durations = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await pool.async_poll_all()
+            durations.append(time.perf_counter() - start)
+        stats = pool.stats
+    finally:
+        await pool.async_close()
+        process.terminate()
+        await process.wait()
+
+    return (f'  {accounts:>8}{statistics.median(durations):>10.2f}{accounts * rounds / sum(durations):>10.1f}'
+            f'{stats.polls_per_second:>12.1f}'
+            f'{stats.p50_latency * 1000:>10.1f}{stats.p95_latency * 1000:>10.1f}{stats.failed_polls:>8}')
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--accounts', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the stand-in answers every request after')
+    parser.add_argument('--max-concurrent-polls', type=int, default=50)
+    arguments = parser.parse_args()
+
+    config = StandInConfig(litter_boxes=1, lavvie_scanners=1, lavvie_tags=1, cats=1, latency=arguments.latency)
+    print(f'LavviebotClientPool against the stand-in, {arguments.rounds} rounds, '
+          f'{arguments.max_concurrent_polls} concurrent polls, {arguments.latency * 1000:.0f} ms latency')
+    print(f'  {"accounts":>8}{"round s":>10}{"polls/s":>10}{"pool pps":>12}{"p50 ms":>10}{"p95 ms":>10}{"failed":>8}')
+    for accounts in arguments.accounts:
+        print(await run(accounts, arguments.rounds, config, arguments.max_concurrent_polls), flush=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+Size of the requests and responses of one account, with the full and lean query profiles.
+
+Responses are read from the fixtures directory, which holds a response of every operation
+to the full queries. Lean responses are the same fixtures pruned to the selection sets of
+the lean queries, which is what PurrSong returns to them, and both are checked to parse
+into the same models.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import asyncio
+import gzip
+import json
+
+from aiohttp import ClientSession
+
+from benchmarks.standin import fixture, prune, selection_set
+from lavviebot.lavviebot_client import LavviebotClient
+from lavviebot.operations import OPERATIONS, BoundOperation, Operation
+
+def response(operation: Operation) -> dict[str, Any]:
+    """ Fixture response of an operation, pruned to the selection set of its query """
+
+    return {'data': prune(fixture(operation.name)['data'], selection_set(operation.query))}
+
+
+def poll(client: LavviebotClient) -> tuple[list[BoundOperation], list[BoundOperation]]:
+    """ Operations discovering the fixture account, and operations polling its devices and cats """
+
+    discovery = [client.operations['PurrsongTabLocations'].bind({}), client._discover_cats_payload(100)]
+    status = [
+        *client._litter_box_status_payload(1),
+        client._iot_device_payload(2, 'lavvie_scanner'),
+        client._iot_device_payload(3, 'lavvie_tag'),
+        client._unknown_status_payload(100),
+        client._cat_status_payload(7, 100),
+        client._cat_status_payload(8, 100),
+    ]
+    return discovery, status
+
+
+def parse(client: LavviebotClient) -> tuple:
+    """ Models parsed from the responses to the operations of a client """
+
+    responses = {name: response(operation) for name, operation in client.operations.items()
+                 if name not in ('CheckServerStatus', 'Login')}
+    location = responses['PurrsongTabLocations']['data']['getLocations'][0]
+    litter_box, lavvie_scanner, lavvie_tag = location['getIots']
+    cats = client._parse_location_cats(location, responses['CatMain'])
+    return (
+        client._parse_litter_box(litter_box, [
+            responses['GetLavviebotDetails'], responses['GetIotPoopRecord'], responses['GetIotErrorLog']
+        ]),
+        client._parse_lavvie_scanner(lavvie_scanner, responses['GetLavvieScannerDetails']),
+        client._parse_lavvie_tag(lavvie_tag, responses['GetLavvieTagDetails']),
+        client._parse_cat(cats[0], responses['GetUnknownPoopData']),
+        *[client._parse_cat(cat, responses['GetCatHealthInfo']) for cat in cats[1:]],
+    )
+
+
+def report(title: str, full: list[BoundOperation], lean: list[BoundOperation]) -> None:
+    print(f'{title}')
+    print(f'  {"operation":<24}{"request full":>14}{"lean":>8}{"response full":>15}{"lean":>8}'
+          f'{"gzip full":>11}{"lean":>8}')
+    totals = [0] * 6
+    for full_operation, lean_operation in zip(full, lean):
+        full_response = json.dumps(response(full_operation.operation), separators=(',', ':')).encode()
+        lean_response = json.dumps(response(lean_operation.operation), separators=(',', ':')).encode()
+        row = [
+            len(full_operation.body), len(lean_operation.body),
+            len(full_response), len(lean_response),
+            len(gzip.compress(full_response)), len(gzip.compress(lean_response)),
+        ]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f'  {full_operation.name:<24}{row[0]:>14}{row[1]:>8}{row[2]:>15}{row[3]:>8}{row[4]:>11}{row[5]:>8}')
+    print(f'  {"total":<24}{totals[0]:>14}{totals[1]:>8}{totals[2]:>15}{totals[3]:>8}{totals[4]:>11}{totals[5]:>8}')
+    print(f'  lean saves {1 - totals[1] / totals[0]:.0%} of request bytes and '
+          f'{1 - totals[3] / totals[2]:.0%} of response bytes ({1 - totals[5] / totals[4]:.0%} gzipped)')
+
+
+async def main() -> None:
+    for operation in OPERATIONS.values():
+        if operation.name not in ('CheckServerStatus', 'Login'):
+            assert response(operation) == fixture(operation.name), f'{operation.name} fixture is incomplete'
+    async with ClientSession() as session:
+        full = LavviebotClient('email', 'password', session)
+        lean = LavviebotClient('email', 'password', session, query_profile='lean')
+        assert parse(full) == parse(lean)
+        full_discovery, full_status = poll(full)
+        lean_discovery, lean_status = poll(lean)
+    print('Bytes of the requests and responses of an account with a litter box, a LavvieScanner,')
+    print('a LavvieTAG, two cats and the Unknown cat')
+    report('Roster discovery', full_discovery, lean_discovery)
+    report('Status poll', full_status, lean_status)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark of async_get_data through every transport, as the devices and cats of an account scale.
+
+The same account is polled over aiohttp from a stand-in in its own process, from a recording of
+those polls replayed byte for byte, and from the stand-in's handlers through an InMemoryTransport.
+Without a network, what is left of a poll is the client: encoding, scheduling, decoding and parsing.
+
+    python -m benchmarks.bench_transport
+    python -m benchmarks.bench_transport --sizes 1 10 100 --polls 20
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from aiohttp import ClientSession
+
+from benchmarks.bench_polling import start_standin
+from benchmarks.standin import PurrSongStandIn, StandInConfig
+from lavviebot.lavviebot_client import LavviebotClient
+from lavviebot.model import LavviebotData
+from lavviebot.scheduler import RequestScheduler
+from lavviebot.transport import AiohttpTransport, InMemoryTransport, RecordingTransport, ReplayTransport, Transport
+
+
+def client(transport: Transport, base_url: str = 'http://stand-in/purrsong') -> LavviebotClient:
+    """ Client whose scheduler doesn't hold requests back """
+
+    return LavviebotClient(
+        'email', 'password', transport=transport, base_url=base_url,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+    )
+
+
+async def poll(lavviebot: LavviebotClient, polls: int) -> tuple[float, LavviebotData]:
+    """ Median latency in seconds of polls of a logged in client, and the data of the last poll """
+
+    latencies = []
+    for _ in range(polls):
+        start = time.perf_counter()
+        data = await lavviebot.async_get_data()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), data
+
+
+async def run(size: int, polls: int, recording: Path) -> str:
+    """ Poll an account through every transport and return its row of the report """
+
+    config = StandInConfig(litter_boxes=size, lavvie_scanners=size, lavvie_tags=size, cats=size)
+    process, url = await start_standin(config)
+    try:
+        async with ClientSession() as session:
+            recorder = RecordingTransport(AiohttpTransport(session), recording)
+            lavviebot = client(recorder, url)
+            await lavviebot.login()
+            network, recorded = await poll(lavviebot, polls)
+            await recorder.async_close()
+    finally:
+        process.terminate()
+        await process.wait()
+
+    transports: dict[str, Callable[[], Transport]] = {
+        'replay': lambda: ReplayTransport(recording),
+        'in-memory': lambda: InMemoryTransport(PurrSongStandIn(config).handlers()),
+    }
+    medians = [network]
+    for name, transport in transports.items():
+        lavviebot = client(transport())
+        await lavviebot.login()
+        median, data = await poll(lavviebot, polls)
+        if name == 'replay':
+            assert data == recorded, 'Replayed polls differ from the recorded ones'
+        medians.append(median)
+    row = ''.join(f'{median * 1000:>12.2f}' for median in medians)
+    return f'  {size:>6}{row}{network / medians[1]:>16.1f}x'
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--polls', type=int, default=10)
+    arguments = parser.parse_args()
+
+    print(f'Median ms per async_get_data, {arguments.polls} polls per transport')
+    print(f'  {"size":>6}{"aiohttp":>12}{"replay":>12}{"in-memory":>12}{"replay speed-up":>17}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in arguments.sizes:
+            print(await run(size, arguments.polls, Path(directory) / f'recording-{size}.json'), flush=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,465 @@
+"""
+Local stand-in for the PurrSong GraphQL API, answering every operation the client sends from the fixtures.
+
+The account served is generated from the fixture responses, with any number of litter boxes,
+LavvieScanners, LavvieTAGs and cats, and every response is pruned to the selection set of the
+query it answers, so the full and lean query profiles get the responses they would get from
+PurrSong. Latency, server errors, rate limits and token expiry are configurable.
+
+In-process:
+
+    async with PurrSongStandIn(StandInConfig(litter_boxes=10, cats=10)) as standin:
+        client = LavviebotClient('email', 'password', session, base_url=standin.url)
+
+In its own process, printing its URL once it's listening:
+
+    python -m benchmarks.standin --litter-boxes 10 --cats 10 --latency 0.05
+
+Without a server, through an InMemoryTransport answering from the same account:
+
+    client = LavviebotClient('email', 'password', transport=InMemoryTransport(PurrSongStandIn(config).handlers()))
+"""
+from __future__ import annotations
+
+from collections import Counter, deque
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Callable
+
+import argparse
+import asyncio
+import copy
+import functools
+import json
+import random
+import re
+import time
+
+from aiohttp import web
+
+from lavviebot.constants import LOGIN_EXPIRED, RATE_LIMITED
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+# Time the fixtures were recorded at, their timestamps are moved to the time the stand-in starts
+RECORDED_AT = 1717200000000
+TIMESTAMPS = ('creationTime', 'recentConnectionTime', 'recentLavvieTagSyncTime', 'date')
+LOCATION_ID = 100
+LAVVIE_SCANNER_IDS = 10_000
+LAVVIE_TAG_IDS = 20_000
+# Pages of usage records of every litter box, each covering 60 hours
+USAGE_PAGES = 5
+
+_TOKEN = re.compile(r'\.\.\.|[A-Za-z_]\w*|[:{}]')
+_DIRECTIVE = re.compile(r'@\w+')
+
+
+def selection_set(query: str) -> dict[str, Any]:
+    """
+    Tree of the fields selected by the operation of a GraphQL document, keyed by response key, with
+    its fragments spread in place. Leaves are None, arguments and directives are skipped.
+    """
+
+    depth = 0
+    stripped: list = []
+    for char in query:
+        depth += char == '('
+        if not depth:
+            stripped.append(char)
+        depth -= char == ')'
+    tokens = _TOKEN.findall(_DIRECTIVE.sub('', ''.join(stripped)))
+
+    def parse(index: int) -> tuple[dict[str, Any], int]:
+        selected: dict[str, Any] = {}
+        index += 1
+        while tokens[index] != '}':
+            if tokens[index] == '...':
+                selected[('...', tokens[index + 1])] = None
+                index += 2
+                continue
+            key = tokens[index]
+            index += 3 if tokens[index + 1] == ':' else 1
+            selected[key] = None
+            if tokens[index] == '{':
+                selected[key], index = parse(index)
+        return selected, index + 1
+
+    operation: dict[str, Any] = {}
+    fragments: dict[str, dict[str, Any]] = {}
+    index = 0
+    while index < len(tokens):
+        if tokens[index] == 'fragment':
+            name = tokens[index + 1]
+            index = tokens.index('{', index)
+            fragments[name], index = parse(index)
+        else:
+            index = tokens.index('{', index)
+            operation, index = parse(index)
+
+    def spread(selected: dict[str, Any] | None) -> dict[str, Any] | None:
+        if selected is None:
+            return None
+        merged: dict[str, Any] = {}
+        for key, subfields in selected.items():
+            if isinstance(key, tuple):
+                merged.update(spread(fragments[key[1]]))
+            else:
+                merged[key] = spread(subfields)
+        return merged
+
+    return spread(operation)
+
+
+def prune(value: Any, selected: dict[str, Any] | None) -> Any:
+    """ Keep only the selected fields of a response, raising KeyError for a field the response doesn't have """
+
+    if selected is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [prune(item, selected) for item in value]
+    return {key: prune(value[key], subfields) for key, subfields in selected.items()}
+
+
+def fixture(name: str) -> dict[str, Any]:
+    """ Fixture response of an operation, as answered to the full query """
+
+    return json.loads((FIXTURES / f'{name}.json').read_text())
+
+
+def _shift(value: Any, delta: int) -> Any:
+    """ Move every timestamp of a response by delta milliseconds """
+
+    if isinstance(value, list):
+        return [_shift(item, delta) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: str(int(item) + delta) if key in TIMESTAMPS and isinstance(item, str) and item.isdigit()
+            else _shift(item, delta)
+            for key, item in value.items()
+        }
+    return value
+
+
+@dataclass
+class StandInConfig:
+    """ Dataclass for the account served by a stand-in, and the faults it injects. """
+
+    litter_boxes: int = 1
+    lavvie_scanners: int = 1
+    lavvie_tags: int = 1
+    cats: int = 1
+    unknown_cat: bool = True
+    # Seconds every request is answered after
+    latency: float = 0.0
+    # Fraction of requests answered with a server error
+    error_rate: float = 0.0
+    # Requests answered per second before rate limiting, or None
+    rate_limit: float | None = None
+    # Requests a token is accepted for before it expires, or None
+    token_lifetime: int | None = None
+    seed: int = 0
+
+
+@dataclass
+class StandInStats:
+    """ Dataclass for what a stand-in has answered. """
+
+    requests: int = 0
+    operations: Counter = field(default_factory=Counter)
+    bytes_received: int = 0
+    bytes_sent: int = 0
+    server_errors: int = 0
+    rate_limited: int = 0
+    expired_tokens: int = 0
+    logins: int = 0
+
+
+class PurrSongStandIn:
+    """
+    aiohttp server answering the operations of the PurrSong GraphQL API.
+    Responses are rendered once per query and variables, so that answering
+    costs as little as possible next to the client being measured.
+    """
+
+    PATH = '/purrsong'
+
+    def __init__(self, config: StandInConfig | None = None) -> None:
+        """
+        config: StandInConfig of the account served and the faults injected, or None to use the defaults
+        """
+        self.config: StandInConfig = config if config else StandInConfig()
+        self.stats: StandInStats = StandInStats()
+        self.url: str | None = None
+        self._random = random.Random(self.config.seed)
+        self._delta: int = int(time.time() * 1000) - RECORDED_AT
+        self._fixtures: dict[str, dict[str, Any]] = {
+            path.stem: _shift(json.loads(path.read_text()), self._delta) for path in FIXTURES.glob('*.json')
+        }
+        self._selections: dict[str, dict[str, Any]] = {}
+        self._rendered: dict[tuple[str, bytes], bytes] = {}
+        self._responses: dict[tuple[str, bytes], dict[str, Any]] = {}
+        self._tokens: dict[str, int] = {}
+        self._issued: int = 0
+        self._answered: deque[float] = deque()
+        self._runner: web.AppRunner | None = None
+
+    async def async_start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """ Start listening, on a free port unless one is given, and return the URL to pass to the client """
+
+        app = web.Application()
+        app.router.add_post(self.PATH, self._async_post)
+        app.router.add_get(f'{self.PATH}/stats', self._async_stats)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.url = f'http://{host}:{self._runner.addresses[0][1]}{self.PATH}'
+        return self.url
+
+    async def async_close(self) -> None:
+        """ Stop listening """
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        return None
+
+    def handlers(self) -> dict[str, Callable[[dict[str, Any]], dict[str, Any]]]:
+        """
+        Handlers of an InMemoryTransport answering every operation of the account served.
+        Their responses aren't pruned to the queries, and no fault is injected.
+        """
+
+        names = {'CheckServerStatus', 'Login', *self._fixtures}
+        return {name: functools.partial(self._handle, name) for name in names}
+
+    async def __aenter__(self) -> PurrSongStandIn:
+        await self.async_start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.async_close()
+
+    async def _async_stats(self, request: web.Request) -> web.Response:
+        """ Return the stats as JSON """
+
+        return web.json_response(dict(vars(self.stats), operations=dict(self.stats.operations)))
+
+    async def _async_post(self, request: web.Request) -> web.Response:
+        """ Answer a request of one operation or a batch of operations """
+
+        body = await request.read()
+        self.stats.requests += 1
+        self.stats.bytes_received += len(body)
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        if self._rate_limited():
+            self.stats.rate_limited += 1
+            return self._respond({'errors': [{'message': RATE_LIMITED}]}, status=500)
+        if self.config.error_rate and self._random.random() < self.config.error_rate:
+            self.stats.server_errors += 1
+            return self._respond({'errors': [{'message': 'Internal server error'}]}, status=502)
+
+        payload = json.loads(body)
+        operations = payload if isinstance(payload, list) else [payload]
+        self.stats.operations.update(operation['operationName'] for operation in operations)
+        cookie = False
+        if any(operation['operationName'] not in ('CheckServerStatus', 'Login') for operation in operations):
+            if not self._authorized(request.headers.get('Authorization')):
+                self.stats.expired_tokens += 1
+                expired = b'{"errors":[{"message":' + json.dumps(LOGIN_EXPIRED).encode() + b'}]}'
+                answers = [expired] * len(operations)
+                return self._send(b'[' + b','.join(answers) + b']' if isinstance(payload, list) else answers[0])
+        answers = []
+        for operation in operations:
+            cookie = cookie or operation['operationName'] == 'CheckServerStatus'
+            answers.append(self._answer(operation))
+        response = self._send(b'[' + b','.join(answers) + b']' if isinstance(payload, list) else answers[0])
+        if cookie:
+            response.set_cookie('connect.sid', f's%3Astand-in.{self._issued}')
+        return response
+
+    def _rate_limited(self) -> bool:
+        """ Whether more requests than the rate limit were answered over the last second """
+
+        if self.config.rate_limit is None:
+            return False
+        now = time.monotonic()
+        while self._answered and self._answered[0] < now - 1.0:
+            self._answered.popleft()
+        if len(self._answered) >= self.config.rate_limit:
+            return True
+        self._answered.append(now)
+        return False
+
+    def _authorized(self, token: str | None) -> bool:
+        """ Whether a token was issued and hasn't expired, counting the request against its lifetime """
+
+        if token not in self._tokens:
+            return False
+        if self.config.token_lifetime is not None:
+            if self._tokens[token] >= self.config.token_lifetime:
+                return False
+            self._tokens[token] += 1
+        return True
+
+    def _respond(self, response: Any, status: int = 200) -> web.Response:
+        return self._send(json.dumps(response, separators=(',', ':')).encode(), status)
+
+    def _send(self, body: bytes, status: int = 200) -> web.Response:
+        self.stats.bytes_sent += len(body)
+        return web.Response(body=body, status=status, content_type='application/json')
+
+    def _answer(self, operation: dict[str, Any]) -> bytes:
+        """ Rendered response to an operation """
+
+        name = operation['operationName']
+        variables = operation.get('variables') or {}
+        if name == 'Login':
+            return self._render(operation, self._login())
+        key = (operation['query'], json.dumps(variables, sort_keys=True).encode())
+        if key not in self._rendered:
+            self._rendered[key] = self._render(operation, self._response(name, variables))
+        return self._rendered[key]
+
+    def _handle(self, name: str, variables: dict[str, Any]) -> dict[str, Any]:
+        """ Response to an operation sent through an InMemoryTransport """
+
+        self.stats.operations[name] += 1
+        if name == 'Login':
+            return self._login()
+        key = (name, json.dumps(variables, sort_keys=True).encode())
+        if key not in self._responses:
+            self._responses[key] = self._response(name, variables)
+        return self._responses[key]
+
+    def _login(self) -> dict[str, Any]:
+        """ Response to a login, issuing a new token """
+
+        self._issued += 1
+        self.stats.logins += 1
+        token = f'stand-in-token-{self._issued}'
+        self._tokens[token] = 0
+        return {'data': {'login': {
+            'userId': 1, 'userToken': token, 'hasCat': bool(self.config.cats or self.config.unknown_cat),
+            '__typename': 'LoginResponse',
+        }}}
+
+    def _render(self, operation: dict[str, Any], response: dict[str, Any]) -> bytes:
+        """ Prune a response to the selection set of the query and encode it """
+
+        if 'data' in response:
+            query = operation['query']
+            if query not in self._selections:
+                self._selections[query] = selection_set(query)
+            try:
+                response = {'data': prune(response['data'], self._selections[query])}
+            except KeyError as error:
+                response = {'errors': [{'message': f'Cannot query field {error} of {operation["operationName"]}'}]}
+        return json.dumps(response, separators=(',', ':')).encode()
+
+    def _response(self, name: str, variables: dict[str, Any]) -> dict[str, Any]:
+        """ Full response to an operation of the account served """
+
+        config = self.config
+        iot_id = (variables.get('data') or {}).get('iotId')
+        if name == 'CheckServerStatus':
+            return {'data': {'checkServerStatus': True}}
+        if name == 'PurrsongTabLocations':
+            response = copy.deepcopy(self._fixtures[name])
+            location = response['data']['getLocations'][0]
+            litter_box, lavvie_scanner, lavvie_tag = location.pop('getIots')
+            location.update(id=LOCATION_ID, hasUnknownCat=config.unknown_cat, getIots=[])
+            for index in range(1, config.litter_boxes + 1):
+                location['getIots'].append(self._device(litter_box, index, 'lavviebot', f'Litter box {index}'))
+            for index in range(1, config.lavvie_scanners + 1):
+                location['getIots'].append(
+                    self._device(lavvie_scanner, LAVVIE_SCANNER_IDS + index, 'lavvieScanner', f'Scanner {index}')
+                )
+            for index in range(1, config.lavvie_tags + 1):
+                device = self._device(lavvie_tag, LAVVIE_TAG_IDS + index, 'lavvieTag', f'Tag {index}')
+                device['lavvieTag']['id'] = LAVVIE_TAG_IDS + index
+                if index <= config.cats:
+                    device['pet'] = dict(device['pet'], id=index, cat=dict(device['pet']['cat'], nickname=f'Cat {index}'))
+                else:
+                    device['pet'] = None
+                location['getIots'].append(device)
+            return response
+        if name == 'CatMain':
+            pet, = [pet for pet in self._fixtures[name]['data']['getPets'] if pet['lavvieTag']]
+            pets = []
+            for index in range(1, config.cats + 1):
+                cat = dict(pet, id=index, cat=dict(pet['cat'], id=index * 10, nickname=f'Cat {index}'))
+                cat['lavvieTag'] = dict(pet['lavvieTag'], id=LAVVIE_TAG_IDS + index) if index <= config.lavvie_tags else None
+                pets.append(cat)
+            return {'data': {'getPets': pets}}
+        if name == 'GetIotPoopRecord':
+            page = int((variables.get('data') or {}).get('cursor') or 0)
+            response = _shift(self._fixtures[name], -page * 60 * 60 * 60 * 1000)
+            usage_log = response['data']['getIotPoopRecord']
+            for index, usage_record in enumerate(usage_log['catUsageHistory']):
+                # Used by the cats of the account in turn, or by the Unknown cat when there are none
+                pet_id = index % config.cats + 1 if config.cats else None
+                usage_record.update(petId=pet_id, nickname=f'Cat {pet_id}' if pet_id else None)
+            usage_log['nextCursor'] = str(page + 1) if page + 1 < USAGE_PAGES else None
+            return response
+        if name == 'GetIotErrorLog':
+            response = copy.deepcopy(self._fixtures[name])
+            response['data']['getIotErrorLog'].update(cursor=None, hasMore=False)
+            return response
+        if name in ('GetLavviebotDetails', 'GetLavvieScannerDetails', 'GetLavvieTagDetails'):
+            response = copy.deepcopy(self._fixtures[name])
+            response['data']['getIotDetail']['id'] = iot_id
+            if name == 'GetLavvieTagDetails':
+                pet_id = iot_id - LAVVIE_TAG_IDS
+                detail = response['data']['getIotDetail']
+                detail['pet'] = dict(detail['pet'], id=pet_id) if 0 < pet_id <= config.cats else None
+            return response
+        if name == 'GetCatHealthInfo':
+            response = copy.deepcopy(self._fixtures[name])
+            response['data']['getPetContents']['petId'] = variables.get('petId')
+            return response
+        if name in self._fixtures:
+            return self._fixtures[name]
+        return {'errors': [{'message': f'Unknown operation {name}'}]}
+
+    @staticmethod
+    def _device(template: dict[str, Any], device_id: int, kind: str, nickname: str) -> dict[str, Any]:
+        """ Discovered device built from the fixture device of its kind """
+
+        device = copy.deepcopy(template)
+        device['id'] = device_id
+        device[kind]['nickname'] = nickname
+        return device
+
+
+def _arguments() -> tuple[str, int, StandInConfig]:
+    """ Host, port and StandInConfig from the command line """
+
+    parser = argparse.ArgumentParser(description='Local stand-in for the PurrSong GraphQL API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    for config_field in fields(StandInConfig):
+        option = '--' + config_field.name.replace('_', '-')
+        if config_field.type == 'bool':
+            parser.add_argument(option, action=argparse.BooleanOptionalAction, default=config_field.default)
+        else:
+            kind = float if 'float' in config_field.type else int
+            parser.add_argument(option, type=kind, default=config_field.default)
+    arguments = vars(parser.parse_args())
+    return arguments.pop('host'), arguments.pop('port'), StandInConfig(**arguments)
+
+
+async def _serve() -> None:
+    host, port, config = _arguments()
+    standin = PurrSongStandIn(config)
+    print(await standin.async_start(host, port), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.async_close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
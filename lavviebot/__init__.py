@@ -1,23 +1,106 @@
+from lavviebot import auth
+from lavviebot import breaker
+from lavviebot import cache
+from lavviebot import changes
+from lavviebot import codec
 from lavviebot import constants
+from lavviebot import credentials
+from lavviebot import error_log
 from lavviebot import exceptions
+from lavviebot import history
+from lavviebot import instrumentation
 from lavviebot import lavviebot_client
+from lavviebot import lazy
 from lavviebot import model
+from lavviebot import operations
+from lavviebot import polling
+from lavviebot import pool
+from lavviebot import scheduler
+from lavviebot import schema
+from lavviebot import transport
 
-from lavviebot.constants import (ACCEPT, ACCEPT_ENCODING, ACCEPT_LANGUAGE,
-                                 APP_VERSION, BASE_URL, CAT_STATUS, CONNECTION,
-                                 CONTENT_TYPE, COOKIE_QUERY, DISCOVER_CATS,
-                                 DISCOVER_DEVICES, LANGUAGE, LAVVIE_SCANNER_STATUS,
-                                 LAVVIE_TAG_STATUS, LB_CAT_LOG, LB_ERROR_LOG, LB_STATUS,
-                                 TIMEOUT, TIME_ZONE, TOKEN_QUERY,
+from lavviebot.auth import TokenManager
+from lavviebot.breaker import (BreakerState, BreakerStats, CircuitBreaker,)
+from lavviebot.cache import (CacheStats, ResponseCache,)
+from lavviebot.changes import (ChangeEvent, ChangeTracker, ChangeType,)
+from lavviebot.codec import (DEFAULT_CODEC, JsonCodec, MsgspecCodec, OrjsonCodec, StdlibJsonCodec,)
+from lavviebot.constants import (ACCEPT, ACCEPT_ENCODING, ACCEPT_LANGUAGE, APP_VERSION, BASE_URL,
+                                 BREAKER_FAILURE_RATE, BREAKER_HALF_OPEN_REQUESTS,
+                                 BREAKER_MAX_OPEN_DURATION, BREAKER_MIN_REQUESTS,
+                                 BREAKER_OPEN_DURATION, BREAKER_SLOW_CALL_DURATION,
+                                 BREAKER_SLOW_CALL_RATE, BREAKER_WINDOW, CACHE_MAX_ENTRIES,
+                                 CACHE_TTLS, CATS_INTERVAL, CAT_STATUS, CONNECTION, CONTENT_TYPE,
+                                 COOKIE_QUERY, DISCOVER_CATS, DISCOVER_DEVICES, ERROR_LOG_HISTORY,
+                                 GET_DATA_DEADLINE, HEDGE_MIN_SAMPLES, HEDGE_QUANTILE,
+                                 HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL, HISTORY_RETENTION,
+                                 LANGUAGE, LATENCY_BUCKETS, LAVVIE_DEVICES_INTERVAL,
+                                 LAVVIE_SCANNER_STATUS, LAVVIE_TAG_STATUS, LB_CAT_LOG,
+                                 LB_ERROR_LOG, LB_STATUS, LEAN_CAT_STATUS, LEAN_DISCOVER_CATS,
+                                 LEAN_DISCOVER_DEVICES, LEAN_LAVVIE_SCANNER_STATUS,
+                                 LEAN_LAVVIE_TAG_STATUS, LEAN_LB_CAT_LOG, LEAN_LB_ERROR_LOG,
+                                 LEAN_LB_STATUS, LEAN_UNKNOWN_STATUS, LITTER_BOXES_INTERVAL,
+                                 LOGIN_EXPIRED, MAX_BATCH_SIZE, MAX_CONCURRENCY,
+                                 MAX_CONCURRENT_POLLS, MAX_RATE_LIMIT_RETRIES,
+                                 MAX_RELOGIN_ATTEMPTS, MAX_TRANSIENT_RETRIES, OPERATION_TIMEOUTS,
+                                 POOL_CONNECTION_LIMIT, POOL_LATENCY_SAMPLES, QUERY_PROFILE,
+                                 RATE_LIMITED, RATE_LIMIT_BACKOFF, RATE_LIMIT_MAX_BACKOFF,
+                                 READING_WINDOW_CAPACITY, REQUEST_BURST, REQUEST_MAX_RATE,
+                                 REQUEST_MIN_RATE, REQUEST_RATE, ROSTER_INTERVAL, TIMEOUT,
+                                 TIME_ZONE, TOKEN_QUERY, TRANSIENT_BACKOFF, TRANSIENT_MAX_BACKOFF,
                                  UNKNOWN_STATUS, USER_AGENT,)
-from lavviebot.exceptions import (LavviebotAuthError, LavviebotError, LavviebotRateLimit,)
+from lavviebot.credentials import (Credentials, CredentialStore, FileCredentialStore,
+                                   MemoryCredentialStore,)
+from lavviebot.error_log import ErrorLogTracker
+from lavviebot.exceptions import (LavviebotAuthError, LavviebotCircuitOpen, LavviebotError, LavviebotRateLimit,
+                                  LavviebotSchemaError, LavviebotServerError, LavviebotTimeout,)
+from lavviebot.history import (CAT_METRICS, LITTER_BOX_METRICS, AggregatedReading, HistoryStore, Reading,
+                               ReadingWindow,)
+from lavviebot.instrumentation import (Histogram, Instrumentation, InstrumentationHook, OperationStats,
+                                        RequestRecord, RequestTrace,)
 from lavviebot.lavviebot_client import (LavviebotClient, LOGGER)
-from lavviebot.model import (Cat, LavviebotData, LavvieScanner, LavvieTag, LitterBox,)
+from lavviebot.lazy import LazyLavviebotData
+from lavviebot.model import (DEVICE_TYPES, SECTIONS, Cat, FrozenCat, FrozenLavvieScanner, FrozenLavvieTag,
+                             FrozenLitterBox, LavviebotData, LavvieScanner, LavvieTag, LitterBox, Roster,
+                             RosterFilter,)
+from lavviebot.operations import (BoundOperation, Operation, LEAN_OPERATIONS, OPERATIONS, QUERY_PROFILES,)
+from lavviebot.polling import (PollingIntervals, TieredPoller,)
+from lavviebot.pool import (LavviebotClientPool, PoolStats,)
+from lavviebot.scheduler import RequestScheduler
+from lavviebot.schema import (Field, Schema,)
+from lavviebot.transport import (AiohttpTransport, Exchange, InMemoryTransport, RecordingTransport, ReplayTransport,
+                                 Transport, TransportResponse,)
 
-__all__ = ['ACCEPT', 'ACCEPT_ENCODING', 'ACCEPT_LANGUAGE', 'APP_VERSION',
-           'BASE_URL', 'CAT_STATUS', 'CONNECTION', 'CONTENT_TYPE',
-           'COOKIE_QUERY', 'Cat', 'DISCOVER_CATS', 'DISCOVER_DEVICES', 'LANGUAGE',
-           'LB_CAT_LOG', 'LB_ERROR_LOG', 'LB_STATUS', 'LavviebotAuthError', 'LavviebotClient',
-           'LavviebotData', 'LavviebotError', 'LavviebotRateLimit', 'LavvieScanner', 'LAVVIE_SCANNER_STATUS',
-           'LAVVIE_TAG_STATUS', 'LavvieTag', 'LitterBox', 'LOGGER', 'TIMEOUT', 'TIME_ZONE', 'TOKEN_QUERY',
-           'UNKNOWN_STATUS', 'USER_AGENT', 'constants', 'exceptions', 'lavviebot_client', 'model']
+__all__ = ['ACCEPT', 'ACCEPT_ENCODING', 'ACCEPT_LANGUAGE', 'AggregatedReading', 'AiohttpTransport',
+           'APP_VERSION', 'BASE_URL', 'BoundOperation', 'BreakerState', 'BreakerStats',
+           'BREAKER_FAILURE_RATE', 'BREAKER_HALF_OPEN_REQUESTS', 'BREAKER_MAX_OPEN_DURATION',
+           'BREAKER_MIN_REQUESTS', 'BREAKER_OPEN_DURATION', 'BREAKER_SLOW_CALL_DURATION',
+           'BREAKER_SLOW_CALL_RATE', 'BREAKER_WINDOW', 'CacheStats', 'CACHE_MAX_ENTRIES', 'CACHE_TTLS',
+           'Cat', 'CATS_INTERVAL', 'CAT_METRICS', 'CAT_STATUS', 'ChangeEvent', 'ChangeTracker', 'ChangeType',
+           'CircuitBreaker', 'CONNECTION', 'CONTENT_TYPE', 'COOKIE_QUERY', 'Credentials', 'CredentialStore',
+           'DEFAULT_CODEC', 'DEVICE_TYPES', 'DISCOVER_CATS', 'DISCOVER_DEVICES', 'ErrorLogTracker',
+           'ERROR_LOG_HISTORY', 'Exchange', 'Field', 'FileCredentialStore', 'FrozenCat',
+           'FrozenLavvieScanner', 'FrozenLavvieTag', 'FrozenLitterBox', 'GET_DATA_DEADLINE',
+           'HEDGE_MIN_SAMPLES', 'HEDGE_QUANTILE', 'Histogram', 'HistoryStore', 'HISTORY_BATCH_SIZE',
+           'HISTORY_FLUSH_INTERVAL', 'HISTORY_RETENTION', 'InMemoryTransport', 'Instrumentation',
+           'InstrumentationHook', 'JsonCodec', 'LANGUAGE', 'LATENCY_BUCKETS', 'LavviebotAuthError',
+           'LavviebotCircuitOpen', 'LavviebotClient', 'LavviebotClientPool', 'LavviebotData',
+           'LavviebotError', 'LavviebotRateLimit', 'LavviebotSchemaError', 'LavviebotServerError',
+           'LavviebotTimeout', 'LavvieScanner', 'LavvieTag', 'LAVVIE_DEVICES_INTERVAL',
+           'LAVVIE_SCANNER_STATUS', 'LAVVIE_TAG_STATUS', 'LazyLavviebotData', 'LB_CAT_LOG', 'LB_ERROR_LOG',
+           'LB_STATUS', 'LEAN_CAT_STATUS', 'LEAN_DISCOVER_CATS', 'LEAN_DISCOVER_DEVICES',
+           'LEAN_LAVVIE_SCANNER_STATUS', 'LEAN_LAVVIE_TAG_STATUS', 'LEAN_LB_CAT_LOG', 'LEAN_LB_ERROR_LOG',
+           'LEAN_LB_STATUS', 'LEAN_OPERATIONS', 'LEAN_UNKNOWN_STATUS', 'LitterBox', 'LITTER_BOXES_INTERVAL',
+           'LITTER_BOX_METRICS', 'LOGGER', 'LOGIN_EXPIRED', 'MAX_BATCH_SIZE', 'MAX_CONCURRENCY',
+           'MAX_CONCURRENT_POLLS', 'MAX_RATE_LIMIT_RETRIES', 'MAX_RELOGIN_ATTEMPTS', 'MAX_TRANSIENT_RETRIES',
+           'MemoryCredentialStore', 'MsgspecCodec', 'Operation', 'OPERATIONS', 'OperationStats',
+           'OPERATION_TIMEOUTS', 'OrjsonCodec', 'PollingIntervals', 'PoolStats', 'POOL_CONNECTION_LIMIT',
+           'POOL_LATENCY_SAMPLES', 'QUERY_PROFILE', 'QUERY_PROFILES', 'RATE_LIMITED', 'RATE_LIMIT_BACKOFF',
+           'RATE_LIMIT_MAX_BACKOFF', 'Reading', 'ReadingWindow', 'READING_WINDOW_CAPACITY',
+           'RecordingTransport', 'ReplayTransport', 'RequestRecord', 'RequestScheduler', 'RequestTrace',
+           'REQUEST_BURST', 'REQUEST_MAX_RATE', 'REQUEST_MIN_RATE', 'REQUEST_RATE', 'ResponseCache',
+           'Roster', 'RosterFilter', 'ROSTER_INTERVAL', 'Schema', 'SECTIONS', 'StdlibJsonCodec',
+           'TieredPoller', 'TIMEOUT', 'TIME_ZONE', 'TokenManager', 'TOKEN_QUERY', 'TRANSIENT_BACKOFF',
+           'TRANSIENT_MAX_BACKOFF', 'Transport', 'TransportResponse', 'UNKNOWN_STATUS', 'USER_AGENT', 'auth',
+           'breaker', 'cache', 'changes', 'codec', 'constants', 'credentials', 'error_log', 'exceptions',
+           'history', 'instrumentation', 'lavviebot_client', 'lazy', 'model', 'operations', 'polling',
+           'pool', 'scheduler', 'schema', 'transport']
@@ -0,0 +1,49 @@
+""" Files written by Lavviebot Client, shared by the credential stores and the recording transport """
+from __future__ import annotations
+
+from typing import Any
+
+import json
+import os
+import tempfile
+
+
+def atomic_write_json(path: str | os.PathLike, data: Any, **options: Any) -> None:
+    """
+    Write JSON to a temporary file created with 0600 permissions, then move it over the file,
+    so that the file is only readable by its owner and never left half written. The file and
+    its directory are flushed to disk, so that the rename survives a crash.
+    options: Keyword arguments of json.dump
+    """
+
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.lavviebot-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file, **options)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def _fsync_directory(directory: str) -> None:
+    """ Flush the entries of a directory to disk, where directories can be opened """
+
+    try:
+        fd = os.open(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    except OSError:
+        # Directories can't be opened on Windows, whose file systems commit renames themselves
+        return None
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return None
@@ -0,0 +1,68 @@
+""" Re-authentication management for Lavviebot Client """
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+import asyncio
+import time
+
+
+class TokenManager:
+    """
+    Runs logins as a single flight shared by every waiter.
+    Each successful login bumps the generation, which lets requests that saw an
+    expired token skip logging in again when a newer token is already available.
+    """
+
+    def __init__(self, login: Callable[[], Awaitable[Any]]) -> None:
+        """
+        login: Coroutine function obtaining a new cookie and token
+        """
+        self._login = login
+        self._login_task: asyncio.Future | None = None
+        self.generation: int = 0
+        self.login_count: int = 0
+        self.failed_login_count: int = 0
+        self.shared_login_count: int = 0
+        self.login_seconds: float = 0.0
+        self.last_login: float | None = None
+
+    @property
+    def login_in_progress(self) -> bool:
+        """ Whether a login is currently in flight """
+
+        return self._login_task is not None
+
+    async def async_login(self, generation: int | None = None) -> None:
+        """
+        Log in, or wait for the login already in flight.
+        generation: Generation of the token that was rejected. The login is skipped
+        if a newer token has been obtained since.
+        """
+
+        if generation is not None and generation != self.generation:
+            return None
+        if self._login_task is None:
+            self._login_task = asyncio.ensure_future(self._async_login())
+        else:
+            self.shared_login_count += 1
+        # Shielded so that a cancelled waiter doesn't cancel the login other waiters rely on
+        await asyncio.shield(self._login_task)
+        return None
+
+    async def _async_login(self) -> None:
+        """ Run a single login and record its metrics """
+
+        start = time.monotonic()
+        try:
+            await self._login()
+        except BaseException:
+            self.failed_login_count += 1
+            raise
+        else:
+            self.generation += 1
+            self.login_count += 1
+            self.last_login = time.time()
+        finally:
+            self.login_seconds += time.monotonic() - start
+            self._login_task = None
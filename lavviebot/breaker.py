@@ -0,0 +1,236 @@
+""" Circuit breaker failing requests fast while the PurrSong API is unavailable """
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable
+
+import logging
+import time
+
+from .constants import (BREAKER_FAILURE_RATE, BREAKER_HALF_OPEN_REQUESTS, BREAKER_MAX_OPEN_DURATION,
+                        BREAKER_MIN_REQUESTS, BREAKER_OPEN_DURATION, BREAKER_SLOW_CALL_DURATION,
+                        BREAKER_SLOW_CALL_RATE, BREAKER_WINDOW,)
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+
+class BreakerState(Enum):
+    """ State of a circuit breaker """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class BreakerStats:
+    """ Dataclass for circuit breaker statistics. """
+
+    state: BreakerState
+    requests: int
+    failure_rate: float
+    slow_call_rate: float
+    retry_after: float
+    opened: int
+    rejected: int
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker in front of the requests sent to the PurrSong API.
+    Closed, the outcome of every request is kept for `window` seconds. Once at least min_requests
+    were answered over the window, and the share of them that failed or was slower than
+    slow_call_duration reaches its threshold, the breaker opens. Open, requests are rejected without
+    being sent. After open_duration it's half open and lets half_open_requests requests through:
+    it closes once they all succeed in time, and opens again for twice as long otherwise, up to
+    max_open_duration. A breaker can be shared by the clients of every account, as they share the API.
+    """
+
+    def __init__(
+            self, failure_rate: float = BREAKER_FAILURE_RATE,
+            slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+            slow_call_duration: float = BREAKER_SLOW_CALL_DURATION,
+            min_requests: int = BREAKER_MIN_REQUESTS,
+            window: float = BREAKER_WINDOW,
+            open_duration: float = BREAKER_OPEN_DURATION,
+            max_open_duration: float = BREAKER_MAX_OPEN_DURATION,
+            half_open_requests: int = BREAKER_HALF_OPEN_REQUESTS
+    ) -> None:
+        """
+        failure_rate: Share of failed requests over the window the breaker opens at
+        slow_call_rate: Share of requests slower than slow_call_duration over the window the breaker opens at
+        slow_call_duration: Latency in seconds above which a request is slow
+        min_requests: Number of requests answered over the window before the breaker can open
+        window: Seconds the outcome of a request is kept for
+        open_duration: Seconds the breaker stays open the first time
+        max_open_duration: Upper bound of the seconds the breaker stays open after failed half-open requests
+        half_open_requests: Number of requests let through while half open
+        """
+        self.failure_rate: float = failure_rate
+        self.slow_call_rate: float = slow_call_rate
+        self.slow_call_duration: float = slow_call_duration
+        self.min_requests: int = min_requests
+        self.window: float = window
+        self.open_duration: float = open_duration
+        self.max_open_duration: float = max_open_duration
+        self.half_open_requests: int = half_open_requests
+        self.listeners: list[Callable[[BreakerState, BreakerState], None]] = []
+        # Time, whether it failed and whether it was slow, of every request answered over the window
+        self._outcomes: deque[tuple[float, bool, bool]] = deque()
+        self._failures: int = 0
+        self._slow_calls: int = 0
+        self._state: BreakerState = BreakerState.CLOSED
+        self._opened_at: float = 0.0
+        self._open_for: float = open_duration
+        self._probes: int = 0
+        self._probe_successes: int = 0
+        self.opened_count: int = 0
+        self.rejected_count: int = 0
+
+    @property
+    def state(self) -> BreakerState:
+        """ Current state, an open breaker is half open once its open duration has elapsed """
+
+        if self._state is BreakerState.OPEN and time.monotonic() >= self._opened_at + self._open_for:
+            self._transition(BreakerState.HALF_OPEN)
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """ Seconds until an open breaker lets requests through again, 0 when it isn't open """
+
+        if self.state is not BreakerState.OPEN:
+            return 0.0
+        return self._opened_at + self._open_for - time.monotonic()
+
+    @property
+    def stats(self) -> BreakerStats:
+        """ Return the state of the breaker and the outcomes of the requests over the window """
+
+        self._expire(time.monotonic())
+        requests = len(self._outcomes)
+        return BreakerStats(
+            state=self.state,
+            requests=requests,
+            failure_rate=self._failures / requests if requests else 0.0,
+            slow_call_rate=self._slow_calls / requests if requests else 0.0,
+            retry_after=self.retry_after,
+            opened=self.opened_count,
+            rejected=self.rejected_count,
+        )
+
+    def add_listener(self, listener: Callable[[BreakerState, BreakerState], None]) -> None:
+        """ Call a listener with the previous and new state every time the state changes """
+
+        self.listeners.append(listener)
+        return None
+
+    def admit(self) -> BreakerState | None:
+        """
+        Let a request through, returning the state it was admitted in, or None when it's rejected.
+        An admitted request has to be followed by record_success, record_failure or release.
+        """
+
+        state = self.state
+        if state is BreakerState.CLOSED:
+            return state
+        if state is BreakerState.HALF_OPEN and self._probes < self.half_open_requests:
+            self._probes += 1
+            return state
+        self.rejected_count += 1
+        return None
+
+    def reject(self) -> None:
+        """ Count a request rejected without being admitted, because the breaker was open """
+
+        self.rejected_count += 1
+        return None
+
+    def record_success(self, admitted: BreakerState, latency: float) -> None:
+        """ Record a request PurrSong answered, which counts as a failure when it was slow """
+
+        self._record(admitted, False, latency >= self.slow_call_duration)
+        return None
+
+    def record_failure(self, admitted: BreakerState, latency: float) -> None:
+        """ Record a request that failed with a network error, a timeout or a server error """
+
+        self._record(admitted, True, latency >= self.slow_call_duration)
+        return None
+
+    def release(self, admitted: BreakerState) -> None:
+        """ Forget an admitted request whose outcome says nothing of the availability of PurrSong """
+
+        if admitted is BreakerState.HALF_OPEN and self._state is BreakerState.HALF_OPEN:
+            self._probes -= 1
+        return None
+
+    def reset(self) -> None:
+        """ Close the breaker and forget the outcomes of the requests """
+
+        self._transition(BreakerState.CLOSED)
+        return None
+
+    def _record(self, admitted: BreakerState, failed: bool, slow: bool) -> None:
+        """ Record the outcome of a request, unless the state changed since it was admitted """
+
+        state = self.state
+        if admitted is not state:
+            return None
+        if state is BreakerState.HALF_OPEN:
+            if failed or slow:
+                self._open_for = min(self.max_open_duration, self._open_for * 2)
+                self._transition(BreakerState.OPEN)
+                return None
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_requests:
+                self._transition(BreakerState.CLOSED)
+            return None
+
+        now = time.monotonic()
+        self._expire(now)
+        self._outcomes.append((now, failed, slow))
+        self._failures += failed
+        self._slow_calls += slow
+        requests = len(self._outcomes)
+        if requests >= self.min_requests and (
+                self._failures >= self.failure_rate * requests or self._slow_calls >= self.slow_call_rate * requests
+        ):
+            self._transition(BreakerState.OPEN)
+        return None
+
+    def _expire(self, now: float) -> None:
+        """ Drop the outcomes older than the window """
+
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, failed, slow = self._outcomes.popleft()
+            self._failures -= failed
+            self._slow_calls -= slow
+
+    def _transition(self, state: BreakerState) -> None:
+        """ Change the state and notify the listeners """
+
+        previous = self._state
+        self._state = state
+        self._probes = self._probe_successes = 0
+        if state is BreakerState.OPEN:
+            self._opened_at = time.monotonic()
+            self.opened_count += 1
+            LOGGER.warning(f'PurrSong API is unavailable, failing requests fast for {self._open_for:.0f} seconds')
+        else:
+            self._outcomes.clear()
+            self._failures = self._slow_calls = 0
+            if state is BreakerState.CLOSED:
+                self._open_for = self.open_duration
+                if previous is not BreakerState.CLOSED:
+                    LOGGER.info('PurrSong API is available again')
+        if previous is state:
+            return None
+        for listener in self.listeners:
+            try:
+                listener(previous, state)
+            except Exception:
+                LOGGER.exception(f'Circuit breaker listener {listener!r} failed')
+        return None
@@ -0,0 +1,169 @@
+""" Response cache for the operations sent to the PurrSong API """
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import time
+
+from .constants import CACHE_MAX_ENTRIES, CACHE_TTLS
+from .operations import BoundOperation
+
+
+@dataclass
+class CacheStats:
+    """ Dataclass for response cache statistics. """
+
+    hits: int
+    stale_hits: int
+    fallback_hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    size: int
+
+
+class CacheEntry:
+    """ Cached response of a single operation """
+
+    __slots__ = ('name', 'response', 'expires', 'stale_until', 'error_until')
+
+    def __init__(
+            self, name: str, response: dict[str, Any], expires: float, stale_until: float, error_until: float
+    ) -> None:
+        self.name: str = name
+        self.response: dict[str, Any] = response
+        self.expires: float = expires
+        self.stale_until: float = stale_until
+        self.error_until: float = error_until
+
+    @property
+    def stale(self) -> bool:
+        """ Whether the entry is past its TTL and is only served while it's being refreshed """
+
+        return time.monotonic() >= self.expires
+
+
+class ResponseCache:
+    """
+    LRU cache of successful operation responses, keyed by operationName and variables.
+    Every operation has its own TTL, operations without one are never cached.
+    Expired entries can keep being served for stale_while_revalidate seconds while
+    the client refreshes them in the background, and for stale_if_error seconds as
+    a fallback while the circuit breaker of the client is open. Cached responses
+    are shared between callers and must not be mutated.
+    """
+
+    def __init__(
+            self, ttls: dict[str, float] | None = None,
+            max_entries: int = CACHE_MAX_ENTRIES,
+            stale_while_revalidate: float = 0.0,
+            stale_if_error: float = 0.0
+    ) -> None:
+        """
+        ttls: TTL in seconds by operationName, or None to use the default TTLs
+        max_entries: Maximum number of cached responses, the least recently used are evicted first
+        stale_while_revalidate: Seconds an expired response can still be served while it's refreshed
+        stale_if_error: Seconds an expired response can still be served while the PurrSong API is unavailable
+        """
+        self.ttls: dict[str, float] = dict(CACHE_TTLS if ttls is None else ttls)
+        self.max_entries: int = max_entries
+        self.stale_while_revalidate: float = stale_while_revalidate
+        self.stale_if_error: float = stale_if_error
+        self._entries: OrderedDict[bytes, CacheEntry] = OrderedDict()
+        self.hits: int = 0
+        self.stale_hits: int = 0
+        self.fallback_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        """ Return the statistics of the cache """
+
+        return CacheStats(
+            hits=self.hits,
+            stale_hits=self.stale_hits,
+            fallback_hits=self.fallback_hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            size=len(self._entries),
+        )
+
+    def cacheable(self, operation: BoundOperation) -> bool:
+        """ Whether responses of the operation are cached """
+
+        return self.ttls.get(operation.name, 0) > 0
+
+    def lookup(self, operation: BoundOperation) -> CacheEntry | None:
+        """ Return the fresh or still servable entry of an operation, or None """
+
+        if not self.cacheable(operation):
+            return None
+        entry = self._entries.get(operation.body)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        if now < entry.expires:
+            self.hits += 1
+        elif now < entry.stale_until:
+            self.stale_hits += 1
+        else:
+            # Kept as a fallback until it can't be served at all
+            if now >= entry.error_until:
+                del self._entries[operation.body]
+                self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(operation.body)
+        return entry
+
+    def fallback(self, operation: BoundOperation) -> CacheEntry | None:
+        """ Return the entry of an operation that can be served while the PurrSong API is unavailable, or None """
+
+        if not self.cacheable(operation):
+            return None
+        entry = self._entries.get(operation.body)
+        now = time.monotonic()
+        if entry is None or now >= max(entry.stale_until, entry.error_until):
+            self.misses += 1
+            return None
+        if now < entry.expires:
+            self.hits += 1
+        else:
+            self.fallback_hits += 1
+        self._entries.move_to_end(operation.body)
+        return entry
+
+    def store(self, operation: BoundOperation, response: dict[str, Any]) -> None:
+        """ Cache a successful response, evicting the least recently used entries when full """
+
+        ttl = self.ttls.get(operation.name, 0)
+        if ttl <= 0 or 'errors' in response:
+            return None
+        expires = time.monotonic() + ttl
+        self._entries[operation.body] = CacheEntry(
+            operation.name, response, expires, expires + self.stale_while_revalidate, expires + self.stale_if_error
+        )
+        self._entries.move_to_end(operation.body)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return None
+
+    def invalidate(self, operation_name: str | None = None) -> None:
+        """ Drop the cached responses of an operation, or of every operation when None """
+
+        if operation_name is None:
+            self._entries.clear()
+            return None
+        for key in [key for key, entry in self._entries.items() if entry.name == operation_name]:
+            del self._entries[key]
+        return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
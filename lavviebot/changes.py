@@ -0,0 +1,186 @@
+""" Field-level change events between consecutive LavviebotData snapshots """
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from enum import Enum
+from typing import Any, Callable
+
+import asyncio
+import inspect
+import logging
+
+from .model import SECTIONS, LavviebotData
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+
+class ChangeType(Enum):
+    """ Kind of change an entity went through between two snapshots """
+
+    ADDED = "added"
+    REMOVED = "removed"
+    UPDATED = "updated"
+
+
+@dataclass
+class ChangeEvent:
+    """
+    Dataclass for a change of a litter box, LavvieScanner, LavvieTag or cat.
+    ADDED and REMOVED events carry the whole entity in new_value or old_value and have no field.
+    UPDATED events carry the previous and current value of a single field.
+    """
+
+    section: str
+    entity_id: int
+    change_type: ChangeType
+    field: str | None = None
+    old_value: Any = None
+    new_value: Any = None
+
+    @property
+    def added_items(self) -> list:
+        """ Items of a list field, such as error_log, that weren't in its previous value """
+
+        if not isinstance(self.new_value, list):
+            return []
+        old_value = self.old_value if isinstance(self.old_value, list) else []
+        known = {item['id'] if isinstance(item, dict) and 'id' in item else repr(item) for item in old_value}
+        return [
+            item for item in self.new_value
+            if (item['id'] if isinstance(item, dict) and 'id' in item else repr(item)) not in known
+        ]
+
+    def __str__(self) -> str:
+        if self.change_type is ChangeType.UPDATED:
+            return f'{self.section} {self.entity_id} {self.field}: {self.old_value!r} -> {self.new_value!r}'
+        return f'{self.section} {self.entity_id} {self.change_type.value}'
+
+
+class ChangeTracker:
+    """
+    Diffs every snapshot against the previous one, per device and per cat, and delivers
+    the resulting ChangeEvents to subscribed callbacks and queues. Entities that are the
+    same object in both snapshots, such as sections a TieredPoller didn't refresh, are
+    skipped without comparing their fields. An entity whose status failed to be fetched
+    isn't reported as removed, and is diffed against its last known state once it's back.
+    """
+
+    def __init__(self) -> None:
+        self.previous: LavviebotData | None = None
+        self._callbacks: list[Callable[[ChangeEvent], Any]] = []
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    def subscribe(self, callback: Callable[[ChangeEvent], Any]) -> Callable[[], None]:
+        """
+        Call a function, or schedule a coroutine function, for every change event.
+        Returns a function that unsubscribes the callback.
+        """
+
+        self._callbacks.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+        return unsubscribe
+
+    def subscribe_queue(self, maxsize: int = 0) -> asyncio.Queue:
+        """
+        Return a queue every change event is put on. Events are dropped, with a warning,
+        while a bounded queue is full.
+        """
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._queues.append(queue)
+        return queue
+
+    def unsubscribe_queue(self, queue: asyncio.Queue) -> None:
+        """ Stop putting change events on a queue """
+
+        if queue in self._queues:
+            self._queues.remove(queue)
+        return None
+
+    def update(self, data: LavviebotData) -> list[ChangeEvent]:
+        """ Diff a snapshot against the previous one, deliver and return the change events """
+
+        events = self.diff(self.previous, data)
+        self.previous = self._carry_over(self.previous, data)
+        for event in events:
+            self._emit(event)
+        return events
+
+    def reset(self) -> None:
+        """ Forget the previous snapshot, the next one is reported as entirely added """
+
+        self.previous = None
+        return None
+
+    @staticmethod
+    def diff(old: LavviebotData | None, new: LavviebotData) -> list[ChangeEvent]:
+        """ Return the change events between two snapshots """
+
+        events: list = []
+        for section in SECTIONS:
+            old_entities = getattr(old, section) if old is not None else {}
+            new_entities = getattr(new, section)
+            if old_entities is new_entities:
+                continue
+            for entity_id, entity in new_entities.items():
+                previous = old_entities.get(entity_id)
+                if previous is None:
+                    events.append(ChangeEvent(section, entity_id, ChangeType.ADDED, new_value=entity))
+                elif previous is not entity:
+                    for entity_field in fields(entity):
+                        old_value = getattr(previous, entity_field.name)
+                        new_value = getattr(entity, entity_field.name)
+                        if old_value != new_value:
+                            events.append(ChangeEvent(
+                                section, entity_id, ChangeType.UPDATED, entity_field.name, old_value, new_value
+                            ))
+            failed = new.failed.get(section, ())
+            for entity_id, entity in old_entities.items():
+                if entity_id not in new_entities and entity_id not in failed:
+                    events.append(ChangeEvent(section, entity_id, ChangeType.REMOVED, old_value=entity))
+        return events
+
+    @staticmethod
+    def _carry_over(old: LavviebotData | None, new: LavviebotData) -> LavviebotData:
+        """ Return a snapshot holding the previous state of the entities whose status failed in the new one """
+
+        if old is None or not new.failed:
+            return new
+        sections = {section: getattr(new, section) for section in SECTIONS}
+        for section, failed in new.failed.items():
+            old_entities = getattr(old, section)
+            carried = {entity_id: old_entities[entity_id] for entity_id in failed if entity_id in old_entities}
+            if carried:
+                sections[section] = {**sections[section], **carried}
+        return LavviebotData(**sections)
+
+    def _emit(self, event: ChangeEvent) -> None:
+        """ Deliver an event to every callback and queue """
+
+        for callback in list(self._callbacks):
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._callback_done)
+            except Exception:
+                LOGGER.exception(f'Change callback {callback!r} failed on {event}')
+        for queue in self._queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                LOGGER.warning(f'Change queue is full, dropping {event}')
+        return None
+
+    def _callback_done(self, task: asyncio.Task) -> None:
+        """ Log the failure of a coroutine callback """
+
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.error(f'Change callback failed: {task.exception()!r}')
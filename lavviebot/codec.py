@@ -0,0 +1,103 @@
+""" JSON codecs the payloads of requests are encoded with and responses decoded with """
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any
+
+import json
+
+from .exceptions import LavviebotError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JsonCodec(ABC):
+    """
+    Base class of the JSON libraries a client can use. Encoding produces compact UTF-8 bytes,
+    and decoding reads UTF-8 bytes as they were received. Malformed JSON raises ValueError.
+    A codec missing encode or decode can't be instantiated.
+    """
+
+    name: str = ''
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        """ Encode a value to compact JSON bytes """
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        """ Decode JSON bytes """
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}()'
+
+
+class StdlibJsonCodec(JsonCodec):
+    """ Codec using the json module of the standard library, always available """
+
+    name = 'json'
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """ Codec using orjson, which encodes straight to bytes and decodes without an intermediate str """
+
+    name = 'orjson'
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise LavviebotError('orjson is not installed')
+
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    """ Codec using msgspec, whose encoder and decoder are built once and reused """
+
+    name = 'msgspec'
+
+    def __init__(self) -> None:
+        if msgspec is None:
+            raise LavviebotError('msgspec is not installed')
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def encode(self, value: Any) -> bytes:
+        return self._encoder.encode(value)
+
+    def decode(self, data: bytes) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as error:
+            raise ValueError(str(error)) from error
+
+
+def default_codec() -> JsonCodec:
+    """ Return the fastest codec installed: orjson, then msgspec, then the standard library """
+
+    if orjson is not None:
+        return OrjsonCodec()
+    if msgspec is not None:
+        return MsgspecCodec()
+    return StdlibJsonCodec()
+
+
+""" Codec used by clients and operations that aren't given one """
+DEFAULT_CODEC: JsonCodec = default_codec()
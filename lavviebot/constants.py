@@ -13,8 +13,121 @@ APP_VERSION = "3.8.3"
 LANGUAGE = 'en'
 TIME_ZONE = 'America/New_York'
 
+# Maximum time, in seconds, any request may take
 TIMEOUT = 5 * 60
 
+# Timeouts, in seconds, of requests by operationName, a batch has the longest timeout of its operations
+OPERATION_TIMEOUTS = {
+    "CheckServerStatus": 10,
+    "Login": 20,
+    "PurrsongTabLocations": 30,
+    "CatMain": 30,
+    "GetLavviebotDetails": 20,
+    "GetIotPoopRecord": 30,
+    "GetIotErrorLog": 20,
+    "GetLavvieScannerDetails": 20,
+    "GetLavvieTagDetails": 20,
+    "GetUnknownPoopData": 30,
+    "GetCatHealthInfo": 30,
+}
+
+# Time, in seconds, every request sent by async_get_data has to be answered within
+GET_DATA_DEADLINE = 2 * 60
+
+# Retries of requests failing with a network error, a timeout or a server error, and their backoff in seconds
+MAX_TRANSIENT_RETRIES = 2
+TRANSIENT_BACKOFF = 1.0
+TRANSIENT_MAX_BACKOFF = 10.0
+
+# Hedged requests are sent again once slower than this quantile of the latencies of their operations,
+# after that many latencies were observed
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+
+# The circuit breaker opens once, over the last BREAKER_WINDOW seconds and at least BREAKER_MIN_REQUESTS
+# requests, that share of the requests failed or was slower than BREAKER_SLOW_CALL_DURATION seconds
+BREAKER_WINDOW = 60.0
+BREAKER_MIN_REQUESTS = 10
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_SLOW_CALL_DURATION = 10.0
+BREAKER_SLOW_CALL_RATE = 0.8
+
+# Seconds an open circuit breaker fails requests fast, doubled every time its half-open requests fail,
+# and the number of requests it lets through once half open
+BREAKER_OPEN_DURATION = 30.0
+BREAKER_MAX_OPEN_DURATION = 5 * 60
+BREAKER_HALF_OPEN_REQUESTS = 3
+
+# Maximum number of requests a client keeps in flight
+MAX_CONCURRENCY = 4
+
+# Maximum number of operations sent in a single batched request
+MAX_BATCH_SIZE = 30
+
+# Query profile of a client, "full" requests what the app requests and "lean" only what the client parses
+QUERY_PROFILE = "full"
+
+# Maximum number of times a request is retried after its token was rejected
+MAX_RELOGIN_ATTEMPTS = 2
+
+# Error message returned by PurrSong when the token has expired
+LOGIN_EXPIRED = "Please login again."
+
+# Error message returned by PurrSong when requests are rate limited
+RATE_LIMITED = "Too many requests, please try again in a few minutes."
+
+# Request scheduling, rates are expressed in requests per second
+REQUEST_RATE = 2.0
+REQUEST_BURST = 10
+REQUEST_MIN_RATE = 0.05
+REQUEST_MAX_RATE = 20.0
+
+# Backoff, in seconds, after a rate-limit response
+RATE_LIMIT_BACKOFF = 15.0
+RATE_LIMIT_MAX_BACKOFF = 5 * 60
+
+# Maximum number of times a request is queued again after being rate limited
+MAX_RATE_LIMIT_RETRIES = 3
+
+# Tiered polling intervals, in seconds
+ROSTER_INTERVAL = 60 * 60
+LITTER_BOXES_INTERVAL = 30
+LAVVIE_DEVICES_INTERVAL = 5 * 60
+CATS_INTERVAL = 15 * 60
+
+# Maximum number of error log entries kept per litter box
+ERROR_LOG_HISTORY = 100
+
+# History store, retention and flush interval are in seconds
+HISTORY_RETENTION = 30 * 24 * 60 * 60
+HISTORY_FLUSH_INTERVAL = 5.0
+HISTORY_BATCH_SIZE = 500
+
+# Number of readings kept per litter box or cat by an in-memory reading window
+READING_WINDOW_CAPACITY = 10_000
+
+# Client pool
+POOL_CONNECTION_LIMIT = 100
+MAX_CONCURRENT_POLLS = 50
+POOL_LATENCY_SAMPLES = 1000
+
+# Upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Response cache, TTLs are in seconds by operationName
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTLS = {
+    "PurrsongTabLocations": 60 * 60,
+    "CatMain": 60 * 60,
+    "GetLavviebotDetails": 15,
+    "GetIotPoopRecord": 15,
+    "GetIotErrorLog": 60,
+    "GetLavvieScannerDetails": 60,
+    "GetLavvieTagDetails": 60,
+    "GetUnknownPoopData": 5 * 60,
+    "GetCatHealthInfo": 5 * 60,
+}
+
 """ Query needed to obtain cookies. """
 COOKIE_QUERY = "query CheckServerStatus($data: CheckServerStatusArgs!) {checkServerStatus(data: $data)}"
 
@@ -335,3 +448,48 @@ query GetLavvieTagDetails($data: IotIdArgs!) {
   }
 }
 """
+
+""" Lean queries, requesting only the fields the client parses """
+
+LEAN_DISCOVER_DEVICES = "query PurrsongTabLocations {getLocations {id nickname hasUnknownCat getIots " \
+                        "{id lavviebot {nickname} lavvieTag {id nickname} lavvieScanner {nickname}}}}"
+
+LEAN_DISCOVER_CATS = "query CatMain($locationId: Int) {getPets(data: {locationId: $locationId}) " \
+                     "{id lavvieTag {id} cat {id nickname}}}"
+
+LEAN_LB_STATUS = "query GetLavviebotDetails($data: IotIdArgs!) {getIotDetail(data: $data) " \
+                 "{iotCodeTail latestFirmwareVersion lavviebot {routerSSID minBottomWeight beaconBattery " \
+                 "recentLavviebotLog {currentFirmwareVersion motorState topLitterStatus wasteDrawerStatus waitTime " \
+                 "litterType litterBottomAmount humidity temperature creationTime}}}}"
+
+LEAN_LB_CAT_LOG = "query GetIotPoopRecord($data: GetIotPoopRecordArgs!) {getIotPoopRecord(data: $data) " \
+                  "{catUsageHistory {petId nickname duration creationTime} nextCursor}}"
+
+# Error log entries are kept as returned, __typename included
+LEAN_LB_ERROR_LOG = "query GetIotErrorLog($data: GetIotErrorLogArgs!) {getIotErrorLog(data: $data) " \
+                    "{errorLogs {id status creationTime __typename} cursor hasMore}}"
+
+LEAN_UNKNOWN_STATUS = "query GetUnknownPoopData($locationId: Int!, $days: String!, $weight: String!, " \
+                      "$poopCount: String!, $poopDuration: String!) " \
+                      "{weightData: getUnknownPoopData(data: {locationId: $locationId, graphType: $weight, " \
+                      "period: $days}) {today} " \
+                      "poopCount: getUnknownPoopData(data: {locationId: $locationId, graphType: $poopCount, " \
+                      "period: $days}) {today} " \
+                      "poopDuration: getUnknownPoopData(data: {locationId: $locationId, graphType: $poopDuration, " \
+                      "period: $days}) {today}}"
+
+LEAN_CAT_STATUS = "query GetCatHealthInfo($petId: Int!, $days: String!, $weight: String!, $poopCount: String!, " \
+                  "$poopDuration: String!, $date: String) " \
+                  "{weightData: getPoopData(data: {petId: $petId, graphType: $weight, period: $days}) {today} " \
+                  "poopCount: getPoopData(data: {petId: $petId, graphType: $poopCount, period: $days}) {today} " \
+                  "poopDuration: getPoopData(data: {petId: $petId, graphType: $poopDuration, period: $days}) {today} " \
+                  "todayActivity: getCatHourlyData(data: {petId: $petId, date: $date}) " \
+                  "{rest grooming walk run woodadaCount}}"
+
+LEAN_LAVVIE_SCANNER_STATUS = "query GetLavvieScannerDetails($data: IotIdArgs!) {getIotDetail(data: $data) " \
+                             "{iotCodeTail latestFirmwareVersion lavvieScanner {wifiStatus routerSSID " \
+                             "recentLavvieScannerLog {currentFirmwareVersion creationTime}}}}"
+
+LEAN_LAVVIE_TAG_STATUS = "query GetLavvieTagDetails($data: IotIdArgs!) {getIotDetail(data: $data) " \
+                         "{iotCodeTail latestFirmwareVersion pet {id} lavvieTag {currentFirmwareVersion battery " \
+                         "recentConnectionTime}}}"
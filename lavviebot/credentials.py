@@ -0,0 +1,142 @@
+""" Credential stores allowing Lavviebot Client to skip logging in on start """
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from http.cookies import SimpleCookie
+
+from ._files import atomic_write_json
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+
+@dataclass
+class Credentials:
+    """ Dataclass for the credentials obtained by logging in. """
+
+    cookie: dict[str, str]
+    token: str
+    user_id: int
+    has_cat: bool
+
+    @classmethod
+    def from_login(cls, cookie: SimpleCookie, token: str, user_id: int, has_cat: bool) -> Credentials:
+        """ Build credentials from the cookie and token of a login """
+
+        return cls(
+            cookie={key: morsel.value for key, morsel in cookie.items()},
+            token=token,
+            user_id=user_id,
+            has_cat=has_cat,
+        )
+
+    def simple_cookie(self) -> SimpleCookie:
+        """ Return the stored cookie as a SimpleCookie """
+
+        cookie = SimpleCookie()
+        cookie.load(self.cookie)
+        return cookie
+
+
+class CredentialStore(ABC):
+    """
+    Base class of the backends credentials are saved to, keyed by account email.
+    A store missing any of the methods can't be instantiated.
+    """
+
+    @abstractmethod
+    async def async_load(self, email: str) -> Credentials | None:
+        """ Return the saved credentials of an account, or None """
+
+    @abstractmethod
+    async def async_save(self, email: str, credentials: Credentials) -> None:
+        """ Save the credentials of an account """
+
+    @abstractmethod
+    async def async_clear(self, email: str) -> None:
+        """ Forget the credentials of an account """
+
+
+class MemoryCredentialStore(CredentialStore):
+    """ Credential store kept in memory, shared by the clients of a process """
+
+    def __init__(self) -> None:
+        self._credentials: dict[str, Credentials] = {}
+
+    async def async_load(self, email: str) -> Credentials | None:
+        return self._credentials.get(email)
+
+    async def async_save(self, email: str, credentials: Credentials) -> None:
+        self._credentials[email] = credentials
+
+    async def async_clear(self, email: str) -> None:
+        self._credentials.pop(email, None)
+
+
+class FileCredentialStore(CredentialStore):
+    """
+    Credential store kept in a JSON file that is only readable by its owner.
+    The file is replaced atomically on every write, and file access runs in
+    the default executor so that it doesn't block the event loop.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        """
+        path: Path of the JSON file holding the credentials
+        """
+        self.path: str = os.fspath(path)
+        self._lock = threading.Lock()
+
+    async def async_load(self, email: str) -> Credentials | None:
+        data = await asyncio.get_running_loop().run_in_executor(None, self._read)
+        credentials = data.get(email)
+        if credentials is None:
+            return None
+        try:
+            return Credentials(**credentials)
+        except TypeError:
+            LOGGER.warning(f'Ignoring malformed credentials saved in {self.path}')
+            return None
+
+    async def async_save(self, email: str, credentials: Credentials) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._update, email, asdict(credentials))
+
+    async def async_clear(self, email: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._update, email, None)
+
+    def _read(self) -> dict[str, Any]:
+        """ Read every account's credentials from the file """
+
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            LOGGER.warning(f'Ignoring unreadable credential file {self.path}')
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _update(self, email: str, credentials: dict[str, Any] | None) -> None:
+        """ Replace or remove the credentials of one account """
+
+        with self._lock:
+            data = self._read()
+            if credentials is None:
+                data.pop(email, None)
+            else:
+                data[email] = credentials
+            self._write(data)
+
+    def _write(self, data: dict[str, Any]) -> None:
+        """ Replace the file atomically, keeping it only readable by its owner """
+
+        atomic_write_json(self.path, data)
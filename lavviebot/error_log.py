@@ -0,0 +1,77 @@
+""" Incremental tracking of litter box error logs """
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+from .constants import ERROR_LOG_HISTORY
+
+
+class ErrorLogTracker:
+    """
+    Remembers the error log entries already seen for every litter box.
+    Keeps a bounded, deduplicated history per device, most recent first.
+    """
+
+    def __init__(self, max_history: int = ERROR_LOG_HISTORY) -> None:
+        """
+        max_history: Maximum number of error log entries kept per litter box
+        """
+        self.max_history: int = max_history
+        self._history: dict[int, deque[dict[str, Any]]] = {}
+        self._seen: dict[int, set[Any]] = {}
+
+    def synced(self, device_id: int) -> bool:
+        """ Whether the error log of a litter box has been synced before """
+
+        return device_id in self._history
+
+    def last_seen(self, device_id: int) -> Any | None:
+        """ Return the id of the most recent error log entry seen for a litter box """
+
+        history = self._history.get(device_id)
+        return history[0]['id'] if history else None
+
+    def history(self, device_id: int) -> list[dict[str, Any]]:
+        """ Return the error log history of a litter box, most recent first """
+
+        return list(self._history.get(device_id, ()))
+
+    def scan(self, device_id: int, error_logs: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], bool]:
+        """
+        Return the entries of a page, most recent first, that weren't seen before,
+        and whether an entry that was already seen has been reached.
+        """
+
+        seen = self._seen.get(device_id, ())
+        new_errors: list = []
+        for error_log in error_logs:
+            if error_log['id'] in seen:
+                return new_errors, True
+            new_errors.append(error_log)
+        return new_errors, False
+
+    def record(self, device_id: int, new_errors: list[dict[str, Any]]) -> None:
+        """ Add new entries, most recent first, to the history of a litter box """
+
+        history = self._history.setdefault(device_id, deque())
+        seen = self._seen.setdefault(device_id, set())
+        for error_log in reversed(new_errors):
+            if error_log['id'] in seen:
+                continue
+            history.appendleft(error_log)
+            seen.add(error_log['id'])
+        while len(history) > self.max_history:
+            seen.discard(history.pop()['id'])
+        return None
+
+    def reset(self, device_id: int | None = None) -> None:
+        """ Forget the error log of a litter box, or of every litter box when None """
+
+        if device_id is None:
+            self._history.clear()
+            self._seen.clear()
+        else:
+            self._history.pop(device_id, None)
+            self._seen.pop(device_id, None)
+        return None
@@ -23,3 +23,31 @@ class LavviebotRateLimit(Exception):
     def __init__(self, *args: Any) -> None:
         """Initialize the exception."""
         Exception.__init__(self, *args)
+
+class LavviebotSchemaError(LavviebotError):
+    """ Exception to raise when a response is missing a path a model field is read from """
+
+    def __init__(self, *args: Any) -> None:
+        """Initialize the exception."""
+        LavviebotError.__init__(self, *args)
+
+class LavviebotServerError(LavviebotError):
+    """ Exception to raise when PurrSong answers with a server error, which may not happen again """
+
+    def __init__(self, *args: Any) -> None:
+        """Initialize the exception."""
+        LavviebotError.__init__(self, *args)
+
+class LavviebotTimeout(LavviebotError):
+    """ Exception to raise when the deadline of a poll passed before its requests were answered """
+
+    def __init__(self, *args: Any) -> None:
+        """Initialize the exception."""
+        LavviebotError.__init__(self, *args)
+
+class LavviebotCircuitOpen(LavviebotError):
+    """ Exception to raise when a request is failed fast because the circuit breaker is open """
+
+    def __init__(self, *args: Any) -> None:
+        """Initialize the exception."""
+        LavviebotError.__init__(self, *args)
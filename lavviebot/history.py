@@ -0,0 +1,335 @@
+""" Embedded time-series store keeping the history of litter box and cat readings """
+from __future__ import annotations
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+import asyncio
+import logging
+import sqlite3
+import time
+
+from .constants import (HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL, HISTORY_RETENTION,
+                        READING_WINDOW_CAPACITY,)
+from .model import LavviebotData
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+""" Readings recorded for every litter box and cat """
+LITTER_BOX_METRICS = ('litter_bottom_amount_pnds', 'humidity', 'temperature_c')
+CAT_METRICS = ('cat_weight_pnds', 'poop_count')
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS readings ("
+    "kind TEXT NOT NULL, entity_id INTEGER NOT NULL, metric TEXT NOT NULL, ts REAL NOT NULL, value REAL,"
+    " PRIMARY KEY (kind, entity_id, metric, ts)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS readings_ts ON readings (ts)",
+)
+
+
+@dataclass
+class Reading:
+    """ Dataclass for a single recorded reading. """
+
+    timestamp: datetime
+    value: float
+
+
+@dataclass
+class AggregatedReading:
+    """ Dataclass for the readings recorded within one downsampling interval. """
+
+    start: datetime
+    mean: float
+    minimum: float
+    maximum: float
+    count: int
+
+
+class _Columns:
+    """ Timestamps and metric values of one litter box or cat, one array of floats per column """
+
+    __slots__ = ('timestamps', 'values')
+
+    def __init__(self, metrics: tuple[str, ...]) -> None:
+        self.timestamps: array = array('d')
+        self.values: dict[str, array] = {metric: array('d') for metric in metrics}
+
+
+class ReadingWindow:
+    """
+    Rolling in-memory window of the litter box and cat readings of the latest snapshots.
+    Readings are stored in columns, an array of floats per metric, instead of a model
+    instance per snapshot. Missing readings are stored as NaN. Litter box readings are
+    only appended when the litter box reports a new status.
+    """
+
+    def __init__(self, capacity: int = READING_WINDOW_CAPACITY) -> None:
+        """
+        capacity: Number of readings kept per litter box or cat
+        """
+        self.capacity: int = capacity
+        # Columns are trimmed once they outgrow the capacity by this many readings
+        self._slack: int = max(1, capacity // 8)
+        self._columns: dict[tuple[str, int], _Columns] = {}
+
+    def record(self, data: LavviebotData, timestamp: datetime | None = None) -> None:
+        """
+        Append the readings of a snapshot.
+        timestamp: Time cat readings are recorded at, or None for now
+        """
+
+        recorded = timestamp.timestamp() if timestamp else time.time()
+        for device_id, litter_box in data.litterboxes.items():
+            columns = self._columns_of('litterbox', device_id, LITTER_BOX_METRICS)
+            taken = litter_box.last_seen.timestamp()
+            if not columns.timestamps or columns.timestamps[-1] != taken:
+                self._append(columns, taken, litter_box)
+        for cat_id, cat in data.cats.items():
+            self._append(self._columns_of('cat', cat_id, CAT_METRICS), recorded, cat)
+        return None
+
+    def timestamps(self, kind: str, entity_id: int) -> array:
+        """ Epoch timestamps of the readings of a litter box or cat, oldest first """
+
+        columns = self._columns.get((kind, entity_id))
+        return columns.timestamps[-self.capacity:] if columns else array('d')
+
+    def values(self, kind: str, entity_id: int, metric: str) -> array:
+        """ Values of a metric of a litter box or cat, aligned with timestamps() """
+
+        columns = self._columns.get((kind, entity_id))
+        return columns.values[metric][-self.capacity:] if columns else array('d')
+
+    def readings(self, kind: str, entity_id: int, metric: str) -> list[Reading]:
+        """ Readings of a metric of a litter box or cat, oldest first """
+
+        return [
+            Reading(timestamp=datetime.fromtimestamp(ts).astimezone(), value=value)
+            for ts, value in zip(self.timestamps(kind, entity_id), self.values(kind, entity_id, metric))
+        ]
+
+    def _columns_of(self, kind: str, entity_id: int, metrics: tuple[str, ...]) -> _Columns:
+        """ Return the columns of a litter box or cat, created on its first reading """
+
+        columns = self._columns.get((kind, entity_id))
+        if columns is None:
+            columns = self._columns[(kind, entity_id)] = _Columns(metrics)
+        return columns
+
+    def _append(self, columns: _Columns, ts: float, entity: Any) -> None:
+        """ Append a row of readings, trimming the oldest readings in chunks """
+
+        columns.timestamps.append(ts)
+        for metric, values in columns.values.items():
+            value = getattr(entity, metric)
+            values.append(float('nan') if value is None else value)
+        if len(columns.timestamps) > self.capacity + self._slack:
+            excess = len(columns.timestamps) - self.capacity
+            del columns.timestamps[:excess]
+            for values in columns.values.values():
+                del values[:excess]
+        return None
+
+
+class HistoryStore:
+    """
+    SQLite store, in WAL mode, of the litter box and cat readings of every snapshot.
+    Snapshots are recorded without blocking: readings are queued in memory and written
+    in batches by a single background thread. Litter box readings are keyed by the time
+    they were taken, so recording the same status twice doesn't duplicate them. Cat
+    readings are daily totals and are keyed by the time they were recorded.
+    """
+
+    # Minimum number of seconds between two automatic compactions
+    COMPACTION_INTERVAL = 60 * 60
+
+    def __init__(
+            self, path: str,
+            retention: float = HISTORY_RETENTION,
+            flush_interval: float = HISTORY_FLUSH_INTERVAL,
+            batch_size: int = HISTORY_BATCH_SIZE
+    ) -> None:
+        """
+        path: Path of the SQLite database, created if it doesn't exist
+        retention: Seconds readings are kept for before being compacted away, or 0 to keep them forever
+        flush_interval: Seconds readings are queued for before being written
+        batch_size: Number of queued readings that triggers a write before flush_interval
+        """
+        self.path: str = path
+        self.retention: float = retention
+        self.flush_interval: float = flush_interval
+        self.batch_size: int = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lavviebot-history')
+        self._connection: sqlite3.Connection | None = None
+        self._pending: list[tuple] = []
+        self._flush_task: asyncio.Task | None = None
+        self._last_compaction: float = 0.0
+        # Number of readings stored, leaving out the duplicates that were ignored
+        self.written: int = 0
+
+    def record(self, data: LavviebotData, timestamp: datetime | None = None) -> None:
+        """
+        Queue the readings of a snapshot, they are written in the background.
+        timestamp: Time cat readings are recorded at, or None for now
+        """
+
+        recorded = timestamp.timestamp() if timestamp else time.time()
+        for device_id, litter_box in data.litterboxes.items():
+            taken = litter_box.last_seen.timestamp()
+            for metric in LITTER_BOX_METRICS:
+                self._pending.append(('litterbox', device_id, metric, taken, getattr(litter_box, metric)))
+        for cat_id, cat in data.cats.items():
+            for metric in CAT_METRICS:
+                self._pending.append(('cat', cat_id, metric, recorded, getattr(cat, metric)))
+        if self._pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self._async_flush_later())
+        return None
+
+    async def async_flush(self) -> None:
+        """ Write the queued readings now """
+
+        rows, self._pending = self._pending, []
+        if rows:
+            await self._run(self._write, rows)
+        return None
+
+    async def async_readings(
+            self, kind: str, entity_id: int, metric: str,
+            start: datetime | None = None, end: datetime | None = None) -> list[Reading]:
+        """
+        Return the readings of a litter box or cat recorded within a time range, oldest first.
+        kind: One of litterbox or cat
+        start, end: Aware datetimes bounding the range, or None for an open range
+        """
+
+        await self.async_flush()
+        rows = await self._run(
+            self._select,
+            "SELECT ts, value FROM readings WHERE kind = ? AND entity_id = ? AND metric = ?"
+            " AND ts >= ? AND ts < ? ORDER BY ts",
+            (kind, entity_id, metric, *self._range(start, end))
+        )
+        return [Reading(timestamp=datetime.fromtimestamp(ts).astimezone(), value=value) for ts, value in rows]
+
+    async def async_downsample(
+            self, kind: str, entity_id: int, metric: str, interval: float,
+            start: datetime | None = None, end: datetime | None = None) -> list[AggregatedReading]:
+        """
+        Return the readings of a litter box or cat aggregated over fixed intervals, oldest first.
+        Intervals without readings are left out.
+        interval: Length of each interval in seconds
+        """
+
+        await self.async_flush()
+        rows = await self._run(
+            self._select,
+            "SELECT CAST(ts / ? AS INTEGER) AS bucket, AVG(value), MIN(value), MAX(value), COUNT(value)"
+            " FROM readings WHERE kind = ? AND entity_id = ? AND metric = ? AND ts >= ? AND ts < ?"
+            " GROUP BY bucket ORDER BY bucket",
+            (interval, kind, entity_id, metric, *self._range(start, end))
+        )
+        return [
+            AggregatedReading(
+                start=datetime.fromtimestamp(bucket * interval).astimezone(),
+                mean=mean,
+                minimum=minimum,
+                maximum=maximum,
+                count=count
+            )
+            for bucket, mean, minimum, maximum, count in rows
+        ]
+
+    async def async_compact(self, retention: float | None = None) -> int:
+        """
+        Delete the readings older than the retention period and return how many were deleted.
+        retention: Seconds readings are kept for, or None to use the retention of the store
+        """
+
+        retention = self.retention if retention is None else retention
+        if retention <= 0:
+            return 0
+        await self.async_flush()
+        self._last_compaction = time.monotonic()
+        return await self._run(self._delete_before, time.time() - retention)
+
+    async def async_close(self) -> None:
+        """ Write the queued readings and close the database """
+
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.async_flush()
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+        return None
+
+    async def _async_flush_later(self) -> None:
+        """ Write the queued readings once flush_interval elapsed or batch_size readings are queued """
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._pending) < self.batch_size and time.monotonic() < deadline:
+            await asyncio.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+        try:
+            await self.async_flush()
+            if self.retention > 0 and time.monotonic() - self._last_compaction >= self.COMPACTION_INTERVAL:
+                await self.async_compact()
+        except sqlite3.Error as error:
+            LOGGER.error(f'Readings could not be written to {self.path}: {error}')
+        return None
+
+    async def _run(self, func, *args):
+        """ Run a database call on the thread owning the connection """
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _range(start: datetime | None, end: datetime | None) -> tuple[float, float]:
+        """ Epoch bounds of an optional time range """
+
+        return (
+            start.timestamp() if start else float('-inf'),
+            end.timestamp() if end else float('inf')
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """ Open the database on first use """
+
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _write(self, rows: list[tuple]) -> None:
+        """ Insert a batch of readings in a single transaction, ignoring the readings already stored """
+
+        connection = self._connect()
+        with connection:
+            cursor = connection.executemany("INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?, ?)", rows)
+        self.written += cursor.rowcount
+
+    def _select(self, query: str, parameters: tuple) -> list[tuple]:
+        """ Run a query and return every row """
+
+        return self._connect().execute(query, parameters).fetchall()
+
+    def _delete_before(self, ts: float) -> int:
+        """ Delete the readings taken before an epoch timestamp """
+
+        connection = self._connect()
+        with connection:
+            return connection.execute("DELETE FROM readings WHERE ts < ?", (ts,)).rowcount
+
+    def _close(self) -> None:
+        """ Close the connection, if it was opened """
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,341 @@
+""" Per-operation metrics, callback hooks and tracing spans of the requests sent to the PurrSong API """
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator
+
+import logging
+import re
+import time
+
+from .constants import LATENCY_BUCKETS
+from .operations import BoundOperation
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+# Bytes up to the next bracket, skipping the strings whole so that the brackets they hold aren't matched.
+# Unrolled so that every run of bytes matches one way only, without backtracking.
+_TO_BRACKET = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*([\[\]{}])')
+
+
+def element_sizes(body: bytes) -> list[int]:
+    """ Bytes of every element of a JSON array of objects or arrays, as it was received, empty for anything else """
+
+    if not body.lstrip().startswith(b'['):
+        return []
+    sizes: list = []
+    depth = 0
+    start = 0
+    for match in _TO_BRACKET.finditer(body):
+        index = match.start(1)
+        if body[index] in b'[{':
+            depth += 1
+            if depth == 2:
+                start = index
+        else:
+            if depth == 2:
+                sizes.append(index + 1 - start)
+            depth -= 1
+    return sizes
+
+
+class Histogram:
+    """ Latencies counted into fixed buckets, with their exact count, sum, minimum and maximum """
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self, bounds: Iterable[float] = LATENCY_BUCKETS) -> None:
+        """
+        bounds: Upper bounds of the buckets in seconds, in increasing order.
+                Values above the last bound are counted in an overflow bucket.
+        """
+        self.bounds: tuple[float, ...] = tuple(bounds)
+        self.counts: list[int] = [0] * (len(self.bounds) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.minimum: float | None = None
+        self.maximum: float | None = None
+
+    @property
+    def mean(self) -> float:
+        """ Mean of the observed values, 0 when there are none """
+
+        return self.total / self.count if self.count else 0.0
+
+    def observe(self, value: float) -> None:
+        """ Count a value """
+
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        return None
+
+    def quantile(self, q: float) -> float:
+        """ Upper bound of the bucket holding the q quantile, the maximum for the overflow bucket """
+
+        if not self.count:
+            return 0.0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bounds[index], self.maximum) if index < len(self.bounds) else self.maximum
+        return self.maximum
+
+    def __repr__(self) -> str:
+        return f'Histogram(count={self.count}, mean={self.mean:.4f}, p95={self.quantile(0.95):.4f})'
+
+
+@dataclass
+class OperationStats:
+    """
+    Dataclass for the statistics of one operationName.
+    A batched request counts as a request of every operation it carries, with the latency and status of the request,
+    and the bytes of the element of its response answering the operation.
+    """
+
+    name: str
+    requests: int = 0
+    batched_requests: int = 0
+    failed_requests: int = 0
+    graphql_errors: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    latency: Histogram = field(default_factory=Histogram)
+
+
+@dataclass
+class RequestRecord:
+    """ Dataclass for one request sent to the PurrSong API, as passed to the hooks. """
+
+    operations: list[str]
+    attempt: int
+    latency: float
+    request_bytes: int
+    response_bytes: int
+    status: int | None = None
+    error: BaseException | None = None
+
+
+class InstrumentationHook:
+    """
+    Base class of the callbacks notified by Instrumentation. Every method does nothing by default,
+    subclasses override the ones they need. Exceptions raised by a hook are logged and ignored.
+    """
+
+    def on_request(self, record: RequestRecord) -> None:
+        """ Called when a request has been answered or has failed """
+
+    def on_retry(self, operations: list[str], attempt: int, reason: str) -> None:
+        """ Called before a request is sent again, reason is rate_limited, login_expired, transient or hedged """
+
+    def on_relogin(self, operations: list[str]) -> None:
+        """ Called when the token of a request was rejected and the client logs in again """
+
+    def on_rate_limited(self, operations: list[str], backoff: float) -> None:
+        """ Called when a request was rate limited, backoff is the delay in seconds before the next one """
+
+    def on_phase(self, phase: str, seconds: float) -> None:
+        """ Called when a phase of async_get_data has ended """
+
+
+class RequestTrace:
+    """ Timing, spans and byte count of one request while it's in flight """
+
+    __slots__ = ('_instrumentation', 'operations', 'attempt', 'request_bytes', '_start', '_spans')
+
+    def __init__(
+            self, instrumentation: Instrumentation,
+            operations: list[BoundOperation], request_bytes: int, attempt: int
+    ) -> None:
+        self._instrumentation: Instrumentation = instrumentation
+        self.operations: list[BoundOperation] = operations
+        self.attempt: int = attempt
+        self.request_bytes: int = request_bytes
+        self._spans: list = []
+        tracer = instrumentation.tracer
+        if tracer is not None:
+            for operation in operations:
+                self._spans.append(tracer.start_span(f'PurrSong {operation.name}', attributes={
+                    'graphql.operation.name': operation.name,
+                    'lavviebot.batch_size': len(operations),
+                    'lavviebot.attempt': attempt,
+                    'lavviebot.request_bytes': len(operation.body),
+                }))
+        self._start: float = time.perf_counter()
+
+    def finish(self, status: int, body: bytes, response: Any) -> None:
+        """
+        Record an answered request.
+        body: Body of the response, as it was received
+        response: Decoded response, a list for batched requests
+        """
+
+        latency = time.perf_counter() - self._start
+        responses = response if isinstance(response, list) else [response]
+        # Measured on the body, so that every operation of a batch is given the bytes of its own answer
+        sizes = element_sizes(body) if len(self.operations) > 1 else [len(body)]
+        if len(sizes) != len(self.operations):
+            # Not counted rather than guessed when the body can't be split into the answer of every operation
+            sizes = [0] * len(self.operations)
+        for operation, size, answer in zip(self.operations, sizes, responses):
+            stats = self._instrumentation._record(operation, latency, len(self.operations) > 1)
+            stats.response_bytes += size
+            stats.statuses[status] += 1
+            if isinstance(answer, dict) and 'errors' in answer:
+                stats.graphql_errors += 1
+        for span, size in zip(self._spans, sizes):
+            span.set_attribute('http.response.status_code', status)
+            span.set_attribute('lavviebot.response_bytes', size)
+            span.end()
+        self._instrumentation._notify('on_request', RequestRecord(
+            [operation.name for operation in self.operations], self.attempt, latency,
+            self.request_bytes, len(body), status
+        ))
+        return None
+
+    def fail(self, error: BaseException, status: int | None = None) -> None:
+        """ Record a request that failed, with the status of its response when there was one """
+
+        latency = time.perf_counter() - self._start
+        for operation in self.operations:
+            stats = self._instrumentation._record(operation, latency, len(self.operations) > 1)
+            stats.failed_requests += 1
+            if status is not None:
+                stats.statuses[status] += 1
+        for span in self._spans:
+            if status is not None:
+                span.set_attribute('http.response.status_code', status)
+            span.set_attribute('error.type', type(error).__name__)
+            span.record_exception(error)
+            span.end()
+        self._instrumentation._notify('on_request', RequestRecord(
+            [operation.name for operation in self.operations], self.attempt, latency,
+            self.request_bytes, 0, status, error
+        ))
+        return None
+
+
+class Instrumentation:
+    """
+    Collects the metrics of the requests of one or more clients: a latency histogram, byte counts
+    and status codes per operationName, and the number of retries, re-logins and rate-limit hits.
+    Every request and event is passed on to the hooks. When a tracer is given, every operation
+    sent gets a span, and every phase of async_get_data gets a span the operations are nested in.
+    The tracer can be an OpenTelemetry Tracer, or any object with the same start_span and
+    start_as_current_span methods.
+    """
+
+    def __init__(
+            self, hooks: Iterable[InstrumentationHook] = (),
+            tracer: Any | None = None,
+            buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> None:
+        """
+        hooks: InstrumentationHooks notified of every request and event
+        tracer: OpenTelemetry-compatible tracer spans are started with, or None
+        buckets: Upper bounds in seconds of the latency histogram buckets
+        """
+        self.hooks: list[InstrumentationHook] = list(hooks)
+        self.tracer: Any | None = tracer
+        self.buckets: tuple[float, ...] = tuple(buckets)
+        self.operations: dict[str, OperationStats] = {}
+        self.phases: dict[str, Histogram] = {}
+        self.requests: int = 0
+        self.retries: int = 0
+        self.relogins: int = 0
+        self.rate_limited: int = 0
+
+    def add_hook(self, hook: InstrumentationHook) -> None:
+        """ Notify a hook of every request and event from now on """
+
+        self.hooks.append(hook)
+        return None
+
+    def start_request(self, operations: list[BoundOperation], request_bytes: int, attempt: int = 0) -> RequestTrace:
+        """ Start timing a request, its RequestTrace has to be finished or failed """
+
+        self.requests += 1
+        return RequestTrace(self, operations, request_bytes, attempt)
+
+    def record_retry(self, operations: list[BoundOperation], attempt: int, reason: str) -> None:
+        """ Count a request being sent again """
+
+        self.retries += 1
+        self._notify('on_retry', [operation.name for operation in operations], attempt, reason)
+        return None
+
+    def record_relogin(self, operations: list[BoundOperation]) -> None:
+        """ Count a re-login after the token of a request was rejected """
+
+        self.relogins += 1
+        self._notify('on_relogin', [operation.name for operation in operations])
+        return None
+
+    def record_rate_limited(self, operations: list[BoundOperation], backoff: float) -> None:
+        """ Count a rate-limited request """
+
+        self.rate_limited += 1
+        self._notify('on_rate_limited', [operation.name for operation in operations], backoff)
+        return None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """ Time a phase of async_get_data, in a span when there's a tracer """
+
+        span = self.tracer.start_as_current_span(f'lavviebot {name}') if self.tracer is not None else None
+        start = time.perf_counter()
+        try:
+            if span is None:
+                yield
+            else:
+                with span:
+                    yield
+        finally:
+            seconds = time.perf_counter() - start
+            if name not in self.phases:
+                self.phases[name] = Histogram(self.buckets)
+            self.phases[name].observe(seconds)
+            self._notify('on_phase', name, seconds)
+
+    def slowest(self, count: int = 5) -> list[OperationStats]:
+        """ Operations that took the most time in total, slowest first """
+
+        return sorted(self.operations.values(), key=lambda stats: stats.latency.total, reverse=True)[:count]
+
+    def reset(self) -> None:
+        """ Forget every metric, the hooks and tracer are kept """
+
+        self.operations.clear()
+        self.phases.clear()
+        self.requests = self.retries = self.relogins = self.rate_limited = 0
+        return None
+
+    def _record(self, operation: BoundOperation, latency: float, batched: bool) -> OperationStats:
+        """ Count a request of an operation and return the statistics of the operation """
+
+        stats = self.operations.get(operation.name)
+        if stats is None:
+            stats = self.operations[operation.name] = OperationStats(operation.name, latency=Histogram(self.buckets))
+        stats.requests += 1
+        stats.batched_requests += batched
+        stats.request_bytes += len(operation.body)
+        stats.latency.observe(latency)
+        return stats
+
+    def _notify(self, method: str, *args: Any) -> None:
+        """ Call a method of every hook """
+
+        for hook in self.hooks:
+            try:
+                getattr(hook, method)(*args)
+            except Exception:
+                LOGGER.exception(f'Instrumentation hook {hook!r} failed in {method}')
+        return None
@@ -1,81 +1,268 @@
 """Python API for Lavviebot S Litter Box"""
 from __future__ import annotations
 
-from typing import Any, Tuple
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from typing import Any, AsyncIterator, Awaitable, Callable, ContextManager, Iterable, Iterator, Tuple
 
 from datetime import date, datetime
-from zoneinfo import ZoneInfo
 
 import asyncio
 import logging
+import random
+import time
 
 from http.cookies import SimpleCookie
 
-from aiohttp import ClientResponse, ClientSession
-
-from .exceptions import LavviebotAuthError, LavviebotError, LavviebotRateLimit
-from .model import Cat, LavviebotData, LavvieScanner, LavvieTag, LitterBox
-from .constants import (ACCEPT, ACCEPT_ENCODING, ACCEPT_LANGUAGE,
-                        APP_VERSION, BASE_URL, CAT_STATUS, CONNECTION,
-                        CONTENT_TYPE, COOKIE_QUERY, DISCOVER_CATS,
-                        DISCOVER_DEVICES, LANGUAGE, LAVVIE_SCANNER_STATUS,
-                        LAVVIE_TAG_STATUS, LB_CAT_LOG, LB_ERROR_LOG, LB_STATUS,
-                        TIMEOUT, TIME_ZONE, TOKEN_QUERY, UNKNOWN_STATUS, USER_AGENT,)
+from aiohttp import ClientError, ClientSession
+
+from .auth import TokenManager
+from .breaker import BreakerState, CircuitBreaker
+from .cache import ResponseCache
+from .changes import ChangeTracker
+from .codec import DEFAULT_CODEC, JsonCodec
+from .credentials import Credentials, CredentialStore
+from .error_log import ErrorLogTracker
+from .exceptions import (LavviebotAuthError, LavviebotCircuitOpen, LavviebotError, LavviebotRateLimit,
+                         LavviebotSchemaError, LavviebotServerError, LavviebotTimeout,)
+from .history import HistoryStore
+from .instrumentation import Histogram, Instrumentation
+from .model import SECTIONS, Cat, LavviebotData, LavvieScanner, LavvieTag, LitterBox, Roster, RosterFilter
+from .constants import (APP_VERSION, BASE_URL, GET_DATA_DEADLINE, HEDGE_MIN_SAMPLES, HEDGE_QUANTILE,
+                        LANGUAGE, LOGIN_EXPIRED, MAX_BATCH_SIZE, MAX_CONCURRENCY,
+                        MAX_RATE_LIMIT_RETRIES, MAX_RELOGIN_ATTEMPTS, MAX_TRANSIENT_RETRIES,
+                        OPERATION_TIMEOUTS, QUERY_PROFILE, RATE_LIMITED, TIMEOUT, TIME_ZONE,
+                        TRANSIENT_BACKOFF, TRANSIENT_MAX_BACKOFF,)
+from .operations import (CHECK_SERVER_STATUS, LOGIN, QUERY_PROFILES, BoundOperation, Operation,
+                         build_headers, encode_batch,)
+from .scheduler import RequestScheduler
+from .schema import (CAT_HEALTH, LAVVIE_SCANNER_DETAILS, LAVVIE_TAG_DETAILS, LITTER_BOX_DETAILS,
+                     LITTER_BOX_LAST_USAGE,)
+from .transport import AiohttpTransport, Transport, TransportResponse
 
 LOGGER = logging.getLogger("lavviebotaio")
 
+# Failures of a request that may not happen again when it is sent again
+TRANSIENT_ERRORS = (ClientError, asyncio.TimeoutError, LavviebotServerError)
+
+# Time on the monotonic clock by which the requests of the current poll have to be answered, copied into its tasks
+_deadline: ContextVar[float | None] = ContextVar('lavviebot_deadline', default=None)
+
+
+def _time_left() -> float | None:
+    """ Seconds left until the deadline of the current poll, None when it has no deadline """
+
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _ensure_future_without_deadline(coroutine: Awaitable) -> asyncio.Future:
+    """
+    Start a task that doesn't inherit the deadline of the current poll, for work that
+    outlives the poll or is shared with callers that have a deadline of their own
+    """
+
+    context = copy_context()
+    context.run(_deadline.set, None)
+    return context.run(asyncio.ensure_future, coroutine)
+
+
+async def _gather(*aws: Awaitable) -> list:
+    """ Gather awaitables concurrently, cancelling the remaining ones if any of them fails """
+
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _login_expired(response: dict[str, Any] | list[dict[str, Any]]) -> bool:
+    """ Whether the token of a request was rejected by PurrSong """
+
+    for resp in response if isinstance(response, list) else [response]:
+        if 'errors' in resp and resp['errors'][0]['message'] == LOGIN_EXPIRED:
+            return True
+    return False
+
+
+def _batch_failed(name: str, *responses: dict[str, Any]) -> bool:
+    """ Log and report whether any of the batched responses belonging to one device or cat failed """
+
+    for response in responses:
+        if 'errors' in response:
+            LOGGER.error(f'{name} could not be fetched: {response["errors"]}')
+            return True
+    return False
+
+
+def _parse(name: str, parser: Callable[..., Any], *args: Any) -> Any | None:
+    """ Parse a device or cat, logging and returning None when its response doesn't have the expected shape """
+
+    try:
+        try:
+            return parser(*args)
+        except (KeyError, IndexError, TypeError, AttributeError, ValueError) as error:
+            # Raised by the paths read outside of the schemas, on a missing or null container or an invalid value
+            raise LavviebotSchemaError(f'{name} response has an unexpected shape: {error!r}') from error
+    except LavviebotSchemaError as error:
+        LOGGER.error(f'{name} could not be parsed: {error}')
+        return None
+
+
 class LavviebotClient:
     """Lavviebot Client"""
 
     def __init__(
             self, email: str, password: str,
             session: ClientSession | None = None,
-            timeout: int = TIMEOUT
+            timeout: int = TIMEOUT,
+            max_concurrency: int = MAX_CONCURRENCY,
+            max_batch_size: int = MAX_BATCH_SIZE,
+            max_relogin_attempts: int = MAX_RELOGIN_ATTEMPTS,
+            credential_store: CredentialStore | None = None,
+            scheduler: RequestScheduler | None = None,
+            max_rate_limit_retries: int = MAX_RATE_LIMIT_RETRIES,
+            cache: ResponseCache | None = None,
+            error_logs: ErrorLogTracker | None = None,
+            history: HistoryStore | None = None,
+            changes: ChangeTracker | None = None,
+            query_profile: str = QUERY_PROFILE,
+            codec: JsonCodec | None = None,
+            base_url: str = BASE_URL,
+            instrumentation: Instrumentation | None = None,
+            transport: Transport | None = None,
+            operation_timeouts: dict[str, float] | None = None,
+            get_data_deadline: float | None = GET_DATA_DEADLINE,
+            max_transient_retries: int = MAX_TRANSIENT_RETRIES,
+            hedge: bool = False,
+            breaker: CircuitBreaker | None = None
     ) -> None:
         """
         email: PurrSong App account email
         password: PurrSong App account password
-        session: aiohttp.ClientSession or None to create a new session
+        session: aiohttp.ClientSession or None to create a new session, unused when a transport is given
+        timeout: Maximum time in seconds any request may take
+        max_concurrency: Maximum number of requests in flight at any one time
+        max_batch_size: Maximum number of operations sent in a single batched request
+        max_relogin_attempts: Maximum number of times a request is retried after its token was rejected
+        credential_store: Store the cookie and token are saved to and restored from, or None
+        scheduler: RequestScheduler pacing the requests of this client, or None to create a new one
+        max_rate_limit_retries: Maximum number of times a rate limited request is queued again
+        cache: ResponseCache responses are served from, or None to disable caching
+        error_logs: ErrorLogTracker remembering the error logs already synced, or None to create a new one
+        history: HistoryStore the litter box and cat readings of every snapshot are recorded to, or None
+        changes: ChangeTracker every snapshot is diffed by, or None
+        query_profile: Name of the QUERY_PROFILES the operations are sent with, "full" or "lean"
+        codec: JsonCodec requests are encoded and responses decoded with, or None to use the fastest one installed
+        base_url: URL of the PurrSong GraphQL API, or of a server standing in for it
+        instrumentation: Instrumentation the requests and async_get_data phases are recorded to, or None
+        transport: Transport requests are sent with, or None to send them over the aiohttp session
+        operation_timeouts: Timeouts in seconds of requests by operationName, or None to use OPERATION_TIMEOUTS
+        get_data_deadline: Time in seconds every request of async_get_data has to be answered within, or None
+        max_transient_retries: Maximum number of times a request failing with a network error, a timeout
+                               or a server error is sent again
+        hedge: Whether queries slower than the HEDGE_QUANTILE of their latencies are sent a second time,
+               answering with the response that arrives first
+        breaker: CircuitBreaker failing requests fast while the PurrSong API is unavailable, or None.
+                 While it's open, cached responses are served for as long as the cache's stale_if_error.
         """
+        if query_profile not in QUERY_PROFILES:
+            raise LavviebotError(f'Unsupported query_profile: {query_profile}')
         self.email: str = email
         self.password: str = password
-        self._session = session if session else ClientSession()
+        self.transport: Transport = transport if transport else AiohttpTransport(session)
         self.cookie: SimpleCookie | None = None
         self.token: str | None = None
         self.has_cat: bool | None = None
         self.user_id: int | None = None
         self.timeout: int = timeout
+        self.max_concurrency: int = max_concurrency
+        # Created on first use, as it binds to the event loop current when it's created before Python 3.10
+        self._semaphore: asyncio.Semaphore | None = None
+        self.max_batch_size: int = max_batch_size
+        self._headers_key: tuple | None = None
+        self._headers_cache: dict[str, str] = {}
+        self.max_relogin_attempts: int = max_relogin_attempts
+        self._token_manager = TokenManager(self._async_authenticate)
+        self.credential_store: CredentialStore | None = credential_store
+        self.scheduler: RequestScheduler = scheduler if scheduler else RequestScheduler()
+        self.max_rate_limit_retries: int = max_rate_limit_retries
+        self.cache: ResponseCache | None = cache
+        self._revalidating: dict[bytes, asyncio.Future] = {}
+        self._in_flight: dict[bytes | tuple[bytes, ...], asyncio.Future] = {}
+        self.coalesced_requests: int = 0
+        self.error_logs: ErrorLogTracker = error_logs if error_logs else ErrorLogTracker()
+        self.history: HistoryStore | None = history
+        self.changes: ChangeTracker | None = changes
+        self.query_profile: str = query_profile
+        self.operations: dict[str, Operation] = QUERY_PROFILES[query_profile]
+        self.codec: JsonCodec = codec if codec else DEFAULT_CODEC
+        self.base_url: str = base_url
+        self.instrumentation: Instrumentation | None = instrumentation
+        self.operation_timeouts: dict[str, float] = (
+            operation_timeouts if operation_timeouts is not None else OPERATION_TIMEOUTS
+        )
+        self.get_data_deadline: float | None = get_data_deadline
+        self.max_transient_retries: int = max_transient_retries
+        self.hedge: bool = hedge
+        self.hedged_requests: int = 0
+        self.hedge_wins: int = 0
+        self._latencies: dict[tuple[str, ...], Histogram] = {}
+        self.breaker: CircuitBreaker | None = breaker
+
+    @property
+    def token_manager(self) -> TokenManager:
+        """ Token manager running the logins of this client, exposes login metrics """
+
+        return self._token_manager
 
     async def login(self) -> None:
-        """ Get cookie and token to be used in subsequent API calls """
+        """
+        Get cookie and token to be used in subsequent API calls.
+        Concurrent callers share a single login.
+        """
+
+        await self._token_manager.async_login()
+        return None
+
+    async def _async_authenticate(self) -> None:
+        """
+        Obtain a new cookie and token from PurrSong.
+        On the first login, credentials saved in the credential store are used instead.
+        They are only replaced once PurrSong rejects the saved token.
+        """
+
+        if self.token is None and self.credential_store is not None:
+            credentials = await self.credential_store.async_load(self.email)
+            if credentials is not None:
+                LOGGER.debug('Using credentials restored from the credential store')
+                self.cookie = credentials.simple_cookie()
+                self.token = credentials.token
+                self.has_cat = credentials.has_cat
+                self.user_id = credentials.user_id
+                return None
 
         self.cookie = await self.get_cookie()
         self.token, self.has_cat, self.user_id = await self.get_token()
+        if self.credential_store is not None:
+            await self.credential_store.async_save(
+                self.email, Credentials.from_login(self.cookie, self.token, self.user_id, self.has_cat)
+            )
         return None
 
     async def get_cookie(self) -> SimpleCookie:
         """ Get cookie by checking PurrSong server status """
 
-        headers = {
-            'Accept': ACCEPT,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-
-        cookie_payload = {
-            "operationName": "CheckServerStatus",
-            "variables": {
-                "data": {
-                    "language": LANGUAGE
-                }
-            },
-            "query": COOKIE_QUERY
-        }
+        cookie_payload = CHECK_SERVER_STATUS.bind({
+            "data": {
+                "language": LANGUAGE
+            }
+        }, self.codec)
 
-        response = await self._post(headers, cookie_payload, is_cookie=True)
+        response = await self._post(build_headers(), cookie_payload, is_cookie=True)
         return response
 
     async def get_token(self) -> Tuple:
@@ -83,30 +270,17 @@ class LavviebotClient:
 
         if self.cookie is None:
             await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        token_payload = {
-            "operationName": "Login",
-            "variables": {
-                "data": {
-                    "email": self.email,
-                    "password": self.password,
-                    "appVersion": APP_VERSION,
-                    "timezone": TIME_ZONE,
-                    "timezoneCountry": "US"
-                }
-            },
-            "query": TOKEN_QUERY
-        }
+        token_payload = LOGIN.bind({
+            "data": {
+                "email": self.email,
+                "password": self.password,
+                "appVersion": APP_VERSION,
+                "timezone": TIME_ZONE,
+                "timezoneCountry": "US"
+            }
+        }, self.codec)
 
-        response = await self._post(headers, token_payload)
+        response = await self._post(build_headers(self.cookie), token_payload)
         if 'errors' in response:
             message = response['errors'][0]['message']
             raise LavviebotAuthError(message)
@@ -117,75 +291,47 @@ class LavviebotClient:
     async def async_discover_cats(self, location_id: int) -> dict[str, Any]:
         """ Gets all cats linked to PurrSong account """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        dc_payload = {
-            "operationName": "CatMain",
-            "variables": {
-                "includeLavvieCare": True,
-                "includeLavvieTag": True,
-                "includeDetailCatInfo": True,
-                "includeLocation": True,
-                "locationId": location_id
-            },
-            "query": DISCOVER_CATS
-        }
-        response = await self._post(headers, dc_payload)
+        dc_payload = self._discover_cats_payload(location_id)
+        response = await self._async_query(dc_payload)
         if 'errors' in response:
-            message = response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_discover_cats(location_id)
-            else:
-                raise LavviebotError(message)
-        else:
-            return response
+            raise LavviebotError(response['errors'][0]['message'])
+        return response
 
 
     async def async_discover_devices(self) -> dict[str, Any]:
         """ Gets all iot devices linked to PurrSong account """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        dlb_payload = {
-            "operationName": "PurrsongTabLocations",
-            "variables": {},
-            "query": DISCOVER_DEVICES
-        }
-        response = await self._post(headers, dlb_payload)
+        dlb_payload = self.operations["PurrsongTabLocations"].bind({}, self.codec)
+        response = await self._async_query(dlb_payload)
         if 'errors' in response:
-            message = response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_discover_litter_boxes()
-            else:
-                raise LavviebotError(message)
-        else:
-            return response
+            raise LavviebotError(response['errors'][0]['message'])
+        return response
 
+    async def async_get_data(
+            self, roster_filter: RosterFilter | None = None, deadline: float | None = None) -> LavviebotData:
+        """
+        Return dataclass with litter boxes and cats associated with account.
+        roster_filter: RosterFilter selecting the devices and cats to fetch, or None to fetch everything.
+                       Filtered snapshots aren't passed to the ChangeTracker of the client.
+        deadline: Time in seconds every request has to be answered within, or None to use get_data_deadline.
+                  LavviebotTimeout is raised once it has passed.
+        """
 
-    async def async_get_data(self) -> LavviebotData:
-        """ Return dataclass with litter boxes and cats associated with account """
+        with self.deadline(deadline if deadline is not None else self.get_data_deadline), self._phase('get_data'):
+            with self._phase('discovery'):
+                roster = await self.async_get_roster(roster_filter=roster_filter)
+            purrsong_data = await self.async_get_sections(roster)
+        LOGGER.debug(f'Purrsong API data returned: {purrsong_data}')
+        if self.changes is not None and roster_filter is None:
+            self.changes.update(purrsong_data)
+        return purrsong_data
+
+    async def async_get_roster(self, include_cats: bool = True, roster_filter: RosterFilter | None = None) -> Roster:
+        """
+        Discover the devices of the account, and the cats of every location in a single batch.
+        include_cats: Whether to discover the cats too, see async_discover_roster_cats
+        roster_filter: RosterFilter applied to the discovered devices and cats, or None to keep them all
+        """
 
         if self.cookie is None or self.token is None:
             await self.login()
@@ -197,6 +343,8 @@ class LavviebotClient:
         locations = response['data']['getLocations']
         for location in locations:
             for device in location['getIots']:
+                if roster_filter is not None and not roster_filter.includes_device(device):
+                    continue
                 if device['lavviebot']:
                     litter_boxes.append(device)
                 if device['lavvieScanner']:
@@ -204,391 +352,265 @@ class LavviebotClient:
                 if device['lavvieTag']:
                     lavvie_tags.append(device)
 
-        # Handle Litter boxes
-        litter_box_data: dict[int, LitterBox] = {}
-        litter_box: dict
+        roster = Roster(
+            locations=locations,
+            litter_boxes=litter_boxes,
+            lavvie_scanners=lavvie_scanners,
+            lavvie_tags=lavvie_tags,
+            cats=[],
+            cats_discovered=False,
+            roster_filter=roster_filter
+        )
+        if include_cats:
+            await self.async_discover_roster_cats(roster)
+        return roster
+
+    async def async_discover_roster_cats(self, roster: Roster) -> Roster:
+        """ Discover the cats of every location of a roster in a single batch """
+
+        cats: list = []
+        discovers_cats = self.has_cat and (roster.roster_filter is None or roster.roster_filter.discovers_cats)
+        cat_locations = roster.locations if discovers_cats else []
+        responses = await self.async_batch([self._discover_cats_payload(location['id']) for location in cat_locations])
+        for location, response in zip(cat_locations, responses):
+            if not _batch_failed(f'Cats of location {location["id"]}', response):
+                cats.extend(
+                    cat for cat in self._parse_location_cats(location, response)
+                    if roster.roster_filter is None or roster.roster_filter.includes_cat(cat)
+                )
+        roster.cats = cats
+        roster.cats_discovered = True
+        return roster
 
-        for litter_box in litter_boxes:
-            device_id: int = litter_box.get('id')
-            device_name: str = litter_box['lavviebot'].get('nickname')
-
-            state = await self.async_get_litter_box_status(device_id)
-            LOGGER.debug(f'Litter box {device_name} response: {state}')
-            iot_code_tail: str = state[0]['data']['getIotDetail'].get('iotCodeTail')
-            latest_firmware: str = state[0]['data']['getIotDetail'].get('latestFirmwareVersion')
-            router_ssid: str = state[0]['data']['getIotDetail']['lavviebot'].get('routerSSID')
-            """ Weight in Pounds """
-            min_bottom_weight_pnds: float = state[0]['data']['getIotDetail']['lavviebot'].get('minBottomWeight') / 455.1
-            beacon_battery = state[0]['data']['getIotDetail']['lavviebot'].get('beaconBattery')
-            current_firmware: str = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get(
-                'currentFirmwareVersion')
-            motor_state: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get('motorState')
-            top_litter_status: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get(
-                'topLitterStatus')
-            waste_drawer_status: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get(
-                'wasteDrawerStatus')
-            wait_time: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get('waitTime')
-            litter_type: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get('litterType')
-            """ Weight in Pounds """
-            litter_bottom_amount_pnds: float = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get(
-                'litterBottomAmount') / 455.1
-            humidity: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get('humidity')
-            temperature_c: int = state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get('temperature')
-            last_seen: datetime = datetime.fromtimestamp(
-                int(state[0]['data']['getIotDetail']['lavviebot']['recentLavviebotLog'].get('creationTime')) / 1000,
-                tz=ZoneInfo('Asia/Seoul')).astimezone()
-
-            """ Variables from Cat Usage Log """
-            nickname = state[1]['data']['getIotPoopRecord']['catUsageHistory'][00].get('nickname')
-            last_cat_used_name = 'Unknown' if nickname is None else nickname
-
-            last_used_duration: int = state[1]['data']['getIotPoopRecord']['catUsageHistory'][00].get('duration')
-            last_used: datetime = datetime.fromtimestamp(
-                int(state[1]['data']['getIotPoopRecord']['catUsageHistory'][00].get('creationTime')) / 1000,
-                tz=ZoneInfo('Asia/Seoul')).astimezone()
-            # Get the oldest usage record for today in order to determine number of times litter box was used today
-            today_date: date = date.today()
-            today_usage_list: list = []
-            for usage_record in state[1]['data']['getIotPoopRecord']['catUsageHistory']:
-                epoch_to_date = datetime.fromtimestamp(int(usage_record['creationTime']) / 1000).date()
-                if epoch_to_date == today_date:
-                    today_usage_list.append(usage_record)
-                else:
-                    break
-            times_used_today: int = len(today_usage_list)
-
-            # Litter box error log
-            error_log: list = state[2]['data']['getIotErrorLog']['errorLogs']
-
-            litter_box_data[device_id] = LitterBox(
-                device_id=device_id,
-                device_name=device_name,
-                iot_code_tail=iot_code_tail,
-                latest_firmware=latest_firmware,
-                router_ssid=router_ssid,
-                min_bottom_weight_pnds=min_bottom_weight_pnds,
-                beacon_battery=beacon_battery,
-                current_firmware=current_firmware,
-                motor_state=motor_state,
-                top_litter_status=top_litter_status,
-                waste_drawer_status=waste_drawer_status,
-                wait_time=wait_time,
-                litter_type=litter_type,
-                litter_bottom_amount_pnds=litter_bottom_amount_pnds,
-                humidity=humidity,
-                temperature_c=temperature_c,
-                last_seen=last_seen,
-                last_cat_used_name=last_cat_used_name,
-                last_used_duration=last_used_duration,
-                last_used=last_used,
-                times_used_today=times_used_today,
-                error_log=error_log,
-            )
+    async def async_get_sections(self, roster: Roster, sections: Iterable[str] = SECTIONS) -> LavviebotData:
+        """
+        Fetch the status of the devices and cats of a roster in a single batch.
+        sections: LavviebotData sections to fetch, the other sections are left empty.
+        Responses referring to a pet the roster doesn't know about mark the roster as stale.
+        Devices and cats whose status failed are left out, and their ids listed in the failed of the data.
+        """
 
-        # Handle LavvieScanners
-        lavvie_scanner_data: dict[int, LavvieScanner] = {}
-        lavvie_scanner: dict
+        sections = set(sections)
+        litter_boxes = roster.litter_boxes if 'litterboxes' in sections else []
+        lavvie_scanners = roster.lavvie_scanners if 'lavvie_scanners' in sections else []
+        lavvie_tags = roster.lavvie_tags if 'lavvie_tags' in sections else []
+        cats = roster.cats if 'cats' in sections else []
 
+        """
+        Plan every device and cat query into one batch.
+        Responses come back in the order the operations were planned in.
+        """
+        payloads: list[BoundOperation] = []
+        for litter_box in litter_boxes:
+            payloads.extend(self._litter_box_status_payload(litter_box['id']))
         for lavvie_scanner in lavvie_scanners:
-            device_id: int = lavvie_scanner.get('id')
-            device_name: str = lavvie_scanner['lavvieScanner'].get('nickname')
-
-            state = await self.async_get_iot_device_status(device_id, "lavvie_scanner")
-            LOGGER.debug(f'LavvieScanner {device_name} response: {state}')
-            iot_code_tail: str = state['data']['getIotDetail'].get('iotCodeTail')
-            latest_firmware: str = state['data']['getIotDetail'].get('latestFirmwareVersion')
-            router_ssid: str = state['data']['getIotDetail']['lavvieScanner'].get('routerSSID')
-            wifi_status: bool = state['data']['getIotDetail']['lavvieScanner'].get('wifiStatus')
-            current_firmware: str = state['data']['getIotDetail']['lavvieScanner']['recentLavvieScannerLog'].get(
-                'currentFirmwareVersion')
-            last_seen: datetime = datetime.fromtimestamp(
-                int(state['data']['getIotDetail']['lavvieScanner']['recentLavvieScannerLog'].get('creationTime')) / 1000,
-                tz=ZoneInfo('Asia/Seoul')).astimezone()
-
-            lavvie_scanner_data[device_id] = LavvieScanner(
-                device_id=device_id,
-                device_name=device_name,
-                iot_code_tail=iot_code_tail,
-                latest_firmware=latest_firmware,
-                router_ssid=router_ssid,
-                wifi_status=wifi_status,
-                current_firmware=current_firmware,
-                last_seen=last_seen
-            )
+            payloads.append(self._iot_device_payload(lavvie_scanner['id'], "lavvie_scanner"))
+        for lavvie_tag in lavvie_tags:
+            payloads.append(self._iot_device_payload(lavvie_tag['id'], "lavvie_tag"))
+        for cat in cats:
+            if cat.get('is_unknown'):
+                payloads.append(self._unknown_status_payload(cat['id']))
+            else:
+                payloads.append(self._cat_status_payload(cat['id'], cat['location_id']))
+        with self._phase('fetch'):
+            responses = iter(await self.async_batch(payloads))
 
-        # Handle LavvieTags
-        lavvie_tag_data: dict[int, LavvieTag] = {}
-        lavvie_tag: dict
+        failed: dict[str, set[int]] = {}
+        litter_box_data: dict[int, LitterBox] = {}
+        with self._phase('litterboxes'):
+            first_pages: dict[int, dict[str, Any]] = {}
+            busy_litter_boxes: list = []
+            for litter_box in litter_boxes:
+                state = [next(responses) for _ in range(3)]
+                name = f'Litter box {litter_box["id"]}'
+                parsed = None if _batch_failed(name, *state) else _parse(name, self._parse_litter_box, litter_box, state)
+                if parsed is None:
+                    failed.setdefault('litterboxes', set()).add(litter_box['id'])
+                    continue
+                litter_box_data[litter_box['id']] = parsed
+                first_pages[litter_box['id']] = state[2]
+                usage_log = state[1]['data']['getIotPoopRecord']
+                usage_history = usage_log['catUsageHistory'] or []
+                for usage_record in usage_history:
+                    roster.check_pet(usage_record.get('petId'))
+                # Every record of the first page is from today, so today's usage continues on the next pages
+                if usage_log.get('nextCursor') and usage_history and parsed.times_used_today == len(usage_history):
+                    busy_litter_boxes.append((parsed, usage_log['nextCursor']))
+
+            if busy_litter_boxes:
+                midnight = datetime.combine(date.today(), datetime.min.time()).astimezone()
+                counts = await _gather(*[
+                    self._async_count_usage(parsed.device_id, midnight, next_cursor)
+                    for parsed, next_cursor in busy_litter_boxes
+                ])
+                for (parsed, _), count in zip(busy_litter_boxes, counts):
+                    parsed.times_used_today += count
+
+            if litter_box_data:
+                # Only the entries newer than the previous sync are added to the error log history
+                await _gather(*[
+                    self._async_sync_error_log_section(parsed, first_pages[device_id])
+                    for device_id, parsed in litter_box_data.items()
+                ])
 
-        for lavvie_tag in lavvie_tags:
-            device_id: int = lavvie_tag.get('id')
-            device_name: str = lavvie_tag['lavvieTag'].get('nickname')
-
-            state = await self.async_get_iot_device_status(device_id, "lavvie_tag")
-            LOGGER.debug(f'LavvieTag {device_name} response: {state}')
-            iot_code_tail: str = state['data']['getIotDetail'].get('iotCodeTail')
-            latest_firmware: str = state['data']['getIotDetail'].get('latestFirmwareVersion')
-            current_firmware: str = state['data']['getIotDetail']['lavvieTag'].get(
-                'currentFirmwareVersion')
-            battery: int = state['data']['getIotDetail']['lavvieTag'].get('battery')
-            last_seen: datetime = datetime.fromtimestamp(
-                int(state['data']['getIotDetail']['lavvieTag'].get('recentConnectionTime')) / 1000,
-                tz=ZoneInfo('Asia/Seoul')).astimezone()
-
-            lavvie_tag_data[device_id] = LavvieTag(
-                device_id=device_id,
-                device_name=device_name,
-                iot_code_tail=iot_code_tail,
-                latest_firmware=latest_firmware,
-                current_firmware=current_firmware,
-                battery=battery,
-                last_seen=last_seen
-            )
+        lavvie_scanner_data: dict[int, LavvieScanner] = {}
+        with self._phase('lavvie_scanners'):
+            for lavvie_scanner in lavvie_scanners:
+                state = next(responses)
+                name = f'LavvieScanner {lavvie_scanner["id"]}'
+                parsed = None if _batch_failed(name, state) else _parse(
+                    name, self._parse_lavvie_scanner, lavvie_scanner, state
+                )
+                if parsed is None:
+                    failed.setdefault('lavvie_scanners', set()).add(lavvie_scanner['id'])
+                else:
+                    lavvie_scanner_data[lavvie_scanner['id']] = parsed
 
-        """ Get all cats """
+        lavvie_tag_data: dict[int, LavvieTag] = {}
+        with self._phase('lavvie_tags'):
+            for lavvie_tag in lavvie_tags:
+                state = next(responses)
+                name = f'LavvieTag {lavvie_tag["id"]}'
+                parsed = None if _batch_failed(name, state) else _parse(name, self._parse_lavvie_tag, lavvie_tag, state)
+                if parsed is None:
+                    failed.setdefault('lavvie_tags', set()).add(lavvie_tag['id'])
+                else:
+                    lavvie_tag_data[lavvie_tag['id']] = parsed
+                    pet = state['data']['getIotDetail'].get('pet')
+                    if pet:
+                        roster.check_pet(pet.get('id'))
 
-        cats = []
         cat_data: dict[int, Cat] = {}
-        if self.has_cat:
-            for location in locations:
-                response = await self.async_discover_cats(location['id'])
-                LOGGER.debug(f'Discovered cats response: {response}')
-                if location['hasUnknownCat']:
-                    unknown_cat = {
-                        'id': location['id'],
-                        'location_id': location['id'],
-                        'is_unknown': True,
-                        "has_lavvietag": False
-                    }
-                    cats.append(unknown_cat)
-                """ Append all cats to cat list. """
-                for cat in response['data']['getPets']:
-                    cat["is_unknown"] = False
-                    cat["location_id"] = location['id']
-                    cat["has_lavvietag"] = True if cat['lavvieTag'] else False
-                    cats.append(cat)
-
-            cat: dict
+        with self._phase('cats'):
             for cat in cats:
-                cat_id: int = cat.get('id')
-                cat_location_id: int = cat.get('location_id')
-                has_lavvietag: bool = cat.get('has_lavvietag')
-                # Today's Activity data
-                zoomies: int = 0
-                running: int = 0
-                walking: int = 0
-                resting: int = 0
-                sleeping: int = 0
-
-                # Handle getting Unknown cat data
-                if cat.get('is_unknown'):
-                    cat_name: str = "Unknown"
-                    unknown_status = await self.async_get_unknown_status(cat_id)
-                    LOGGER.debug(f'Unknown cat status response: {unknown_status}')
-                    today_weight = unknown_status['data']['weightData']
-                    today_duration = unknown_status['data']['poopDuration']
-                    today_count = unknown_status['data']['poopCount']
-                    if today_weight:
-                        cat_weight_pnds = 0.0 if today_weight['today'] is None else (today_weight['today'] / 455.1)
-                    else:
-                        cat_weight_pnds = 0.0
-                    if today_duration:
-                        duration = 0.0 if today_duration['today'] is None else today_duration['today']
-                    else:
-                        duration = 0.0
-                    if today_count:
-                        poop_count = 0 if today_count['today'] is None else today_count['today']
-                    else:
-                        poop_count = 0
-                    zoomies = zoomies
-                    running = running
-                    walking = walking
-                    resting = resting
-                    sleeping = sleeping
-                # Handle regular Cats
+                status = next(responses)
+                name = f'Cat {cat["id"]}'
+                parsed = None if _batch_failed(name, status) else _parse(name, self._parse_cat, cat, status)
+                if parsed is None:
+                    failed.setdefault('cats', set()).add(cat['id'])
                 else:
-                    cat_name: str = cat['cat'].get('nickname')
-                    cat_status = await self.async_get_cat_status(cat_id, cat_location_id)
-                    LOGGER.debug(f'Cat {cat_name} status response: {cat_status}')
-                    weight_data = cat_status['data']['weightData']
-                    duration_data = cat_status['data']['poopDuration']
-                    count_data = cat_status['data']['poopCount']
-                    activity_data = cat_status['data']['todayActivity']
-                    if weight_data:
-                        cat_weight_pnds = 0.0 if weight_data['today'] is None else (weight_data['today'] / 455.1)
-                    else:
-                        cat_weight_pnds = 0.0
-                    if duration_data:
-                        duration = 0.0 if duration_data['today'] is None else duration_data['today']
-                    else:
-                        duration = 0.0
-                    if count_data:
-                        poop_count = 0 if count_data['today'] is None else count_data['today']
-                    else:
-                        poop_count = 0
-                    # Today's Activity data. Only go through logic if cat has associated LavvieTAG
-                    if has_lavvietag:
-                        for data in activity_data:
-                            if data['woodadaCount']:
-                                zoomies += data['woodadaCount']
-                            if data['run']:
-                                running += data['run']
-                            if data['walk']:
-                                walking += data['walk']
-                            if data['rest']:
-                                sleeping += data['rest']
-                            if data['grooming']:
-                                resting += data['grooming']
-
-                cat_data[cat_id] = Cat(
-                    cat_id=cat_id,
-                    location_id=cat_location_id,
-                    cat_name=cat_name,
-                    has_lavvietag=has_lavvietag,
-                    cat_weight_pnds=cat_weight_pnds,
-                    duration=duration,
-                    poop_count=poop_count,
-                    zoomies=zoomies,
-                    running=running,
-                    walking=walking,
-                    resting=resting,
-                    sleeping=sleeping,
-                )
+                    cat_data[cat['id']] = parsed
 
-        purrsong_data = LavviebotData(
+        data = LavviebotData(
             litterboxes=litter_box_data,
             lavvie_scanners=lavvie_scanner_data,
             lavvie_tags=lavvie_tag_data,
-            cats=cat_data
+            cats=cat_data,
+            failed=failed
         )
-        LOGGER.debug(f'Purrsong API data returned: {purrsong_data}')
-        return purrsong_data
+        if self.history is not None:
+            self.history.record(data)
+        return data
+
+    async def async_batch(self, payloads: list[BoundOperation]) -> list[dict[str, Any]]:
+        """
+        Send operations to PurrSong in as few POSTs as max_batch_size allows.
+        Batches are sent concurrently and responses are returned in the same order as payloads.
+        An operation that failed keeps its 'errors' so that it doesn't sink the rest of its batch.
+        """
+
+        if not payloads:
+            return []
+        batches = [payloads[i:i + self.max_batch_size] for i in range(0, len(payloads), self.max_batch_size)]
+        responses: list = []
+        for batch, response in zip(batches, await _gather(*[self._async_query(batch) for batch in batches])):
+            if not isinstance(response, list) or len(response) != len(batch):
+                raise LavviebotError(f'Lavviebot API error: unexpected batch response {response}')
+            responses.extend(response)
+        return responses
 
     async def async_get_litter_box_status(self, device_id: int) -> list[dict[str, Any]]:
         """ Get most recent status available for litter box """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        lbs_payload = [
-            {
-                "operationName": "GetLavviebotDetails",
-                "variables": {
-                    "data": {
-                        "iotId": device_id
-                    }
-                },
-                "query": LB_STATUS
-            },
-            {
-                "operationName": "GetIotPoopRecord",
-                "variables": {
-                    "data": {
-                        "iotId": device_id
-                    }
-                },
-                "query": LB_CAT_LOG
-            },
-            {
-                "operationName": "GetIotErrorLog",
-                "variables": {
-                    "data": {
-                        "iotId": device_id
-                    }
-                },
-                "query": LB_ERROR_LOG
-            }
-        ]
+        lbs_payload = self._litter_box_status_payload(device_id)
 
-        response = await self._post(headers, lbs_payload)
+        response = await self._async_query(lbs_payload)
         for resp in response:
             if 'errors' in resp:
-                message = resp['errors'][0]['message']
-                if message == "Please login again.":
-                    await self.login()
-                    return await self.async_get_litter_box_status(device_id)
-                else:
-                    raise LavviebotError(resp)
+                raise LavviebotError(resp)
         return response
 
-    async def async_get_litter_box_cat_log(self, device_id: int) -> dict[str, Any]:
-        """ Get usage log that is associated with the litter box """
+    async def async_get_litter_box_cat_log(self, device_id: int, cursor: str | None = None) -> dict[str, Any]:
+        """
+        Get usage log that is associated with the litter box.
+        cursor: nextCursor of the previous page, or None for the most recent page
+        """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        lbcl_payload = {
-            "operationName": "GetLavviebotPoopRecord",
-            "variables": {
-                "data": {
-                    "iotId": device_id
-                }
-            },
-            "query": LB_CAT_LOG
-        }
-        response = await self._post(headers, lbcl_payload)
+        lbcl_payload = self._litter_box_cat_log_payload(device_id, cursor)
+        response = await self._async_query(lbcl_payload)
         if 'errors' in response:
-            message = response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_get_litter_box_cat_log(device_id)
-            else:
-                raise LavviebotError(message)
-        else:
-            return response
+            raise LavviebotError(response['errors'][0]['message'])
+        return response
 
-    async def async_get_litter_box_error_log(self, device_id: int) -> dict[str, Any]:
-        """ Get error log that is associated with the litter box """
+    async def iter_litter_box_usage(
+            self, device_id: int,
+            since: datetime | None = None,
+            cursor: str | None = None) -> AsyncIterator[dict[str, Any]]:
+        """
+        Stream the catUsageHistory records of a litter box, most recent first, following nextCursor.
+        The next page is prefetched while the current one is consumed. A stream left before its end
+        has to be closed, with aclose() or contextlib.aclosing, so that the prefetch is cancelled
+        instead of running until the stream is garbage collected.
+        since: Stop at the first record older than this aware datetime, or None to read the whole history
+        cursor: nextCursor to start from, or None to start from the most recent record
+        """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        lbel_payload = {
-            "operationName": "GetIotErrorLog",
-            "variables": {
-                "data": {
-                    "iotId": device_id
-                }
-            },
-            "query": LB_ERROR_LOG
-        }
-        response = await self._post(headers, lbel_payload)
+        since_ms: float | None = None if since is None else since.timestamp() * 1000
+        page_task: asyncio.Future | None = asyncio.ensure_future(self.async_get_litter_box_cat_log(device_id, cursor))
+        try:
+            while page_task is not None:
+                page = (await page_task)['data']['getIotPoopRecord']
+                page_task = None
+                records = page['catUsageHistory'] or []
+                next_cursor = page.get('nextCursor')
+                if next_cursor and records and (since_ms is None or int(records[-1]['creationTime']) >= since_ms):
+                    page_task = asyncio.ensure_future(self.async_get_litter_box_cat_log(device_id, next_cursor))
+                for record in records:
+                    if since_ms is not None and int(record['creationTime']) < since_ms:
+                        return
+                    yield record
+        finally:
+            if page_task is not None:
+                page_task.cancel()
+
+    async def async_get_litter_box_error_log(self, device_id: int, cursor: str | None = None) -> dict[str, Any]:
+        """
+        Get error log that is associated with the litter box.
+        cursor: cursor of the previous page, or None for the most recent page
+        """
+
+        lbel_payload = self._litter_box_error_log_payload(device_id, cursor)
+        response = await self._async_query(lbel_payload)
         if 'errors' in response:
-            message = response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_get_litter_box_error_log(device_id)
-            else:
-                raise LavviebotError(message)
-        else:
-            return response
+            raise LavviebotError(response['errors'][0]['message'])
+        return response
+
+    async def async_sync_error_log(
+            self, device_id: int,
+            first_page: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+        """
+        Return the error log entries of a litter box logged since the previous sync, most recent first.
+        Pages are followed until an entry that was already seen is reached. The first sync of a
+        litter box only reads the most recent page. New entries are added to the history kept
+        by error_logs, nothing is recorded when a page could not be fetched.
+        first_page: Already fetched response of the most recent page, or None to fetch it
+        """
+
+        page = first_page if first_page else await self.async_get_litter_box_error_log(device_id)
+        synced = self.error_logs.synced(device_id)
+        new_errors: list = []
+        while True:
+            if 'errors' in page:
+                raise LavviebotError(page['errors'][0]['message'])
+            error_log = page['data']['getIotErrorLog']
+            page_errors, reached = self.error_logs.scan(device_id, error_log['errorLogs'] or [])
+            new_errors.extend(page_errors)
+            if (reached or not synced or not error_log.get('hasMore') or not error_log.get('cursor')
+                    or len(new_errors) >= self.error_logs.max_history):
+                break
+            page = await self.async_get_litter_box_error_log(device_id, error_log['cursor'])
+        self.error_logs.record(device_id, new_errors)
+        return new_errors
 
     async def async_get_iot_device_status(self, iot_id: int, device_type: str) -> dict[str, Any]:
         """
@@ -596,157 +618,622 @@ class LavviebotClient:
         device_type needs to be one of lavvie_scanner or lavvie_tag.
         """
 
-        operation_name: str | None = None
-        query: str | None = None
-
-        if device_type == "lavvie_scanner":
-            operation_name = "GetLavvieScannerDetails"
-            query = LAVVIE_SCANNER_STATUS
-        if device_type == "lavvie_tag":
-            operation_name = "GetLavvieTagDetails"
-            query = LAVVIE_TAG_STATUS
-
-        if self.cookie is None or self.token is None:
-            await self.login()
-
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        iot_payload = {
-            "operationName": operation_name,
-            "variables": {
-                "data": {
-                    "iotId": iot_id
-                }
-            },
-            "query": query
-        }
+        iot_payload = self._iot_device_payload(iot_id, device_type)
 
-        iot_response = await self._post(headers, iot_payload)
+        iot_response = await self._async_query(iot_payload)
         if 'errors' in iot_response:
-            message = iot_response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_get_iot_device_status(iot_id, device_type)
-            else:
-                raise LavviebotError(message)
+            raise LavviebotError(iot_response['errors'][0]['message'])
         return iot_response
 
     async def async_get_unknown_status(self, cat_id: int) -> dict[str, Any]:
         """ Get most recent status for Unknown cat, if present. """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        unknown_payload = {
-            "operationName": "GetUnknownPoopData",
-            "variables": {
-                    "locationId": cat_id,
-                    "days": "days",
-                    "weight": "weight",
-                    "poopCount": "poopCount",
-                    "poopDuration": "duration"
-            },
-            "query": UNKNOWN_STATUS
-        }
+        unknown_payload = self._unknown_status_payload(cat_id)
 
-        unknown_response = await self._post(headers, unknown_payload)
+        unknown_response = await self._async_query(unknown_payload)
         if 'errors' in unknown_response:
-            message = unknown_response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_get_unknown_status(cat_id)
-            else:
-                raise LavviebotError(message)
+            raise LavviebotError(unknown_response['errors'][0]['message'])
         return unknown_response
 
     async def async_get_cat_status(self, cat_id: int, cat_location_id: int) -> dict[str, Any]:
         """ Get most recent status for single cat """
 
-        if self.cookie is None or self.token is None:
-            await self.login()
-        headers = {
-            'Accept': ACCEPT,
-            'Cookie': self.cookie,
-            'Accept-Encoding': ACCEPT_ENCODING,
-            'Accept-Language': ACCEPT_LANGUAGE,
-            'Authorization': self.token,
-            'Connection': CONNECTION,
-            'Content-Type': CONTENT_TYPE,
-            'User-Agent': USER_AGENT
-        }
-        cat_status_payload = {
-            "operationName": "GetCatHealthInfo",
-            "variables": {
-                "locationId": cat_location_id,
-                "petId": cat_id,
-                "days": "days",
-                "weight": "weight",
-                "poopCount": "poopCount",
-                "poopDuration": "duration"
-            },
-            "query": CAT_STATUS
-        }
+        cat_status_payload = self._cat_status_payload(cat_id, cat_location_id)
 
-        cat_status_response = await self._post(headers, cat_status_payload)
+        cat_status_response = await self._async_query(cat_status_payload)
         if 'errors' in cat_status_response:
-            message = cat_status_response['errors'][0]['message']
-            if message == "Please login again.":
-                await self.login()
-                return await self.async_get_cat_status(cat_id, cat_location_id)
-            else:
-                raise LavviebotError(message)
+            raise LavviebotError(cat_status_response['errors'][0]['message'])
         return cat_status_response
 
-    async def _post(
-            self, headers: dict[str, Any],
-            payload: dict[str, Any] | list[dict[str, Any]], is_cookie: bool | None = None) -> SimpleCookie | dict[str, Any]:
-        """ Make Post API call to PurrSong servers """
+    async def _async_count_usage(self, device_id: int, since: datetime, cursor: str | None = None) -> int:
+        """ Count the usage records of a litter box since an aware datetime """
+
+        count = 0
+        usage = self.iter_litter_box_usage(device_id, since, cursor)
+        try:
+            async for _ in usage:
+                count += 1
+        except LavviebotError as error:
+            LOGGER.error(f'Usage log of litter box {device_id} could not be fetched past {count} records: {error}')
+        finally:
+            # Cancels the prefetched page when counting is cancelled
+            await usage.aclose()
+        return count
+
+    async def _async_sync_error_log_section(self, litter_box: LitterBox, first_page: dict[str, Any]) -> None:
+        """ Sync the error log of a litter box and replace its first page by the error log history """
+
+        try:
+            await self.async_sync_error_log(litter_box.device_id, first_page)
+        except LavviebotError as error:
+            LOGGER.error(f'Error log of litter box {litter_box.device_id} could not be synced: {error}')
+        if self.error_logs.synced(litter_box.device_id):
+            litter_box.error_log = self.error_logs.history(litter_box.device_id)
+        return None
+
+    def _discover_cats_payload(self, location_id: int) -> BoundOperation:
+        """ Payload of the operation that lists the cats of a location """
+
+        return self.operations["CatMain"].bind({
+            "includeLavvieCare": True,
+            "includeLavvieTag": True,
+            "includeDetailCatInfo": True,
+            "includeLocation": True,
+            "locationId": location_id
+        }, self.codec)
+
+    def _litter_box_status_payload(self, device_id: int) -> list[BoundOperation]:
+        """ Payloads of the three operations that make up the status of a litter box """
+
+        variables = {
+            "data": {
+                "iotId": device_id
+            }
+        }
+        return [
+            self.operations["GetLavviebotDetails"].bind(variables, self.codec),
+            self.operations["GetIotPoopRecord"].bind(variables, self.codec),
+            self.operations["GetIotErrorLog"].bind(variables, self.codec),
+        ]
+
+    def _litter_box_cat_log_payload(self, device_id: int, cursor: str | None = None) -> BoundOperation:
+        """ Payload of the operation that gets a page of the usage log of a litter box """
+
+        data: dict[str, Any] = {"iotId": device_id}
+        if cursor is not None:
+            data["cursor"] = cursor
+        return self.operations["GetIotPoopRecord"].bind({
+            "data": data
+        }, self.codec)
+
+    def _litter_box_error_log_payload(self, device_id: int, cursor: str | None = None) -> BoundOperation:
+        """ Payload of the operation that gets a page of the error log of a litter box """
+
+        data: dict[str, Any] = {"iotId": device_id}
+        if cursor is not None:
+            data["cursor"] = cursor
+        return self.operations["GetIotErrorLog"].bind({
+            "data": data
+        }, self.codec)
+
+    def _iot_device_payload(self, iot_id: int, device_type: str) -> BoundOperation:
+        """
+        Payload of the operation that gets the details of a LavvieScanner or LavvieTAG.
+        device_type needs to be one of lavvie_scanner or lavvie_tag.
+        """
+
+        operation: Operation | None = None
+
+        if device_type == "lavvie_scanner":
+            operation = self.operations["GetLavvieScannerDetails"]
+        if device_type == "lavvie_tag":
+            operation = self.operations["GetLavvieTagDetails"]
+        if operation is None:
+            raise LavviebotError(f'Unsupported device_type: {device_type}')
+
+        return operation.bind({
+            "data": {
+                "iotId": iot_id
+            }
+        }, self.codec)
+
+    def _unknown_status_payload(self, cat_id: int) -> BoundOperation:
+        """ Payload of the operation that gets the most recent status of an Unknown cat """
+
+        return self.operations["GetUnknownPoopData"].bind({
+            "locationId": cat_id,
+            "days": "days",
+            "weight": "weight",
+            "poopCount": "poopCount",
+            "poopDuration": "duration"
+        }, self.codec)
+
+    def _cat_status_payload(self, cat_id: int, cat_location_id: int) -> BoundOperation:
+        """ Payload of the operation that gets the most recent status of a cat """
+
+        return self.operations["GetCatHealthInfo"].bind({
+            "locationId": cat_location_id,
+            "petId": cat_id,
+            "days": "days",
+            "weight": "weight",
+            "poopCount": "poopCount",
+            "poopDuration": "duration"
+        }, self.codec)
+
+    @staticmethod
+    def _parse_litter_box(litter_box: dict[str, Any], state: list[dict[str, Any]]) -> LitterBox:
+        """ Build the dataclass of a discovered litter box from its status responses """
+
+        # Formatted lazily, rendering the responses costs more than parsing them
+        LOGGER.debug('Litter box %s response: %s', litter_box['lavviebot'].get('nickname'), state)
+        usage_history: list = state[1]['data']['getIotPoopRecord']['catUsageHistory'] or []
+        # Records are most recent first, so today's records are the ones until the first one before midnight
+        midnight_ms = datetime.combine(date.today(), datetime.min.time()).timestamp() * 1000
+        times_used_today = 0
+        for usage_record in usage_history:
+            if int(usage_record['creationTime']) < midnight_ms:
+                break
+            times_used_today += 1
+
+        return LitterBox(
+            device_id=litter_box.get('id'),
+            device_name=litter_box['lavviebot'].get('nickname'),
+            **LITTER_BOX_DETAILS.extract(state[0]),
+            **LITTER_BOX_LAST_USAGE.extract(state[1]),
+            times_used_today=times_used_today,
+            error_log=state[2]['data']['getIotErrorLog']['errorLogs'],
+        )
+
+    @staticmethod
+    def _parse_lavvie_scanner(lavvie_scanner: dict[str, Any], state: dict[str, Any]) -> LavvieScanner:
+        """ Build the dataclass of a discovered LavvieScanner from its status response """
+
+        LOGGER.debug('LavvieScanner %s response: %s', lavvie_scanner['lavvieScanner'].get('nickname'), state)
+        return LavvieScanner(
+            device_id=lavvie_scanner.get('id'),
+            device_name=lavvie_scanner['lavvieScanner'].get('nickname'),
+            **LAVVIE_SCANNER_DETAILS.extract(state),
+        )
+
+    @staticmethod
+    def _parse_lavvie_tag(lavvie_tag: dict[str, Any], state: dict[str, Any]) -> LavvieTag:
+        """ Build the dataclass of a discovered LavvieTag from its status response """
+
+        LOGGER.debug('LavvieTag %s response: %s', lavvie_tag['lavvieTag'].get('nickname'), state)
+        return LavvieTag(
+            device_id=lavvie_tag.get('id'),
+            device_name=lavvie_tag['lavvieTag'].get('nickname'),
+            **LAVVIE_TAG_DETAILS.extract(state),
+        )
 
-        async with self._session.post(
-                BASE_URL, headers=headers, json=payload,
-                timeout=self.timeout) as resp:
-            return await self._response(resp, is_cookie)
+    @staticmethod
+    def _parse_location_cats(location: dict[str, Any], response: dict[str, Any]) -> list[dict[str, Any]]:
+        """ List the cats of a single location, including its Unknown cat if it has one """
+
+        cats: list = []
+        LOGGER.debug(f'Discovered cats response: {response}')
+        if location['hasUnknownCat']:
+            unknown_cat = {
+                'id': location['id'],
+                'location_id': location['id'],
+                'is_unknown': True,
+                "has_lavvietag": False
+            }
+            cats.append(unknown_cat)
+        """ Append all cats to cat list. """
+        for pet in response['data']['getPets']:
+            # Copied, as the response may be shared through the response cache
+            cat = dict(pet)
+            cat["is_unknown"] = False
+            cat["location_id"] = location['id']
+            cat["has_lavvietag"] = True if cat['lavvieTag'] else False
+            cats.append(cat)
+        return cats
 
     @staticmethod
-    async def _response(resp: ClientResponse, is_cookie: bool) -> SimpleCookie | dict[str, Any]:
+    def _parse_cat(cat: dict[str, Any], status: dict[str, Any]) -> Cat:
+        """ Build the dataclass of a discovered cat from its status response """
+
+        has_lavvietag: bool = cat.get('has_lavvietag')
+        cat_name: str = "Unknown" if cat.get('is_unknown') else cat['cat'].get('nickname')
+        LOGGER.debug('Cat %s status response: %s', cat_name, status)
+        # Today's Activity data. Only reported for cats with an associated LavvieTAG
+        zoomies: int = 0
+        running: int = 0
+        walking: int = 0
+        resting: int = 0
+        sleeping: int = 0
+        if has_lavvietag and not cat.get('is_unknown'):
+            for data in status['data']['todayActivity'] or []:
+                if data['woodadaCount']:
+                    zoomies += data['woodadaCount']
+                if data['run']:
+                    running += data['run']
+                if data['walk']:
+                    walking += data['walk']
+                if data['rest']:
+                    sleeping += data['rest']
+                if data['grooming']:
+                    resting += data['grooming']
+
+        return Cat(
+            cat_id=cat.get('id'),
+            location_id=cat.get('location_id'),
+            cat_name=cat_name,
+            has_lavvietag=has_lavvietag,
+            **CAT_HEALTH.extract(status),
+            zoomies=zoomies,
+            running=running,
+            walking=walking,
+            resting=resting,
+            sleeping=sleeping,
+        )
+
+    async def _async_query(
+            self, payload: BoundOperation | list[BoundOperation]) -> dict[str, Any] | list[dict[str, Any]]:
+        """
+        Send an authorized request, serving the operations that are cached from the response cache.
+        Only the operations that missed the cache are sent, in a single request.
+        While the circuit breaker is open, expired responses are served as a fallback instead.
+        """
+
+        if self.cache is None:
+            return await self._async_request(payload)
+
+        operations = payload if isinstance(payload, list) else [payload]
+        responses: list = []
+        missed: list[int] = []
+        unavailable = self.breaker is not None and self.breaker.state is BreakerState.OPEN
+        for index, operation in enumerate(operations):
+            entry = self.cache.fallback(operation) if unavailable else self.cache.lookup(operation)
+            if entry is None:
+                missed.append(index)
+                responses.append(None)
+                continue
+            if entry.stale and not unavailable:
+                self._revalidate(operation)
+            responses.append(entry.response)
+
+        if missed:
+            missed_operations = [operations[index] for index in missed]
+            fetched = await self._async_request(missed_operations if isinstance(payload, list) else missed_operations[0])
+            fetched = fetched if isinstance(fetched, list) else [fetched]
+            if len(fetched) != len(missed):
+                raise LavviebotError(f'Lavviebot API error: unexpected batch response {fetched}')
+            for index, response in zip(missed, fetched):
+                self.cache.store(operations[index], response)
+                responses[index] = response
+        return responses if isinstance(payload, list) else responses[0]
+
+    def _revalidate(self, operation: BoundOperation) -> None:
+        """ Refresh a stale cache entry in the background, unless it's already being refreshed """
+
+        if operation.body in self._revalidating:
+            return None
+        # Started without the deadline of the caller, which would cut the refresh short once its poll ends
+        task = _ensure_future_without_deadline(self._async_revalidate(operation))
+        self._revalidating[operation.body] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(operation.body, None))
+        return None
+
+    async def _async_revalidate(self, operation: BoundOperation) -> None:
+        """ Fetch a stale operation again and cache the response """
+
+        try:
+            self.cache.store(operation, await self._async_request(operation))
+        except Exception as error:
+            LOGGER.debug(f'Could not refresh cached {operation.name} response: {error}')
+
+    async def _async_request(
+            self, payload: BoundOperation | list[BoundOperation]) -> dict[str, Any] | list[dict[str, Any]]:
+        """
+        Send an authorized request, or wait for the same request already in flight.
+        Queries are single-flight per operationName and variables: concurrent callers share one
+        request, and get the same response or exception. Mutations are always sent.
+        The shared request runs without a deadline, every caller waits for it until its own.
+        """
+
+        operations = payload if isinstance(payload, list) else [payload]
+        if not all(operation.operation.read_only for operation in operations):
+            return await self._async_authorized_request(payload)
+        key = tuple(operation.body for operation in payload) if isinstance(payload, list) else payload.body
+        task = self._in_flight.get(key)
+        if task is None:
+            # Started without the deadline of the first caller, which the other callers don't share
+            task = _ensure_future_without_deadline(self._async_authorized_request(payload))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            # Retrieved so that a request whose callers were all cancelled isn't logged as never retrieved
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        else:
+            self.coalesced_requests += 1
+        # Shielded so that a cancelled caller doesn't cancel the request other callers wait for
+        time_left = _time_left()
+        if time_left is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(time_left, 0))
+        except asyncio.TimeoutError as error:
+            if task.done():
+                raise
+            raise LavviebotTimeout('The deadline passed before PurrSong answered') from error
+
+    async def _async_authorized_request(
+            self, payload: BoundOperation | list[BoundOperation]) -> dict[str, Any] | list[dict[str, Any]]:
+        """
+        Send an authorized request, logging in first if needed.
+        When the token is rejected, the request is retried after a shared re-login,
+        at most max_relogin_attempts times.
+        """
+
+        for attempt in range(self.max_relogin_attempts + 1):
+            if self.token is None:
+                await self.login()
+            generation = self._token_manager.generation
+            response = await self._post(self._headers(), payload)
+            if not _login_expired(response):
+                return response
+            LOGGER.debug(f'Token rejected, logging in again: {response}')
+            if self.instrumentation is not None:
+                operations = payload if isinstance(payload, list) else [payload]
+                self.instrumentation.record_relogin(operations)
+                self.instrumentation.record_retry(operations, attempt + 1, 'login_expired')
+            await self._token_manager.async_login(generation)
+        raise LavviebotAuthError(f'PurrSong API kept rejecting the token after logging in again: {response}')
+
+    def _headers(self) -> dict[str, str]:
+        """ Return the headers of authorized requests, rebuilt only when the cookie or token change """
+
+        if self._headers_key != (self.cookie, self.token):
+            self._headers_cache = build_headers(self.cookie, self.token)
+            self._headers_key = (self.cookie, self.token)
+        return self._headers_cache
+
+    async def _post(
+            self, headers: dict[str, str],
+            payload: BoundOperation | list[BoundOperation], is_cookie: bool | None = None) -> SimpleCookie | dict[str, Any]:
+        """
+        Make Post API call to PurrSong servers.
+        Requests are paced by the scheduler, and queued again when they are rate limited.
+        Requests failing with a network error, a timeout or a server error are sent again after a jittered
+        exponential backoff, as long as the deadline of the poll leaves time for it.
+        While the circuit breaker is open, requests fail fast with LavviebotCircuitOpen without being sent.
+        """
+
+        data = encode_batch(payload) if isinstance(payload, list) else payload.body
+        operations = payload if isinstance(payload, list) else [payload]
+        timeout = min(self.timeout, max(self.operation_timeouts.get(operation.name, self.timeout)
+                                        for operation in operations))
+        hedge = self.hedge and not is_cookie and all(operation.operation.read_only for operation in operations)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        rate_limited = failures = 0
+        while True:
+            attempt = rate_limited + failures
+            if self.breaker is not None and self.breaker.state is BreakerState.OPEN:
+                self.breaker.reject()
+                raise LavviebotCircuitOpen(self._circuit_open_message())
+            await self._async_acquire()
+            try:
+                async with self._semaphore:
+                    if hedge:
+                        send = self._async_hedged_send(headers, data, operations, attempt, timeout)
+                    else:
+                        send = self._async_send(headers, data, operations, attempt, is_cookie, timeout)
+                    response = await self._async_guarded_send(send)
+            except LavviebotRateLimit:
+                backoff = self.scheduler.on_rate_limited()
+                if self.instrumentation is not None:
+                    self.instrumentation.record_rate_limited(operations, backoff)
+                if rate_limited == self.max_rate_limit_retries:
+                    raise
+                rate_limited += 1
+                LOGGER.warning(f'Rate limited by the PurrSong API, retrying in {backoff:.1f} seconds')
+                if self.instrumentation is not None:
+                    self.instrumentation.record_retry(operations, attempt + 1, 'rate_limited')
+            except TRANSIENT_ERRORS as error:
+                time_left = _time_left()
+                if time_left is not None and time_left <= 0:
+                    raise LavviebotTimeout('The deadline passed before PurrSong answered') from error
+                if failures == self.max_transient_retries:
+                    raise
+                failures += 1
+                backoff = min(TRANSIENT_MAX_BACKOFF, TRANSIENT_BACKOFF * 2 ** (failures - 1))
+                backoff = random.uniform(backoff / 2, backoff)
+                if time_left is not None and time_left <= backoff:
+                    raise LavviebotTimeout('The deadline leaves no time to send the failed request again') from error
+                LOGGER.warning(f'Request to the PurrSong API failed with {error!r}, retrying in {backoff:.1f} seconds')
+                if self.instrumentation is not None:
+                    self.instrumentation.record_retry(operations, attempt + 1, 'transient')
+                await asyncio.sleep(backoff)
+            else:
+                self.scheduler.on_success()
+                return response
+
+    async def _async_acquire(self) -> None:
+        """ Wait until the scheduler lets a request be sent, raising LavviebotTimeout if the deadline passes first """
+
+        time_left = _time_left()
+        if time_left is None:
+            await self.scheduler.async_acquire()
+            return None
+        try:
+            await asyncio.wait_for(self.scheduler.async_acquire(), max(time_left, 0))
+        except asyncio.TimeoutError as error:
+            raise LavviebotTimeout('The deadline passed while the request was held back by the scheduler') from error
+        return None
+
+    async def _async_guarded_send(self, send: Awaitable[Any]) -> Any:
+        """ Await a request admitted by the circuit breaker, recording its outcome """
+
+        if self.breaker is None:
+            return await send
+        admitted = self.breaker.admit()
+        if admitted is None:
+            send.close()
+            raise LavviebotCircuitOpen(self._circuit_open_message())
+        start = time.monotonic()
+        try:
+            response = await send
+        except TRANSIENT_ERRORS:
+            self.breaker.record_failure(admitted, time.monotonic() - start)
+            raise
+        except LavviebotTimeout:
+            # The deadline passed before the request was sent
+            self.breaker.release(admitted)
+            raise
+        except (LavviebotError, LavviebotRateLimit):
+            # PurrSong answered, rejecting the request itself
+            self.breaker.record_success(admitted, time.monotonic() - start)
+            raise
+        except BaseException:
+            self.breaker.release(admitted)
+            raise
+        self.breaker.record_success(admitted, time.monotonic() - start)
+        return response
+
+    def _circuit_open_message(self) -> str:
+        retry_after = self.breaker.retry_after
+        if retry_after > 0:
+            return f'PurrSong API is unavailable, requests are failed fast for {retry_after:.0f} more seconds'
+        return 'PurrSong API is unavailable, waiting for the requests testing whether it recovered'
+
+    async def _async_send(
+            self, headers: dict[str, str], data: bytes, operations: list[BoundOperation],
+            attempt: int, is_cookie: bool | None, timeout: float) -> SimpleCookie | dict[str, Any]:
+        """ Send a request once, with a timeout cut short by the deadline of the poll """
+
+        time_left = _time_left()
+        if time_left is not None:
+            if time_left <= 0:
+                raise LavviebotTimeout('The deadline passed before the request could be sent')
+            timeout = min(timeout, time_left)
+        if self.instrumentation is not None:
+            return await self._async_traced_post(headers, data, operations, attempt, is_cookie, timeout)
+        return self._response(await self.transport.async_post(self.base_url, headers, data, timeout), is_cookie)
+
+    async def _async_hedged_send(
+            self, headers: dict[str, str], data: bytes, operations: list[BoundOperation],
+            attempt: int, timeout: float) -> dict[str, Any]:
+        """
+        Send a query, and send it a second time once it is slower than the HEDGE_QUANTILE of the latencies
+        of its operations. The response that arrives first is returned, the other request is cancelled.
+        """
+
+        key = tuple(operation.name for operation in operations)
+        latencies = self._latencies.get(key)
+        if latencies is None:
+            latencies = self._latencies[key] = Histogram()
+        start = time.monotonic()
+        first = asyncio.ensure_future(self._async_send(headers, data, operations, attempt, False, timeout))
+        tasks = [first]
+        try:
+            if latencies.count >= HEDGE_MIN_SAMPLES:
+                delay = latencies.quantile(HEDGE_QUANTILE)
+                if delay < timeout:
+                    await asyncio.wait(tasks, timeout=delay)
+                    if not first.done():
+                        self.hedged_requests += 1
+                        if self.instrumentation is not None:
+                            self.instrumentation.record_retry(operations, attempt, 'hedged')
+                        tasks.append(asyncio.ensure_future(
+                            self._async_hedge(headers, data, operations, attempt, timeout - delay)
+                        ))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        latencies.observe(time.monotonic() - start)
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+            raise first.exception()
+        finally:
+            for task in tasks:
+                if task.done():
+                    # Retrieved so that a failed request that lost the race isn't logged as never retrieved
+                    task.cancelled() or task.exception()
+                else:
+                    task.cancel()
+
+    async def _async_hedge(
+            self, headers: dict[str, str], data: bytes, operations: list[BoundOperation],
+            attempt: int, timeout: float) -> dict[str, Any]:
+        """ Send the second request of a hedged query, once the scheduler lets it """
+
+        await self._async_acquire()
+        return await self._async_send(headers, data, operations, attempt, False, timeout)
+
+    async def _async_traced_post(
+            self, headers: dict[str, str], data: bytes, operations: list[BoundOperation],
+            attempt: int, is_cookie: bool | None, timeout: float) -> SimpleCookie | dict[str, Any]:
+        """ Send a request, recording its latency, status and bytes to the instrumentation """
+
+        trace = self.instrumentation.start_request(operations, len(data), attempt)
+        status: int | None = None
+        try:
+            resp = await self.transport.async_post(self.base_url, headers, data, timeout)
+            status = resp.status
+            response = self._response(resp, is_cookie)
+        except BaseException as error:
+            trace.fail(error, status)
+            raise
+        trace.finish(status, resp.body, response)
+        return response
+
+    @contextmanager
+    def deadline(self, seconds: float | None) -> Iterator[None]:
+        """
+        Give the requests sent within the block, including those of the tasks it starts, seconds to be
+        answered. LavviebotTimeout is raised by the requests once it has passed. A deadline within the
+        block of another one can only shorten it, and None leaves the current deadline unchanged.
+        """
+
+        if seconds is None:
+            yield
+            return
+        deadline = time.monotonic() + seconds
+        current = _deadline.get()
+        token = _deadline.set(deadline if current is None else min(current, deadline))
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+    def _phase(self, name: str) -> ContextManager[None]:
+        """ Time a phase of async_get_data, when the client is instrumented """
+
+        return self.instrumentation.phase(name) if self.instrumentation is not None else nullcontext()
+
+    def _response(self, resp: TransportResponse, is_cookie: bool) -> SimpleCookie | dict[str, Any]:
         """ Check response for any errors & return original response if none """
 
         # 500 status returned when current token has been rate-limited
         if resp.status != 200:
-            response_message = await resp.json()
+            # Other server errors may not happen again, and are retried by _post
+            error_type = LavviebotServerError if resp.status >= 500 else LavviebotError
+            try:
+                response_message = self.codec.decode(resp.body)
+            except ValueError as e:
+                raise error_type(f'Lavviebot API error: status {resp.status}') from e
             if 'errors' in response_message:
                 error_message = response_message['errors'][0]['message']
-                if error_message == "Too many requests, please try again in a few minutes.":
+                if error_message == RATE_LIMITED:
                     raise LavviebotRateLimit(
                         'You have been rate limited by the Purrsong API. Decrease the polling frequency or create a new ClientSession.'
                     )
                 else:
-                    raise LavviebotError(f'Lavviebot API error: {response_message}')
+                    raise error_type(f'Lavviebot API error: {response_message}')
             else:
-                raise LavviebotError(f'Lavviebot API error: {response_message}')
+                raise error_type(f'Lavviebot API error: {response_message}')
 
         try:
             if is_cookie:
                 response: SimpleCookie = resp.cookies
             else:
-                response: dict[str, Any] = await resp.json()
+                # Decoded straight from the bytes of the body, without decoding them to str first
+                response: dict[str, Any] = self.codec.decode(resp.body)
         except Exception as e:
             raise LavviebotError(f'Could not return json: {e}') from e
         return response
@@ -0,0 +1,116 @@
+""" Snapshot whose sections are fetched on first access """
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Awaitable, Iterable
+
+import asyncio
+
+from .model import SECTIONS, Cat, LavviebotData, LavvieScanner, LavvieTag, LitterBox, Roster, RosterFilter
+
+if TYPE_CHECKING:
+    from .lavviebot_client import LavviebotClient
+
+
+def _failed(fetch: asyncio.Future | None) -> bool:
+    """ Whether a fetch is missing or has failed, and has to be started again """
+
+    return fetch is None or (fetch.done() and (fetch.cancelled() or fetch.exception() is not None))
+
+
+class LazyLavviebotData:
+    """
+    Lazy variant of LavviebotData. Every section is awaitable and is only fetched the first
+    time it's awaited, then memoized for the lifetime of the snapshot. The devices are
+    discovered once, on the first access to any section, and the cats only when the cats
+    section is accessed. Concurrent accesses to a section share a single fetch, and a
+    fetch that failed is retried on the next access.
+    """
+
+    def __init__(self, client: LavviebotClient, roster_filter: RosterFilter | None = None) -> None:
+        """
+        client: LavviebotClient used to fetch the sections
+        roster_filter: RosterFilter selecting the devices and cats to fetch, or None to fetch everything
+        """
+        self.client: LavviebotClient = client
+        self.roster_filter: RosterFilter | None = roster_filter
+        self._roster: asyncio.Future | None = None
+        self._cats_roster: asyncio.Future | None = None
+        self._fetches: dict[str, asyncio.Future] = {}
+
+    @property
+    def litterboxes(self) -> Awaitable[dict[int, LitterBox]]:
+        """ Awaitable of the litter boxes, keyed by device id """
+
+        return self._async_section('litterboxes')
+
+    @property
+    def lavvie_scanners(self) -> Awaitable[dict[int, LavvieScanner]]:
+        """ Awaitable of the LavvieScanners, keyed by device id """
+
+        return self._async_section('lavvie_scanners')
+
+    @property
+    def lavvie_tags(self) -> Awaitable[dict[int, LavvieTag]]:
+        """ Awaitable of the LavvieTags, keyed by device id """
+
+        return self._async_section('lavvie_tags')
+
+    @property
+    def cats(self) -> Awaitable[dict[int, Cat]]:
+        """ Awaitable of the cats, keyed by cat id """
+
+        return self._async_section('cats')
+
+    @property
+    def fetched(self) -> set[str]:
+        """ Sections that have been fetched successfully """
+
+        return {section for section, fetch in self._fetches.items() if fetch.done() and not _failed(fetch)}
+
+    async def async_resolve(self, sections: Iterable[str] = SECTIONS) -> LavviebotData:
+        """ Fetch the sections that weren't fetched yet in a single batch and return them all as LavviebotData """
+
+        sections = tuple(sections)
+        self._fetch(sections)
+        values = await asyncio.gather(*[self._async_section(section) for section in sections])
+        resolved: dict[str, Any] = {section: {} for section in SECTIONS}
+        resolved.update(zip(sections, values))
+        return LavviebotData(**resolved)
+
+    async def _async_section(self, section: str) -> dict[int, LitterBox | LavvieScanner | LavvieTag | Cat]:
+        """ Fetch a section on first access and return its memoized value """
+
+        if section not in SECTIONS:
+            raise AttributeError(section)
+        self._fetch([section])
+        # Shielded so that a caller giving up doesn't cancel the fetch shared with other callers
+        data: LavviebotData = await asyncio.shield(self._fetches[section])
+        return getattr(data, section)
+
+    def _fetch(self, sections: Iterable[str]) -> None:
+        """ Start a single fetch of the sections that aren't fetched or being fetched """
+
+        missing = [section for section in sections if _failed(self._fetches.get(section))]
+        if missing:
+            fetch = asyncio.ensure_future(self._async_fetch(missing))
+            for section in missing:
+                self._fetches[section] = fetch
+        return None
+
+    async def _async_fetch(self, sections: list[str]) -> LavviebotData:
+        """ Fetch sections in a single batch, discovering what they need first """
+
+        roster = await self._async_roster('cats' in sections)
+        return await self.client.async_get_sections(roster, sections)
+
+    async def _async_roster(self, include_cats: bool) -> Roster:
+        """ Discover the devices once, and the cats once if they are needed """
+
+        if _failed(self._roster):
+            self._roster = asyncio.ensure_future(self.client.async_get_roster(include_cats=False, roster_filter=self.roster_filter))
+        roster: Roster = await asyncio.shield(self._roster)
+        if include_cats:
+            if _failed(self._cats_roster):
+                self._cats_roster = asyncio.ensure_future(self.client.async_discover_roster_cats(roster))
+            await asyncio.shield(self._cats_roster)
+        return roster
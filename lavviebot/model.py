@@ -1,23 +1,137 @@
 """ Data classes for Lavviebot """
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, field, fields
+from typing import Any, Collection, TypeVar
 from datetime import datetime
 
+""" Names of the LavviebotData sections """
+SECTIONS = ('litterboxes', 'lavvie_scanners', 'lavvie_tags', 'cats')
+
+""" Device types, keyed by the discovery field that holds the device """
+DEVICE_TYPES = {'lavviebot': 'lavviebot', 'lavvieScanner': 'lavvie_scanner', 'lavvieTag': 'lavvie_tag'}
+
+_T = TypeVar('_T')
+
+
+def _slotted(cls: type[_T]) -> type[_T]:
+    """
+    Recreate a dataclass with a __slots__ entry per field, so that its instances carry no __dict__.
+    Same as dataclass(slots=True), which needs Python 3.10.
+    """
+
+    names = tuple(model_field.name for model_field in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items() if key not in ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def _frozen_variant(cls: type) -> type:
+    """ Create an immutable, slotted copy of a model, returned by its freeze() method """
+
+    namespace = {
+        '__annotations__': dict(cls.__annotations__),
+        '__doc__': f' Immutable {cls.__name__}. ',
+        '__module__': cls.__module__,
+    }
+    frozen = _slotted(dataclass(frozen=True)(type(f'Frozen{cls.__name__}', (), namespace)))
+    cls._frozen_type = frozen
+    return frozen
+
+
+class _Model:
+    """ Base of the device and cat models """
+
+    __slots__ = ()
+    _frozen_type: type
+
+    def freeze(self) -> Any:
+        """ Return an immutable copy of the model, sharing its values """
+
+        return self._frozen_type(*(getattr(self, name) for name in self.__slots__))
+
 
 @dataclass
 class LavviebotData:
-    """ Dataclass for Lavviebot data. """
+    """
+    Dataclass for Lavviebot data.
+    failed holds, per section, the ids of the devices and cats of the roster whose status couldn't be
+    fetched or parsed, and are left out of the section. They are still on the account.
+    """
 
     litterboxes: dict[int, LitterBox]
     lavvie_scanners: dict[int, LavvieScanner]
     lavvie_tags: dict[int, LavvieTag]
     cats: dict[int, Cat]
+    failed: dict[str, set[int]] = field(default_factory=dict, compare=False)
 
 
 @dataclass
-class LitterBox:
+class Roster:
+    """ Dataclass for the devices and cats discovered on a PurrSong account. """
+
+    locations: list[dict[str, Any]]
+    litter_boxes: list[dict[str, Any]]
+    lavvie_scanners: list[dict[str, Any]]
+    lavvie_tags: list[dict[str, Any]]
+    cats: list[dict[str, Any]]
+    stale: bool = field(default=False, compare=False)
+    cats_discovered: bool = field(default=True, compare=False)
+    roster_filter: RosterFilter | None = field(default=None, compare=False)
+
+    def check_pet(self, pet_id: int | None) -> None:
+        """ Mark the roster as stale when a pet it doesn't know about, and that isn't filtered out, shows up """
+
+        if pet_id is None or not self.cats_discovered or self.stale:
+            return
+        if self.roster_filter is not None and not self.roster_filter.includes_cat({'id': pet_id}):
+            return
+        if all(cat['id'] != pet_id for cat in self.cats):
+            self.stale = True
+
+
+@dataclass
+class RosterFilter:
+    """
+    Dataclass for the devices and cats to fetch, applied right after discovery so that
+    excluded devices and cats never generate a request. None includes everything, an
+    empty collection includes nothing: cat_ids=() skips the cat discovery altogether.
+    device_types: Any of lavviebot, lavvie_scanner and lavvie_tag
+    """
+
+    device_types: Collection[str] | None = None
+    device_ids: Collection[int] | None = None
+    cat_ids: Collection[int] | None = None
+    exclude_device_ids: Collection[int] = ()
+    exclude_cat_ids: Collection[int] = ()
+
+    @property
+    def discovers_cats(self) -> bool:
+        """ Whether any cat can be included, and cats have to be discovered """
+
+        return self.cat_ids is None or len(self.cat_ids) > 0
+
+    def includes_device(self, device: dict[str, Any]) -> bool:
+        """ Whether a discovered device is included """
+
+        if self.device_types is not None and not any(
+                device.get(key) and device_type in self.device_types for key, device_type in DEVICE_TYPES.items()):
+            return False
+        if self.device_ids is not None and device['id'] not in self.device_ids:
+            return False
+        return device['id'] not in self.exclude_device_ids
+
+    def includes_cat(self, cat: dict[str, Any]) -> bool:
+        """ Whether a discovered cat is included """
+
+        if self.cat_ids is not None and cat['id'] not in self.cat_ids:
+            return False
+        return cat['id'] not in self.exclude_cat_ids
+
+
+@_slotted
+@dataclass
+class LitterBox(_Model):
     """ Dataclass for Lavviebot litter box. """
 
     device_id: int
@@ -38,14 +152,15 @@ class LitterBox:
     temperature_c: int
     last_seen: datetime
     last_cat_used_name: str
-    last_used_duration: int
-    last_used: datetime
+    last_used_duration: int | None
+    last_used: datetime | None
     times_used_today: int
     error_log: list
 
 
+@_slotted
 @dataclass
-class LavvieScanner:
+class LavvieScanner(_Model):
     """ Dataclass for LavvieScanner. """
 
     device_id: int
@@ -58,8 +173,9 @@ class LavvieScanner:
     last_seen: datetime
 
 
+@_slotted
 @dataclass
-class LavvieTag:
+class LavvieTag(_Model):
     """ Dataclass for LavvieTag. """
 
     device_id: int
@@ -71,8 +187,9 @@ class LavvieTag:
     last_seen: datetime
 
 
+@_slotted
 @dataclass
-class Cat:
+class Cat(_Model):
     """ Dataclass for Lavviebot cat. """
 
     cat_id: int
@@ -88,3 +205,8 @@ class Cat:
     resting: int  # expressed in seconds
     sleeping: int # expressed in seconds
 
+
+FrozenLitterBox = _frozen_variant(LitterBox)
+FrozenLavvieScanner = _frozen_variant(LavvieScanner)
+FrozenLavvieTag = _frozen_variant(LavvieTag)
+FrozenCat = _frozen_variant(Cat)
@@ -0,0 +1,152 @@
+""" Registry of the GraphQL operations sent to the PurrSong API """
+from __future__ import annotations
+
+from typing import Any
+
+import json
+import re
+
+from http.cookies import SimpleCookie
+
+from .codec import DEFAULT_CODEC, JsonCodec
+from .constants import (ACCEPT, ACCEPT_ENCODING, ACCEPT_LANGUAGE, CAT_STATUS,
+                        CONNECTION, CONTENT_TYPE, COOKIE_QUERY, DISCOVER_CATS,
+                        DISCOVER_DEVICES, LAVVIE_SCANNER_STATUS, LAVVIE_TAG_STATUS,
+                        LB_CAT_LOG, LB_ERROR_LOG, LB_STATUS, LEAN_CAT_STATUS,
+                        LEAN_DISCOVER_CATS, LEAN_DISCOVER_DEVICES, LEAN_LAVVIE_SCANNER_STATUS,
+                        LEAN_LAVVIE_TAG_STATUS, LEAN_LB_CAT_LOG, LEAN_LB_ERROR_LOG,
+                        LEAN_LB_STATUS, LEAN_UNKNOWN_STATUS, TOKEN_QUERY,
+                        UNKNOWN_STATUS, USER_AGENT,)
+
+# Variables declared in the header of an operation, up to the opening brace of its selection set
+_VARIABLE = re.compile(r'\$(\w+)\s*:')
+
+
+class Operation:
+    """
+    GraphQL operation whose static parts are encoded once.
+    The operation name and query are pre-encoded to bytes, so that only
+    the variables need to be serialized every time the operation is sent.
+    Variables the query doesn't declare are left out when binding, so that the
+    same variables can be bound to the full and lean variants of an operation.
+    """
+
+    __slots__ = ('name', 'query', 'declared', 'read_only', '_prefix')
+
+    def __init__(self, name: str, query: str) -> None:
+        self.name: str = name
+        self.query: str = query
+        self.declared: frozenset[str] = frozenset(_VARIABLE.findall(query.split('{', 1)[0]))
+        # Queries can be sent twice without side effects, unlike mutations
+        self.read_only: bool = query.lstrip().startswith('query')
+        self._prefix: bytes = (
+            '{"operationName":' + json.dumps(name) + ',"query":' + json.dumps(query) + ',"variables":'
+        ).encode()
+
+    def bind(self, variables: dict[str, Any], codec: JsonCodec = DEFAULT_CODEC) -> BoundOperation:
+        """ Return the operation ready to be sent with the given variables, encoded by codec """
+
+        if not self.declared.issuperset(variables):
+            variables = {name: value for name, value in variables.items() if name in self.declared}
+        return BoundOperation(self, variables, codec)
+
+    def encode(self, variables: dict[str, Any], codec: JsonCodec = DEFAULT_CODEC) -> bytes:
+        """ Encode the JSON payload of the operation with the given variables """
+
+        return self._prefix + codec.encode(variables) + b'}'
+
+    def __repr__(self) -> str:
+        return f'Operation({self.name!r})'
+
+
+class BoundOperation:
+    """ Operation together with its variables and encoded payload """
+
+    __slots__ = ('operation', 'variables', 'body')
+
+    def __init__(self, operation: Operation, variables: dict[str, Any], codec: JsonCodec = DEFAULT_CODEC) -> None:
+        self.operation: Operation = operation
+        self.variables: dict[str, Any] = variables
+        self.body: bytes = operation.encode(variables, codec)
+
+    @property
+    def name(self) -> str:
+        """ operationName of the bound operation """
+
+        return self.operation.name
+
+    def __repr__(self) -> str:
+        return f'BoundOperation({self.operation.name!r}, {self.variables!r})'
+
+
+def encode_batch(operations: list[BoundOperation]) -> bytes:
+    """ Encode a list of operations into the payload of a single batched request """
+
+    return b'[' + b','.join(operation.body for operation in operations) + b']'
+
+
+def build_headers(cookie: SimpleCookie | None = None, token: str | None = None) -> dict[str, str]:
+    """ Build the request headers, including the cookie and authorization token when available """
+
+    headers = {
+        'Accept': ACCEPT,
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'Accept-Language': ACCEPT_LANGUAGE,
+        'Connection': CONNECTION,
+        'Content-Type': CONTENT_TYPE,
+        'User-Agent': USER_AGENT
+    }
+    if cookie is not None:
+        headers['Cookie'] = '; '.join(f'{key}={morsel.value}' for key, morsel in cookie.items())
+    if token is not None:
+        headers['Authorization'] = token
+    return headers
+
+
+CHECK_SERVER_STATUS = Operation("CheckServerStatus", COOKIE_QUERY)
+LOGIN = Operation("Login", TOKEN_QUERY)
+PURRSONG_TAB_LOCATIONS = Operation("PurrsongTabLocations", DISCOVER_DEVICES)
+CAT_MAIN = Operation("CatMain", DISCOVER_CATS)
+GET_LAVVIEBOT_DETAILS = Operation("GetLavviebotDetails", LB_STATUS)
+GET_IOT_POOP_RECORD = Operation("GetIotPoopRecord", LB_CAT_LOG)
+GET_IOT_ERROR_LOG = Operation("GetIotErrorLog", LB_ERROR_LOG)
+GET_LAVVIE_SCANNER_DETAILS = Operation("GetLavvieScannerDetails", LAVVIE_SCANNER_STATUS)
+GET_LAVVIE_TAG_DETAILS = Operation("GetLavvieTagDetails", LAVVIE_TAG_STATUS)
+GET_UNKNOWN_POOP_DATA = Operation("GetUnknownPoopData", UNKNOWN_STATUS)
+GET_CAT_HEALTH_INFO = Operation("GetCatHealthInfo", CAT_STATUS)
+
+""" All operations keyed by operationName """
+OPERATIONS: dict[str, Operation] = {
+    operation.name: operation for operation in (
+        CHECK_SERVER_STATUS, LOGIN, PURRSONG_TAB_LOCATIONS, CAT_MAIN,
+        GET_LAVVIEBOT_DETAILS, GET_IOT_POOP_RECORD, GET_IOT_ERROR_LOG,
+        GET_LAVVIE_SCANNER_DETAILS, GET_LAVVIE_TAG_DETAILS,
+        GET_UNKNOWN_POOP_DATA, GET_CAT_HEALTH_INFO,
+    )
+}
+
+LEAN_PURRSONG_TAB_LOCATIONS = Operation("PurrsongTabLocations", LEAN_DISCOVER_DEVICES)
+LEAN_CAT_MAIN = Operation("CatMain", LEAN_DISCOVER_CATS)
+LEAN_GET_LAVVIEBOT_DETAILS = Operation("GetLavviebotDetails", LEAN_LB_STATUS)
+LEAN_GET_IOT_POOP_RECORD = Operation("GetIotPoopRecord", LEAN_LB_CAT_LOG)
+LEAN_GET_IOT_ERROR_LOG = Operation("GetIotErrorLog", LEAN_LB_ERROR_LOG)
+LEAN_GET_LAVVIE_SCANNER_DETAILS = Operation("GetLavvieScannerDetails", LEAN_LAVVIE_SCANNER_STATUS)
+LEAN_GET_LAVVIE_TAG_DETAILS = Operation("GetLavvieTagDetails", LEAN_LAVVIE_TAG_STATUS)
+LEAN_GET_UNKNOWN_POOP_DATA = Operation("GetUnknownPoopData", LEAN_UNKNOWN_STATUS)
+LEAN_GET_CAT_HEALTH_INFO = Operation("GetCatHealthInfo", LEAN_CAT_STATUS)
+
+""" Operations selecting only the fields the client parses, keyed by operationName """
+LEAN_OPERATIONS: dict[str, Operation] = {
+    operation.name: operation for operation in (
+        CHECK_SERVER_STATUS, LOGIN, LEAN_PURRSONG_TAB_LOCATIONS, LEAN_CAT_MAIN,
+        LEAN_GET_LAVVIEBOT_DETAILS, LEAN_GET_IOT_POOP_RECORD, LEAN_GET_IOT_ERROR_LOG,
+        LEAN_GET_LAVVIE_SCANNER_DETAILS, LEAN_GET_LAVVIE_TAG_DETAILS,
+        LEAN_GET_UNKNOWN_POOP_DATA, LEAN_GET_CAT_HEALTH_INFO,
+    )
+}
+
+""" Operations of every query profile a client can be created with """
+QUERY_PROFILES: dict[str, dict[str, Operation]] = {
+    "full": OPERATIONS,
+    "lean": LEAN_OPERATIONS,
+}
@@ -0,0 +1,116 @@
+""" Tiered polling, refreshing every class of data at its own interval """
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import logging
+import time
+
+from .constants import (CATS_INTERVAL, LAVVIE_DEVICES_INTERVAL, LITTER_BOXES_INTERVAL,
+                        ROSTER_INTERVAL,)
+from .model import LavviebotData, Roster, RosterFilter
+
+if TYPE_CHECKING:
+    from .lavviebot_client import LavviebotClient
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+
+@dataclass
+class PollingIntervals:
+    """ Dataclass for the refresh interval, in seconds, of every class of data. """
+
+    roster: float = ROSTER_INTERVAL
+    litterboxes: float = LITTER_BOXES_INTERVAL
+    lavvie_scanners: float = LAVVIE_DEVICES_INTERVAL
+    lavvie_tags: float = LAVVIE_DEVICES_INTERVAL
+    cats: float = CATS_INTERVAL
+
+
+class TieredPoller:
+    """
+    Polls a LavviebotClient, refreshing only the classes of data that are due.
+    Sections that aren't due are served from the previous poll. The roster is
+    refreshed early when a device or cat status refers to a pet it doesn't know.
+    Every unfiltered poll is diffed by the ChangeTracker of the client, if it has one.
+    """
+
+    def __init__(
+            self, client: LavviebotClient,
+            intervals: PollingIntervals | None = None,
+            roster_filter: RosterFilter | None = None
+    ) -> None:
+        """
+        client: LavviebotClient used to fetch data
+        intervals: PollingIntervals or None to use the default intervals
+        roster_filter: RosterFilter selecting the devices and cats to poll, or None to poll everything
+        """
+        self.client: LavviebotClient = client
+        self.intervals: PollingIntervals = intervals if intervals else PollingIntervals()
+        self.roster_filter: RosterFilter | None = roster_filter
+        self.roster: Roster | None = None
+        self.data: LavviebotData = LavviebotData(litterboxes={}, lavvie_scanners={}, lavvie_tags={}, cats={})
+        self._refreshed: dict[str, float] = {}
+
+    def invalidate(self, section: str | None = None) -> None:
+        """ Refresh a section, or the roster and every section when None, on the next poll """
+
+        if section is None:
+            self._refreshed.clear()
+        else:
+            self._refreshed.pop(section, None)
+
+    def due(self, now: float | None = None) -> set[str]:
+        """ Sections, and 'roster', whose interval has elapsed """
+
+        now = time.monotonic() if now is None else now
+        return {
+            section for section, interval in vars(self.intervals).items()
+            if now - self._refreshed.get(section, float('-inf')) >= interval
+        }
+
+    async def async_poll(self) -> LavviebotData:
+        """
+        Refresh the sections that are due and return the latest data of every section.
+        The requests of a poll have the get_data_deadline of the client to be answered.
+        A device or cat whose status failed keeps the state of the previous poll.
+        """
+
+        now = time.monotonic()
+        due = self.due(now)
+        failed: dict[str, set[int]] = {}
+        with self.client.deadline(self.client.get_data_deadline):
+            if self.roster is None or self.roster.stale or 'roster' in due:
+                self.roster = await self.client.async_get_roster(roster_filter=self.roster_filter)
+                self._refreshed['roster'] = now
+                # Every section is refreshed along with the roster, so that removed entities disappear
+                due.update(vars(self.intervals))
+            due.discard('roster')
+
+            if due:
+                LOGGER.debug(f'Refreshing sections: {sorted(due)}')
+                fetched = await self.client.async_get_sections(self.roster, due)
+                failed = fetched.failed
+                for section in due:
+                    entities = getattr(fetched, section)
+                    # Devices and cats whose status failed keep their previous state until it's fetched again
+                    previous = getattr(self.data, section)
+                    for entity_id in fetched.failed.get(section, ()):
+                        if entity_id in previous:
+                            entities[entity_id] = previous[entity_id]
+                    setattr(self.data, section, entities)
+                    self._refreshed[section] = now
+                if self.roster.stale:
+                    LOGGER.debug('Unknown pet found, the roster will be refreshed on the next poll')
+
+        data = LavviebotData(
+            litterboxes=self.data.litterboxes,
+            lavvie_scanners=self.data.lavvie_scanners,
+            lavvie_tags=self.data.lavvie_tags,
+            cats=self.data.cats,
+            failed=failed
+        )
+        if self.client.changes is not None and self.roster_filter is None:
+            self.client.changes.update(data)
+        return data
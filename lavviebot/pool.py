@@ -0,0 +1,196 @@
+""" Pool of clients polling many PurrSong accounts over one connection pool """
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import asyncio
+import logging
+import time
+
+from aiohttp import ClientSession, DummyCookieJar, TCPConnector
+
+from .breaker import BreakerState, CircuitBreaker
+from .constants import MAX_CONCURRENT_POLLS, POOL_CONNECTION_LIMIT, POOL_LATENCY_SAMPLES
+from .exceptions import LavviebotCircuitOpen, LavviebotError
+from .lavviebot_client import LavviebotClient
+from .model import LavviebotData
+from .polling import PollingIntervals, TieredPoller
+
+LOGGER = logging.getLogger("lavviebotaio")
+
+
+@dataclass
+class PoolStats:
+    """ Dataclass for the aggregated statistics of a client pool. """
+
+    accounts: int
+    polls: int
+    failed_polls: int
+    in_flight: int
+    polls_per_second: float
+    mean_latency: float
+    p50_latency: float
+    p95_latency: float
+    max_latency: float
+
+
+class LavviebotClientPool:
+    """
+    Manages the clients of many PurrSong accounts sharing a single aiohttp connector.
+    Every account keeps its own client, so logins, tokens, request scheduling and rate
+    limits stay isolated per account. Polls are handed out to a bounded number of workers
+    in FIFO order, and every round starts where the previous one left off, so that no
+    account is always polled first or starved by slow ones. Accounts share a circuit breaker,
+    as they share the PurrSong API, and while it's open rounds are skipped without polling.
+    """
+
+    # Window, in seconds, over which the poll throughput is observed
+    WINDOW = 60.0
+
+    def __init__(
+            self, session: ClientSession | None = None,
+            connection_limit: int = POOL_CONNECTION_LIMIT,
+            max_concurrent_polls: int = MAX_CONCURRENT_POLLS,
+            intervals: PollingIntervals | None = None,
+            latency_samples: int = POOL_LATENCY_SAMPLES,
+            breaker: CircuitBreaker | None = None
+    ) -> None:
+        """
+        session: aiohttp.ClientSession shared by every client, or None to create one.
+                 A session passed in should not share cookies, see DummyCookieJar.
+        connection_limit: Maximum number of connections open at once, when the session is created by the pool
+        max_concurrent_polls: Maximum number of accounts polled at once
+        intervals: PollingIntervals of the TieredPoller of every account, or None to use the default intervals
+        latency_samples: Number of recent poll latencies the latency statistics are computed over
+        breaker: CircuitBreaker shared by every client, or None to create one
+        """
+        self._owns_session: bool = session is None
+        self._session = session if session else ClientSession(
+            connector=TCPConnector(limit=connection_limit),
+            cookie_jar=DummyCookieJar()
+        )
+        self.max_concurrent_polls: int = max_concurrent_polls
+        self.intervals: PollingIntervals | None = intervals
+        self.breaker: CircuitBreaker = breaker if breaker else CircuitBreaker()
+        self._pollers: dict[str, TieredPoller] = {}
+        self._offset: int = 0
+        self._latencies: deque[float] = deque(maxlen=latency_samples)
+        self._completed: deque[float] = deque()
+        self.polls: int = 0
+        self.failed_polls: int = 0
+        self.in_flight: int = 0
+
+    @property
+    def clients(self) -> dict[str, LavviebotClient]:
+        """ Client of every account, keyed by email """
+
+        return {email: poller.client for email, poller in self._pollers.items()}
+
+    @property
+    def stats(self) -> PoolStats:
+        """ Return the aggregated throughput and latency of the polls """
+
+        now = time.monotonic()
+        while self._completed and self._completed[0] < now - self.WINDOW:
+            self._completed.popleft()
+        window = min(self.WINDOW, max(1.0, now - self._completed[0])) if self._completed else self.WINDOW
+        latencies = sorted(self._latencies)
+        return PoolStats(
+            accounts=len(self._pollers),
+            polls=self.polls,
+            failed_polls=self.failed_polls,
+            in_flight=self.in_flight,
+            polls_per_second=len(self._completed) / window,
+            mean_latency=sum(latencies) / len(latencies) if latencies else 0.0,
+            p50_latency=latencies[int(0.5 * (len(latencies) - 1))] if latencies else 0.0,
+            p95_latency=latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            max_latency=latencies[-1] if latencies else 0.0,
+        )
+
+    def add_account(self, email: str, password: str, **kwargs: Any) -> LavviebotClient:
+        """
+        Create the client of an account on the shared session.
+        kwargs: Other LavviebotClient arguments, such as credential_store or cache
+        """
+
+        if email in self._pollers:
+            raise LavviebotError(f'Account {email} is already in the pool')
+        kwargs.setdefault('breaker', self.breaker)
+        client = LavviebotClient(email, password, self._session, **kwargs)
+        self._pollers[email] = TieredPoller(client, self.intervals)
+        return client
+
+    def remove_account(self, email: str) -> None:
+        """ Stop polling an account """
+
+        self._pollers.pop(email, None)
+        return None
+
+    async def async_poll(self, email: str) -> LavviebotData:
+        """ Poll a single account """
+
+        poller = self._pollers[email]
+        start = time.monotonic()
+        self.in_flight += 1
+        try:
+            data = await poller.async_poll()
+        except Exception:
+            self.failed_polls += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            end = time.monotonic()
+            self.polls += 1
+            self._latencies.append(end - start)
+            self._completed.append(end)
+        return data
+
+    async def async_poll_all(
+            self, callback: Callable[[str, LavviebotData | Exception], Any] | None = None
+    ) -> dict[str, LavviebotData | Exception]:
+        """
+        Poll every account once. The failure of an account is returned in place of its data
+        instead of failing the round. While the circuit breaker is open, no account is polled
+        and every one of them gets a LavviebotCircuitOpen.
+        callback: Called with the email and result of every account as soon as it was polled
+        """
+
+        emails = list(self._pollers)
+        if not emails:
+            return {}
+        if self.breaker.state is BreakerState.OPEN:
+            LOGGER.debug(f'Skipping the poll of {len(emails)} accounts, PurrSong API is unavailable')
+            message = f'PurrSong API is unavailable, polls are skipped for {self.breaker.retry_after:.0f} more seconds'
+            skipped: dict[str, LavviebotData | Exception] = {email: LavviebotCircuitOpen(message) for email in emails}
+            if callback is not None:
+                for email, error in skipped.items():
+                    callback(email, error)
+            return skipped
+        self._offset %= len(emails)
+        queue: deque[str] = deque(emails[self._offset:] + emails[:self._offset])
+        self._offset += 1
+        results: dict[str, LavviebotData | Exception] = {}
+
+        async def worker() -> None:
+            while queue:
+                email = queue.popleft()
+                try:
+                    result: LavviebotData | Exception = await self.async_poll(email)
+                except Exception as error:
+                    LOGGER.error(f'Account {email} could not be polled: {error!r}')
+                    result = error
+                results[email] = result
+                if callback is not None:
+                    callback(email, result)
+
+        await asyncio.gather(*[worker() for _ in range(min(self.max_concurrent_polls, len(emails)))])
+        return results
+
+    async def async_close(self) -> None:
+        """ Close the shared session, if it was created by the pool """
+
+        if self._owns_session:
+            await self._session.close()
+        return None
@@ -0,0 +1,178 @@
+""" Rate-limit-aware scheduling of requests sent to the PurrSong API """
+from __future__ import annotations
+
+from collections import deque
+
+import asyncio
+import random
+import time
+
+from .constants import (RATE_LIMIT_BACKOFF, RATE_LIMIT_MAX_BACKOFF, REQUEST_BURST,
+                        REQUEST_MAX_RATE, REQUEST_MIN_RATE, REQUEST_RATE,)
+
+
+class RequestScheduler:
+    """
+    Token bucket in front of every request of a client.
+    Requests wait in FIFO order for a token instead of failing. The rate adapts
+    to PurrSong's rate limit: it grows additively while requests succeed, and is
+    cut when the limit is hit, after which requests are held back for a jittered
+    exponential backoff. When the window holds at least MIN_OBSERVED_REQUESTS
+    requests, the rate observed is learned as the limit and the rate is cut below
+    it. With fewer, as after being idle, the rate observed says nothing about the
+    limit: the rate is only cut and nothing is learned. The learned limit is probed
+    upward for every window without a rate-limit response, and forgotten once it's
+    above max_rate.
+    """
+
+    # Window, in seconds, over which the sustained request rate is observed
+    WINDOW = 60.0
+    # Fraction of the learned limit the rate is allowed to grow back to
+    SAFETY_MARGIN = 0.9
+    # Requests the window has to hold for the rate observed over it to be learned as the limit
+    MIN_OBSERVED_REQUESTS = 10
+    # Fraction the learned limit is raised by for every window without a rate-limit response
+    LIMIT_PROBE = 0.1
+
+    def __init__(
+            self, rate: float = REQUEST_RATE,
+            burst: int = REQUEST_BURST,
+            min_rate: float = REQUEST_MIN_RATE,
+            max_rate: float = REQUEST_MAX_RATE,
+            backoff: float = RATE_LIMIT_BACKOFF,
+            max_backoff: float = RATE_LIMIT_MAX_BACKOFF,
+            increase: float = 0.05,
+            decrease: float = 0.5
+    ) -> None:
+        """
+        rate: Initial number of requests per second
+        burst: Number of requests that can be sent at once after being idle
+        min_rate: Rate is never decreased below this number of requests per second
+        max_rate: Rate is never increased above this number of requests per second
+        backoff: Base backoff in seconds after the first rate-limit response
+        max_backoff: Upper bound of the backoff in seconds
+        increase: Requests per second added to the rate for every second of successful requests
+        decrease: Factor applied to the observed rate when the rate limit is hit
+        """
+        self.rate: float = rate
+        self.burst: int = burst
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self._tokens: float = float(burst)
+        self._updated: float = time.monotonic()
+        self._backoff_until: float = 0.0
+        self._consecutive_rate_limits: int = 0
+        self._sent: deque[float] = deque()
+        # Created on first use, as it binds to the event loop current when it's created before Python 3.10
+        self._lock: asyncio.Lock | None = None
+        self.learned_limit: float | None = None
+        self._limit_probed: float = 0.0
+        self.queued: int = 0
+        self.request_count: int = 0
+        self.rate_limited_count: int = 0
+        self.wait_seconds: float = 0.0
+
+    @property
+    def observed_rate(self) -> float:
+        """ Requests per second sent over the last WINDOW seconds """
+
+        now = time.monotonic()
+        self._expire(now)
+        if not self._sent:
+            return 0.0
+        return len(self._sent) / min(self.WINDOW, max(1.0, now - self._sent[0]))
+
+    @property
+    def backing_off(self) -> bool:
+        """ Whether requests are currently held back after a rate-limit response """
+
+        return time.monotonic() < self._backoff_until
+
+    async def async_acquire(self) -> None:
+        """ Wait until a request may be sent """
+
+        self.queued += 1
+        start = time.monotonic()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = max(self._backoff_until - now, (1 - self._tokens) / self.rate)
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self._tokens -= 1
+                self._expire(now)
+                self._sent.append(now)
+                self.request_count += 1
+        finally:
+            self.queued -= 1
+            self.wait_seconds += time.monotonic() - start
+
+    def on_success(self) -> None:
+        """ Additively increase the rate after a request that wasn't rate limited """
+
+        self._consecutive_rate_limits = 0
+        if self.learned_limit is not None:
+            self._probe_limit(time.monotonic())
+        ceiling = self.max_rate
+        if self.learned_limit is not None:
+            ceiling = min(ceiling, max(self.min_rate, self.learned_limit * self.SAFETY_MARGIN))
+        if self.rate < ceiling:
+            self.rate = min(ceiling, self.rate + self.increase / self.rate)
+
+    def on_rate_limited(self) -> float:
+        """
+        Cut the rate below the rate the limit was hit at, and hold requests back
+        for a jittered exponential backoff. Returns the backoff in seconds.
+        """
+
+        now = time.monotonic()
+        self.rate_limited_count += 1
+        self._consecutive_rate_limits += 1
+        observed = self.observed_rate
+        if len(self._sent) >= self.MIN_OBSERVED_REQUESTS:
+            # The limit was hit at the observed rate, so it is the best estimate of the sustained limit
+            self.learned_limit = observed
+            self.rate = max(self.min_rate, min(self.rate, observed) * self.decrease)
+        else:
+            # Too few requests were sent over the window for their rate to tell anything about the limit
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+        # The learned limit is only probed upward after a whole window without a rate-limit response
+        self._limit_probed = now
+        self._tokens = 0.0
+        self._updated = now
+        backoff = min(self.max_backoff, self.backoff * 2 ** (self._consecutive_rate_limits - 1))
+        backoff = random.uniform(backoff / 2, backoff)
+        self._backoff_until = max(self._backoff_until, now + backoff)
+        return backoff
+
+    def _probe_limit(self, now: float) -> None:
+        """ Raise the learned limit for every window without a rate-limit response, forgetting it above max_rate """
+
+        windows = int((now - self._limit_probed) // self.WINDOW)
+        if windows <= 0:
+            return
+        self._limit_probed += windows * self.WINDOW
+        self.learned_limit *= (1 + self.LIMIT_PROBE) ** windows
+        if self.learned_limit * self.SAFETY_MARGIN >= self.max_rate:
+            self.learned_limit = None
+
+    def _refill(self, now: float) -> None:
+        """ Add the tokens accumulated since the last refill """
+
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _expire(self, now: float) -> None:
+        """ Forget requests sent before the observation window """
+
+        while self._sent and self._sent[0] < now - self.WINDOW:
+            self._sent.popleft()
@@ -0,0 +1,195 @@
+""" Declarative mapping from PurrSong responses to model fields, compiled into extractor functions """
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Callable
+from zoneinfo import ZoneInfo
+
+from .exceptions import LavviebotSchemaError
+
+""" Grams per pound, PurrSong reports every weight in grams """
+GRAMS_PER_POUND = 455.1
+
+""" Time zone PurrSong timestamps are issued in, built once """
+PURRSONG_TIME_ZONE = ZoneInfo('Asia/Seoul')
+
+
+def grams_to_pounds(grams: float) -> float:
+    """ Convert a weight reported by PurrSong to pounds """
+
+    return grams / GRAMS_PER_POUND
+
+
+def epoch_ms_to_datetime(epoch_ms: int | str) -> datetime:
+    """ Convert a PurrSong timestamp, in milliseconds since the epoch, to an aware local datetime """
+
+    return datetime.fromtimestamp(int(epoch_ms) / 1000, tz=PURRSONG_TIME_ZONE).astimezone()
+
+
+class Field:
+    """
+    Path of a model field in a response, with the conversion applied to its value.
+    A missing or null value gives the default. A missing or null container along the
+    path raises LavviebotSchemaError, unless the field is nullable.
+    """
+
+    __slots__ = ('path', 'convert', 'default', 'nullable')
+
+    def __init__(
+            self, *path: str | int,
+            convert: Callable[[Any], Any] | None = None,
+            default: Any = None,
+            nullable: bool = False
+    ) -> None:
+        """
+        path: Keys and list indexes leading to the value
+        convert: Applied to the value when it isn't null
+        default: Value of the field when the value is missing or null
+        nullable: Whether containers along the path may be missing or null too
+        """
+        self.path: tuple[str | int, ...] = path
+        self.convert: Callable[[Any], Any] | None = convert
+        self.default: Any = default
+        self.nullable: bool = nullable
+
+
+class Schema:
+    """
+    Model fields read from one response. The schema is compiled once into a function
+    that walks every container shared by several fields only once. A response that
+    doesn't have the expected shape, or holds a value its conversion fails on, is handed
+    to a slower path that applies the defaults and reports the exact path at fault.
+    """
+
+    def __init__(self, name: str, fields: dict[str, Field]) -> None:
+        """
+        name: Name of the response, used in errors
+        fields: Field of every model attribute, keyed by attribute name
+        """
+        self.name: str = name
+        self.fields: dict[str, Field] = fields
+        self._extract: Callable[[Any], dict[str, Any]] = self._compile()
+
+    def extract(self, response: Any) -> dict[str, Any]:
+        """ Return the value of every field of the schema, keyed by attribute name """
+
+        try:
+            return self._extract(response)
+        except Exception:
+            # Conversions may raise anything on a value of the wrong type, the checked path reports it
+            return self._extract_checked(response)
+
+    def _compile(self) -> Callable[[Any], dict[str, Any]]:
+        """ Generate the extractor, binding every container shared by several fields to a local """
+
+        containers: dict[tuple, str] = {(): 'response'}
+        lines: list = []
+        for field in self.fields.values():
+            for depth in range(1, len(field.path)):
+                prefix = field.path[:depth]
+                if prefix not in containers:
+                    containers[prefix] = f'_c{len(containers)}'
+                    lines.append(f'    {containers[prefix]} = {containers[prefix[:-1]]}[{prefix[-1]!r}]')
+
+        namespace: dict[str, Any] = {}
+        values: list = []
+        for index, (name, field) in enumerate(self.fields.items()):
+            namespace[f'_convert{index}'] = field.convert
+            namespace[f'_default{index}'] = field.default
+            lines.append(f'    _v{index} = {containers[field.path[:-1]]}.get({field.path[-1]!r})')
+            converted = f'_convert{index}(_v{index})' if field.convert else f'_v{index}'
+            values.append(f'        {name!r}: _default{index} if _v{index} is None else {converted},')
+
+        source = '\n'.join(['def extract(response):', *lines, '    return {', *values, '    }'])
+        exec(compile(source, f'<schema {self.name}>', 'exec'), namespace)
+        return namespace['extract']
+
+    def _extract_checked(self, response: Any) -> dict[str, Any]:
+        """ Extract every field one path at a time, applying defaults and reporting missing paths and invalid values """
+
+        values: dict[str, Any] = {}
+        for name, field in self.fields.items():
+            node = response
+            for depth, key in enumerate(field.path):
+                is_leaf = depth == len(field.path) - 1
+                try:
+                    node = node[key]
+                except (KeyError, IndexError, TypeError):
+                    node = None
+                if node is None:
+                    if not is_leaf and not field.nullable:
+                        path = '.'.join(str(part) for part in field.path[:depth + 1])
+                        raise LavviebotSchemaError(f'{self.name} response is missing {path}, needed for {name}')
+                    break
+            if node is None or field.convert is None:
+                values[name] = field.default if node is None else node
+                continue
+            try:
+                values[name] = field.convert(node)
+            except Exception as error:
+                path = '.'.join(str(part) for part in field.path)
+                raise LavviebotSchemaError(
+                    f'{self.name} response has an invalid {path}, needed for {name}: {node!r} ({error})'
+                ) from error
+        return values
+
+
+""" Litter box fields read from GetLavviebotDetails """
+LITTER_BOX_DETAILS = Schema('GetLavviebotDetails', {
+    'iot_code_tail': Field('data', 'getIotDetail', 'iotCodeTail'),
+    'latest_firmware': Field('data', 'getIotDetail', 'latestFirmwareVersion'),
+    'router_ssid': Field('data', 'getIotDetail', 'lavviebot', 'routerSSID'),
+    'min_bottom_weight_pnds': Field('data', 'getIotDetail', 'lavviebot', 'minBottomWeight', convert=grams_to_pounds),
+    'beacon_battery': Field('data', 'getIotDetail', 'lavviebot', 'beaconBattery'),
+    'current_firmware': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'currentFirmwareVersion'),
+    'motor_state': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'motorState'),
+    'top_litter_status': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'topLitterStatus'),
+    'waste_drawer_status': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'wasteDrawerStatus'),
+    'wait_time': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'waitTime'),
+    'litter_type': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'litterType'),
+    'litter_bottom_amount_pnds': Field(
+        'data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'litterBottomAmount', convert=grams_to_pounds
+    ),
+    'humidity': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'humidity'),
+    'temperature_c': Field('data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'temperature'),
+    'last_seen': Field(
+        'data', 'getIotDetail', 'lavviebot', 'recentLavviebotLog', 'creationTime', convert=epoch_ms_to_datetime
+    ),
+})
+
+""" Litter box fields read from the most recent record of GetIotPoopRecord """
+LITTER_BOX_LAST_USAGE = Schema('GetIotPoopRecord', {
+    'last_cat_used_name': Field('data', 'getIotPoopRecord', 'catUsageHistory', 0, 'nickname',
+                                default='Unknown', nullable=True),
+    'last_used_duration': Field('data', 'getIotPoopRecord', 'catUsageHistory', 0, 'duration', nullable=True),
+    'last_used': Field('data', 'getIotPoopRecord', 'catUsageHistory', 0, 'creationTime',
+                       convert=epoch_ms_to_datetime, nullable=True),
+})
+
+""" LavvieScanner fields read from GetLavvieScannerDetails """
+LAVVIE_SCANNER_DETAILS = Schema('GetLavvieScannerDetails', {
+    'iot_code_tail': Field('data', 'getIotDetail', 'iotCodeTail'),
+    'latest_firmware': Field('data', 'getIotDetail', 'latestFirmwareVersion'),
+    'router_ssid': Field('data', 'getIotDetail', 'lavvieScanner', 'routerSSID'),
+    'wifi_status': Field('data', 'getIotDetail', 'lavvieScanner', 'wifiStatus'),
+    'current_firmware': Field('data', 'getIotDetail', 'lavvieScanner', 'recentLavvieScannerLog',
+                              'currentFirmwareVersion'),
+    'last_seen': Field('data', 'getIotDetail', 'lavvieScanner', 'recentLavvieScannerLog', 'creationTime',
+                       convert=epoch_ms_to_datetime),
+})
+
+""" LavvieTag fields read from GetLavvieTagDetails """
+LAVVIE_TAG_DETAILS = Schema('GetLavvieTagDetails', {
+    'iot_code_tail': Field('data', 'getIotDetail', 'iotCodeTail'),
+    'latest_firmware': Field('data', 'getIotDetail', 'latestFirmwareVersion'),
+    'current_firmware': Field('data', 'getIotDetail', 'lavvieTag', 'currentFirmwareVersion'),
+    'battery': Field('data', 'getIotDetail', 'lavvieTag', 'battery'),
+    'last_seen': Field('data', 'getIotDetail', 'lavvieTag', 'recentConnectionTime', convert=epoch_ms_to_datetime),
+})
+
+""" Cat fields read from GetCatHealthInfo and GetUnknownPoopData, today's totals are null until the cat was seen """
+CAT_HEALTH = Schema('GetCatHealthInfo', {
+    'cat_weight_pnds': Field('data', 'weightData', 'today', convert=grams_to_pounds, default=0.0, nullable=True),
+    'duration': Field('data', 'poopDuration', 'today', default=0.0, nullable=True),
+    'poop_count': Field('data', 'poopCount', 'today', default=0, nullable=True),
+})
@@ -0,0 +1,259 @@
+""" Transports sending the requests of Lavviebot Client: over aiohttp, in memory, or replayed from a recording """
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Union
+
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+
+from http.cookies import SimpleCookie
+
+from aiohttp import ClientSession, ClientTimeout
+
+from ._files import atomic_write_json
+from .codec import DEFAULT_CODEC, JsonCodec
+from .exceptions import LavviebotError
+
+
+@dataclass
+class TransportResponse:
+    """ Dataclass for the response to a request, with its body as it was received. """
+
+    status: int
+    body: bytes
+    cookies: SimpleCookie = field(default_factory=SimpleCookie)
+
+
+""" Handler of an InMemoryTransport: called with the variables of an operation, returns its response """
+Handler = Callable[[dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+
+class Transport(ABC):
+    """
+    Base class of the ways the requests of a client reach the PurrSong API.
+    A transport missing async_post can't be instantiated.
+    """
+
+    @abstractmethod
+    async def async_post(self, url: str, headers: dict[str, str], data: bytes, timeout: float) -> TransportResponse:
+        """
+        Send a request and return its response, raising on errors of the connection,
+        and asyncio.TimeoutError when it isn't answered within timeout seconds
+        """
+
+    async def async_close(self) -> None:
+        """ Release what the transport holds open """
+
+        return None
+
+
+class AiohttpTransport(Transport):
+    """ Transport sending requests over an aiohttp ClientSession """
+
+    def __init__(self, session: ClientSession | None = None) -> None:
+        """
+        session: aiohttp.ClientSession or None to create a new session, which async_close closes
+        """
+        self._owns_session: bool = session is None
+        self.session: ClientSession = session if session else ClientSession()
+
+    async def async_post(self, url: str, headers: dict[str, str], data: bytes, timeout: float) -> TransportResponse:
+        async with self.session.post(url, headers=headers, data=data, timeout=ClientTimeout(total=timeout)) as resp:
+            return TransportResponse(resp.status, await resp.read(), resp.cookies)
+
+    async def async_close(self) -> None:
+        if self._owns_session:
+            await self.session.close()
+        return None
+
+
+class InMemoryTransport(Transport):
+    """
+    Transport answering requests in process, without a network. Every operation is dispatched by its
+    operationName to a handler called with the variables of the operation. A handler returns the
+    response of the operation, a dict with data or errors, or an awaitable of it, which is given the
+    timeout of the request. It can also return a TransportResponse, which answers the whole request,
+    to simulate a request failing. Operations without a handler are answered with an error.
+    """
+
+    def __init__(
+            self, handlers: dict[str, Handler] | None = None,
+            cookies: dict[str, str] | None = None,
+            codec: JsonCodec | None = None
+    ) -> None:
+        """
+        handlers: Handler of every operationName
+        cookies: Cookies set by every response, or None to set a session cookie
+        codec: JsonCodec requests are decoded and responses encoded with, or None to use the fastest one installed
+        """
+        self.handlers: dict[str, Handler] = dict(handlers) if handlers else {}
+        self.cookies: dict[str, str] = cookies if cookies is not None else {'connect.sid': 'in-memory'}
+        self.codec: JsonCodec = codec if codec else DEFAULT_CODEC
+        self.requests: int = 0
+        self.operations: Counter = Counter()
+
+    def register(self, name: str, handler: Handler) -> None:
+        """ Answer an operationName with a handler """
+
+        self.handlers[name] = handler
+        return None
+
+    async def async_post(self, url: str, headers: dict[str, str], data: bytes, timeout: float) -> TransportResponse:
+        self.requests += 1
+        payload = self.codec.decode(data)
+        answers = []
+        for operation in payload if isinstance(payload, list) else [payload]:
+            name = operation.get('operationName')
+            self.operations[name] += 1
+            handler = self.handlers.get(name)
+            if handler is None:
+                answers.append({'errors': [{'message': f'Unknown operation {name}'}]})
+                continue
+            answer = handler(operation.get('variables') or {})
+            if inspect.isawaitable(answer):
+                answer = await asyncio.wait_for(answer, timeout)
+            if isinstance(answer, TransportResponse):
+                return answer
+            answers.append(answer)
+        cookies = SimpleCookie()
+        cookies.load(self.cookies)
+        return TransportResponse(200, self.codec.encode(answers if isinstance(payload, list) else answers[0]), cookies)
+
+
+@dataclass
+class Exchange:
+    """
+    Dataclass for a recorded request and its response.
+    The request is kept as a digest of its body, so that a recording holds no password.
+    """
+
+    operations: list[str]
+    request: str
+    status: int
+    body: bytes
+    cookies: dict[str, str] = field(default_factory=dict)
+
+
+def _operation_names(data: bytes) -> list[str]:
+    """ operationNames of the operations of a request """
+
+    payload = json.loads(data)
+    return [operation.get('operationName') for operation in (payload if isinstance(payload, list) else [payload])]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_recording(path: str | os.PathLike) -> list[Exchange]:
+    """ Read the exchanges of a recording file """
+
+    with open(path, encoding='utf-8') as file:
+        recording = json.load(file)
+    # Bodies are stored as text, with the bytes that aren't UTF-8 escaped so that they are restored as they were
+    return [
+        Exchange(**dict(exchange, body=exchange['body'].encode('utf-8', 'surrogateescape')))
+        for exchange in recording
+    ]
+
+
+def write_recording(path: str | os.PathLike, exchanges: Iterable[Exchange]) -> None:
+    """ Write exchanges to a recording file only readable by its owner, replacing it atomically """
+
+    recording = [
+        dict(asdict(exchange), body=exchange.body.decode('utf-8', 'surrogateescape')) for exchange in exchanges
+    ]
+    atomic_write_json(path, recording, indent=1)
+    return None
+
+
+class RecordingTransport(Transport):
+    """
+    Transport recording the requests sent through another transport and their responses.
+    The recording is written to its file by async_save and async_close. It holds the token
+    and the data of the account, and is only readable by its owner.
+    """
+
+    def __init__(self, transport: Transport, path: str | os.PathLike) -> None:
+        """
+        transport: Transport the requests are sent through
+        path: Path of the recording file
+        """
+        self.transport: Transport = transport
+        self.path: str = os.fspath(path)
+        self.exchanges: list[Exchange] = []
+
+    async def async_post(self, url: str, headers: dict[str, str], data: bytes, timeout: float) -> TransportResponse:
+        response = await self.transport.async_post(url, headers, data, timeout)
+        self.exchanges.append(Exchange(
+            _operation_names(data), _digest(data), response.status, response.body,
+            {key: morsel.value for key, morsel in response.cookies.items()}
+        ))
+        return response
+
+    async def async_save(self) -> None:
+        """ Write the exchanges recorded so far to the recording file """
+
+        await asyncio.get_running_loop().run_in_executor(None, write_recording, self.path, list(self.exchanges))
+        return None
+
+    async def async_close(self) -> None:
+        """ Save the recording and close the transport the requests were sent through """
+
+        await self.async_save()
+        await self.transport.async_close()
+        return None
+
+
+class ReplayTransport(Transport):
+    """
+    Transport answering requests with the responses of a recording, byte for byte.
+    A request is answered by the responses recorded for the same request body in turn,
+    or when the body differs, for example because of a new date, by those recorded for
+    the same operations. Once every response of a request was replayed, they are
+    replayed again from the first, so that a recording can be polled indefinitely.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None, exchanges: Iterable[Exchange] | None = None) -> None:
+        """
+        path: Path of the recording file, read on the first request
+        exchanges: Exchanges to replay instead of those of a file
+        """
+        if (path is None) == (exchanges is None):
+            raise LavviebotError('ReplayTransport needs either a recording path or exchanges')
+        self.path: str | None = os.fspath(path) if path is not None else None
+        self.requests: int = 0
+        self._by_request: dict[str, deque[Exchange]] | None = None
+        self._by_operations: dict[tuple[str, ...], deque[Exchange]] = {}
+        if exchanges is not None:
+            self._index(exchanges)
+
+    async def async_post(self, url: str, headers: dict[str, str], data: bytes, timeout: float) -> TransportResponse:
+        if self._by_request is None:
+            exchanges = await asyncio.get_running_loop().run_in_executor(None, read_recording, self.path)
+            if self._by_request is None:
+                self._index(exchanges)
+        self.requests += 1
+        queue = self._by_request.get(_digest(data)) or self._by_operations.get(tuple(_operation_names(data)))
+        if not queue:
+            raise LavviebotError(f'No recorded response to {_operation_names(data)}')
+        exchange = queue[0]
+        queue.rotate(-1)
+        cookies = SimpleCookie()
+        cookies.load(exchange.cookies)
+        return TransportResponse(exchange.status, exchange.body, cookies)
+
+    def _index(self, exchanges: Iterable[Exchange]) -> None:
+        """ Queue the exchanges by request body and by operations, in the order they were recorded """
+
+        self._by_request = {}
+        for exchange in exchanges:
+            self._by_request.setdefault(exchange.request, deque()).append(exchange)
+            self._by_operations.setdefault(tuple(exchange.operations), deque()).append(exchange)
+        return None
@@ -18,6 +18,10 @@ setuptools.setup(
     install_requires=[
         "aiohttp>=3.8.1",
     ],
+    extras_require={
+        "orjson": ["orjson>=3.6"],
+        "msgspec": ["msgspec>=0.18"],
+    },
     classifiers=(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
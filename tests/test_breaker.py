@@ -0,0 +1,135 @@
+""" Tests of the circuit breaker failing requests fast while the PurrSong API is unavailable """
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from lavviebot import (BreakerState, CircuitBreaker, InMemoryTransport, LavviebotCircuitOpen, LavviebotClient,
+                       LavviebotServerError, RequestScheduler)
+from lavviebot.transport import TransportResponse
+
+DEVICE_DETAILS = {'data': {'getIotDetail': {'iotCodeTail': '1', 'latestFirmwareVersion': '1.0'}}}
+OPEN_DURATION = 0.05
+
+
+class Scanner:
+    """ Handler of GetLavvieScannerDetails failing with a server error, or answering after a delay """
+
+    def __init__(self) -> None:
+        self.failing: bool = True
+        self.delay: float = 0.0
+
+    async def __call__(self, variables):
+        await asyncio.sleep(self.delay)
+        if self.failing:
+            return TransportResponse(502, b'{"errors": [{"message": "Bad gateway"}]}')
+        return DEVICE_DETAILS
+
+
+def client(breaker: CircuitBreaker) -> tuple[LavviebotClient, InMemoryTransport, Scanner, list]:
+    """ Logged in client behind a breaker, and the transitions of the breaker """
+
+    scanner = Scanner()
+    transport = InMemoryTransport({'GetLavvieScannerDetails': scanner})
+    lavviebot = LavviebotClient(
+        'email', 'password', transport=transport, breaker=breaker, max_transient_retries=0,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+    )
+    lavviebot.token = 'token'
+    transitions: list = []
+    breaker.add_listener(lambda previous, state: transitions.append(state))
+    return lavviebot, transport, scanner, transitions
+
+
+async def fail(lavviebot: LavviebotClient, requests: int) -> None:
+    for _ in range(requests):
+        with pytest.raises(LavviebotServerError):
+            await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+
+
+def test_breaker_opens_and_fails_fast_without_sending():
+    async def run():
+        breaker = CircuitBreaker(min_requests=4, failure_rate=0.5, open_duration=OPEN_DURATION)
+        lavviebot, transport, scanner, transitions = client(breaker)
+        await fail(lavviebot, 3)
+        assert breaker.state is BreakerState.CLOSED
+        await fail(lavviebot, 1)
+        assert breaker.state is BreakerState.OPEN
+        assert transitions == [BreakerState.OPEN]
+
+        with pytest.raises(LavviebotCircuitOpen):
+            await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        assert transport.requests == 4
+        assert breaker.stats.rejected == 1
+        assert 0 < breaker.retry_after <= OPEN_DURATION
+
+    asyncio.run(run())
+
+
+def test_half_open_breaker_closes_once_its_probes_succeed():
+    async def run():
+        breaker = CircuitBreaker(min_requests=1, open_duration=OPEN_DURATION, half_open_requests=2)
+        lavviebot, transport, scanner, transitions = client(breaker)
+        await fail(lavviebot, 1)
+        await asyncio.sleep(OPEN_DURATION)
+        assert breaker.state is BreakerState.HALF_OPEN
+
+        scanner.failing = False
+        await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        assert breaker.state is BreakerState.HALF_OPEN
+        await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        assert breaker.state is BreakerState.CLOSED
+        assert transitions == [BreakerState.OPEN, BreakerState.HALF_OPEN, BreakerState.CLOSED]
+
+    asyncio.run(run())
+
+
+def test_half_open_breaker_only_lets_its_probes_through():
+    async def run():
+        breaker = CircuitBreaker(min_requests=1, open_duration=OPEN_DURATION, half_open_requests=1)
+        lavviebot, transport, scanner, transitions = client(breaker)
+        await fail(lavviebot, 1)
+        await asyncio.sleep(OPEN_DURATION)
+        scanner.failing = False
+        scanner.delay = 0.02
+        probe, rejected = await asyncio.gather(
+            lavviebot.async_get_iot_device_status(1, 'lavvie_scanner'),
+            lavviebot.async_get_iot_device_status(2, 'lavvie_scanner'),
+            return_exceptions=True
+        )
+        assert probe == DEVICE_DETAILS
+        assert isinstance(rejected, LavviebotCircuitOpen)
+        assert transport.requests == 2
+        assert breaker.state is BreakerState.CLOSED
+
+    asyncio.run(run())
+
+
+def test_failed_probe_opens_the_breaker_for_twice_as_long():
+    async def run():
+        breaker = CircuitBreaker(min_requests=1, open_duration=OPEN_DURATION)
+        lavviebot, transport, scanner, transitions = client(breaker)
+        await fail(lavviebot, 1)
+        await asyncio.sleep(OPEN_DURATION)
+        await fail(lavviebot, 1)
+        assert breaker.state is BreakerState.OPEN
+        assert OPEN_DURATION < breaker.retry_after <= 2 * OPEN_DURATION
+        assert transitions == [BreakerState.OPEN, BreakerState.HALF_OPEN, BreakerState.OPEN]
+        assert breaker.stats.opened == 2
+
+    asyncio.run(run())
+
+
+def test_slow_answers_open_the_breaker():
+    async def run():
+        breaker = CircuitBreaker(min_requests=2, slow_call_duration=0.01, slow_call_rate=1.0)
+        lavviebot, transport, scanner, transitions = client(breaker)
+        scanner.failing = False
+        scanner.delay = 0.02
+        for _ in range(2):
+            await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        assert breaker.state is BreakerState.OPEN
+        assert (breaker.stats.failure_rate, breaker.stats.slow_call_rate) == (0.0, 1.0)
+
+    asyncio.run(run())
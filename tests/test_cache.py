@@ -0,0 +1,130 @@
+""" Tests of the response cache serving fresh, stale and fallback responses """
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from lavviebot import (CircuitBreaker, InMemoryTransport, LavviebotCircuitOpen, LavviebotClient, LavviebotServerError,
+                       RequestScheduler, ResponseCache)
+from lavviebot.transport import TransportResponse
+
+TTL = 0.05
+
+
+def details(version: int) -> dict:
+    return {'data': {'getIotDetail': {'iotCodeTail': '1', 'latestFirmwareVersion': str(version)}}}
+
+
+class Scanner:
+    """ Handler of GetLavvieScannerDetails answering with a new firmware version every time, after a delay """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay: float = delay
+        self.version: int = 0
+        self.failing: bool = False
+
+    async def __call__(self, variables):
+        await asyncio.sleep(self.delay)
+        if self.failing:
+            return TransportResponse(502, b'{"errors": [{"message": "Bad gateway"}]}')
+        self.version += 1
+        return details(self.version)
+
+
+def client(cache: ResponseCache, handler: Scanner, **options) -> tuple[LavviebotClient, InMemoryTransport]:
+    """ Logged in client whose LavvieScanner status requests are answered by a handler """
+
+    transport = InMemoryTransport({'GetLavvieScannerDetails': handler})
+    lavviebot = LavviebotClient(
+        'email', 'password', transport=transport, cache=cache, max_transient_retries=0,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000), **options
+    )
+    lavviebot.token = 'token'
+    return lavviebot, transport
+
+
+def version(response: dict) -> str:
+    return response['data']['getIotDetail']['latestFirmwareVersion']
+
+
+def test_fresh_response_is_served_from_the_cache():
+    async def run():
+        cache = ResponseCache(ttls={'GetLavvieScannerDetails': 60})
+        lavviebot, transport = client(cache, Scanner())
+        first = await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        second = await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        assert second is first
+        assert transport.requests == 1
+        assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    asyncio.run(run())
+
+
+def test_least_recently_used_response_is_evicted():
+    async def run():
+        cache = ResponseCache(ttls={'GetLavvieScannerDetails': 60}, max_entries=2)
+        lavviebot, transport = client(cache, Scanner())
+        for iot_id in (1, 2, 1, 3, 1):
+            await lavviebot.async_get_iot_device_status(iot_id, 'lavvie_scanner')
+        assert transport.requests == 3
+        assert cache.stats.evictions == 1
+        await lavviebot.async_get_iot_device_status(2, 'lavvie_scanner')
+        assert transport.requests == 4
+
+    asyncio.run(run())
+
+
+def test_stale_response_is_served_while_it_is_refreshed():
+    async def run():
+        cache = ResponseCache(ttls={'GetLavvieScannerDetails': TTL}, stale_while_revalidate=60)
+        lavviebot, transport = client(cache, Scanner(delay=0.02))
+        assert version(await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')) == '1'
+        await asyncio.sleep(TTL)
+        assert version(await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')) == '1'
+        assert cache.stats.stale_hits == 1
+        # Stale hits while the refresh runs don't start another one
+        await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        await asyncio.sleep(0.05)
+        assert transport.requests == 2
+        assert version(await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')) == '2'
+
+    asyncio.run(run())
+
+
+def test_refresh_outlives_the_deadline_of_the_poll_it_started_in():
+    async def run():
+        cache = ResponseCache(ttls={'GetLavvieScannerDetails': TTL}, stale_while_revalidate=60)
+        lavviebot, transport = client(cache, Scanner(delay=0.1))
+        await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        await asyncio.sleep(TTL)
+        with lavviebot.deadline(0.02):
+            assert version(await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')) == '1'
+        await asyncio.sleep(0.15)
+        assert transport.requests == 2
+        assert version(await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')) == '2'
+
+    asyncio.run(run())
+
+
+def test_expired_response_is_served_while_the_breaker_is_open():
+    async def run():
+        cache = ResponseCache(ttls={'GetLavvieScannerDetails': TTL}, stale_if_error=0.2)
+        scanner = Scanner()
+        breaker = CircuitBreaker(min_requests=1, open_duration=60)
+        lavviebot, transport = client(cache, scanner, breaker=breaker)
+        await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        await asyncio.sleep(TTL)
+        scanner.failing = True
+        with pytest.raises(LavviebotServerError):
+            await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+        assert breaker.stats.opened == 1
+
+        assert version(await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')) == '1'
+        assert cache.stats.fallback_hits == 1
+        assert transport.requests == 2
+        await asyncio.sleep(0.2)
+        with pytest.raises(LavviebotCircuitOpen):
+            await lavviebot.async_get_iot_device_status(12, 'lavvie_scanner')
+
+    asyncio.run(run())
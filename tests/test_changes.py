@@ -0,0 +1,104 @@
+""" Tests of the devices whose status failed being carried over by TieredPoller and ChangeTracker """
+from __future__ import annotations
+
+import asyncio
+
+from benchmarks.standin import PurrSongStandIn, StandInConfig
+from lavviebot import (ChangeTracker, ChangeType, InMemoryTransport, LavviebotClient, PollingIntervals,
+                       RequestScheduler, TieredPoller)
+
+CONFIG = StandInConfig(litter_boxes=2, unknown_cat=False)
+
+
+class UsageLog:
+    """ Handler of GetIotPoopRecord answering with a malformed response for litter box 2 while it's broken """
+
+    def __init__(self, handler) -> None:
+        self.handler = handler
+        self.broken: bool = False
+
+    def __call__(self, variables):
+        if self.broken and variables['data']['iotId'] == 2:
+            return {'data': {'getIotPoopRecord': None}}
+        return self.handler(variables)
+
+
+def client() -> tuple[LavviebotClient, UsageLog, list]:
+    """ Logged in client of a stand-in account tracking changes, its usage log handler and the change events """
+
+    handlers = PurrSongStandIn(CONFIG).handlers()
+    usage_log = UsageLog(handlers['GetIotPoopRecord'])
+    handlers['GetIotPoopRecord'] = usage_log
+    lavviebot = LavviebotClient(
+        'email', 'password', transport=InMemoryTransport(handlers), max_transient_retries=0,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000), changes=ChangeTracker()
+    )
+    lavviebot.token = 'token'
+    events: list = []
+    lavviebot.changes.subscribe(events.append)
+    return lavviebot, usage_log, events
+
+
+def litter_box_2(events: list) -> list[ChangeType]:
+    return [event.change_type for event in events if event.section == 'litterboxes' and event.entity_id == 2]
+
+
+def test_poller_keeps_the_previous_state_of_a_failed_device():
+    async def run():
+        lavviebot, usage_log, events = client()
+        poller = TieredPoller(lavviebot, PollingIntervals(roster=0, litterboxes=0, lavvie_scanners=0,
+                                                         lavvie_tags=0, cats=0))
+        first = await poller.async_poll()
+        assert litter_box_2(events) == [ChangeType.ADDED]
+
+        usage_log.broken = True
+        events.clear()
+        second = await poller.async_poll()
+        assert second.failed == {'litterboxes': {2}}
+        assert second.litterboxes[2] is first.litterboxes[2]
+        assert litter_box_2(events) == []
+
+        usage_log.broken = False
+        events.clear()
+        third = await poller.async_poll()
+        assert third.failed == {}
+        assert third.litterboxes[2] is not first.litterboxes[2]
+        assert ChangeType.ADDED not in litter_box_2(events)
+
+    asyncio.run(run())
+
+
+def test_tracker_does_not_remove_a_failed_device():
+    async def run():
+        lavviebot, usage_log, events = client()
+        await lavviebot.async_get_data()
+
+        usage_log.broken = True
+        events.clear()
+        data = await lavviebot.async_get_data()
+        assert list(data.litterboxes) == [1]
+        assert data.failed == {'litterboxes': {2}}
+        assert litter_box_2(events) == []
+        assert 2 in lavviebot.changes.previous.litterboxes
+
+        usage_log.broken = False
+        events.clear()
+        await lavviebot.async_get_data()
+        assert ChangeType.ADDED not in litter_box_2(events)
+
+    asyncio.run(run())
+
+
+def test_device_missing_without_failing_is_removed():
+    async def run():
+        lavviebot, usage_log, events = client()
+        previous = await lavviebot.async_get_data()
+        data = type(previous)(
+            litterboxes={1: previous.litterboxes[1]}, lavvie_scanners=previous.lavvie_scanners,
+            lavvie_tags=previous.lavvie_tags, cats=previous.cats
+        )
+        events.clear()
+        lavviebot.changes.update(data)
+        assert litter_box_2(events) == [ChangeType.REMOVED]
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+""" Tests of the JSON codecs requests are encoded and responses decoded with """
+from __future__ import annotations
+
+import pytest
+
+from lavviebot import JsonCodec, LavviebotError, MsgspecCodec, OrjsonCodec, StdlibJsonCodec
+
+RESPONSE = {'data': {'getIotDetail': {'iotCodeTail': 'AB12', 'nickname': '고양이', 'battery': 87.5, 'pet': None}}}
+
+
+def installed() -> list[JsonCodec]:
+    codecs: list = [StdlibJsonCodec()]
+    for codec_type in (OrjsonCodec, MsgspecCodec):
+        try:
+            codecs.append(codec_type())
+        except LavviebotError:
+            pass
+    return codecs
+
+
+def test_incomplete_codec_fails_when_instantiated():
+    class EncodeOnly(JsonCodec):
+        def encode(self, value):
+            return b''
+
+    with pytest.raises(TypeError):
+        EncodeOnly()
+
+
+@pytest.mark.parametrize('codec', installed(), ids=repr)
+def test_codec_round_trips_compact_utf8(codec):
+    encoded = codec.encode(RESPONSE)
+    assert b': ' not in encoded and b', ' not in encoded
+    assert codec.decode(encoded) == RESPONSE
+    assert codec.decode('[{"a":"é"}]'.encode()) == [{'a': 'é'}]
+
+
+@pytest.mark.parametrize('codec', installed(), ids=repr)
+def test_malformed_json_raises_value_error(codec):
+    with pytest.raises(ValueError):
+        codec.decode(b'{"data": ')
@@ -0,0 +1,32 @@
+""" Tests of the credential stores restoring a login """
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from lavviebot import CredentialStore, Credentials, FileCredentialStore, MemoryCredentialStore
+
+CREDENTIALS = Credentials(cookie={'connect.sid': 'cookie'}, token='token', user_id=1, has_cat=True)
+
+
+def test_incomplete_store_fails_when_instantiated():
+    class LoadOnly(CredentialStore):
+        async def async_load(self, email):
+            return None
+
+    with pytest.raises(TypeError):
+        LoadOnly()
+
+
+@pytest.mark.parametrize('store', ['memory', 'file'])
+def test_credentials_are_saved_and_cleared(store, tmp_path):
+    async def run():
+        credentials = MemoryCredentialStore() if store == 'memory' else FileCredentialStore(tmp_path / 'credentials.json')
+        assert await credentials.async_load('email') is None
+        await credentials.async_save('email', CREDENTIALS)
+        assert await credentials.async_load('email') == CREDENTIALS
+        await credentials.async_clear('email')
+        assert await credentials.async_load('email') is None
+
+    asyncio.run(run())
@@ -0,0 +1,35 @@
+""" Tests of the atomic JSON writes shared by the credential stores and the recording transport """
+from __future__ import annotations
+
+import json
+import os
+import stat
+from unittest import mock
+
+from lavviebot._files import atomic_write_json
+
+
+def test_file_is_replaced_only_readable_by_its_owner(tmp_path):
+    path = tmp_path / 'credentials.json'
+    path.write_text('{"old": true}')
+    atomic_write_json(path, {'email': {'token': 'token'}}, indent=1)
+    assert json.loads(path.read_text()) == {'email': {'token': 'token'}}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ['credentials.json']
+
+
+def test_file_and_directory_are_flushed(tmp_path):
+    with mock.patch('lavviebot._files.os.fsync', wraps=os.fsync) as fsync:
+        atomic_write_json(tmp_path / 'recording.json', [])
+    assert fsync.call_count == 2
+
+
+def test_failed_write_leaves_the_file_and_no_temporary_file(tmp_path):
+    path = tmp_path / 'credentials.json'
+    path.write_text('{"old": true}')
+    try:
+        atomic_write_json(path, {'not serializable': object()})
+    except TypeError:
+        pass
+    assert json.loads(path.read_text()) == {'old': True}
+    assert os.listdir(tmp_path) == ['credentials.json']
@@ -0,0 +1,45 @@
+""" Tests of the readings written by HistoryStore """
+from __future__ import annotations
+
+from datetime import datetime
+
+import asyncio
+
+from benchmarks.standin import PurrSongStandIn, StandInConfig
+from lavviebot import (CAT_METRICS, LITTER_BOX_METRICS, HistoryStore, InMemoryTransport, LavviebotClient,
+                       LavviebotData, RequestScheduler)
+
+
+async def snapshot() -> LavviebotData:
+    """ Snapshot of a stand-in account with a litter box and a cat """
+
+    lavviebot = LavviebotClient(
+        'email', 'password', transport=InMemoryTransport(PurrSongStandIn(StandInConfig()).handlers()),
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+    )
+    lavviebot.token = 'token'
+    return await lavviebot.async_get_data()
+
+
+def test_duplicate_readings_are_not_counted_as_written(tmp_path):
+    async def run():
+        data = await snapshot()
+        readings = len(data.litterboxes) * len(LITTER_BOX_METRICS) + len(data.cats) * len(CAT_METRICS)
+        store = HistoryStore(str(tmp_path / 'history.db'))
+        recorded = datetime.now().astimezone()
+        store.record(data, timestamp=recorded)
+        await store.async_flush()
+        assert store.written == readings
+
+        # The same statuses recorded at the same time again are already stored
+        store.record(data, timestamp=recorded)
+        await store.async_flush()
+        assert store.written == readings
+
+        # Litter box readings are keyed by the time they were taken, cat readings by the time they were recorded
+        store.record(data)
+        await store.async_flush()
+        assert store.written == readings + len(data.cats) * len(CAT_METRICS)
+        await store.async_close()
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+""" Tests of the per-operation metrics recorded by Instrumentation """
+from __future__ import annotations
+
+import asyncio
+
+from lavviebot import InMemoryTransport, Instrumentation, InstrumentationHook, LavviebotClient, RequestScheduler
+from lavviebot.instrumentation import element_sizes
+
+DEVICE_DETAILS = {'data': {'getIotDetail': {'iotCodeTail': '1', 'latestFirmwareVersion': '1.0'}}}
+USAGE_LOG = {'data': {'getIotPoopRecord': {'catUsageHistory': [
+    {'nickname': f'Cat {index}', 'creationTime': '1717200000000', 'duration': 60} for index in range(50)
+]}}}
+ERROR_LOG = {'data': {'getIotErrorLog': {'errorLogs': []}}}
+
+
+class Requests(InstrumentationHook):
+    def __init__(self) -> None:
+        self.records: list = []
+
+    def on_request(self, record) -> None:
+        self.records.append(record)
+
+
+def test_batched_response_bytes_are_measured_per_operation():
+    async def run():
+        transport = InMemoryTransport({
+            'GetLavviebotDetails': lambda variables: DEVICE_DETAILS,
+            'GetIotPoopRecord': lambda variables: USAGE_LOG,
+            'GetIotErrorLog': lambda variables: ERROR_LOG,
+        })
+        requests = Requests()
+        instrumentation = Instrumentation(hooks=[requests])
+        lavviebot = LavviebotClient(
+            'email', 'password', transport=transport, instrumentation=instrumentation,
+            scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+        )
+        lavviebot.token = 'token'
+        await lavviebot.async_get_litter_box_status(12)
+
+        sizes = {name: len(transport.codec.encode(response)) for name, response in (
+            ('GetLavviebotDetails', DEVICE_DETAILS), ('GetIotPoopRecord', USAGE_LOG), ('GetIotErrorLog', ERROR_LOG)
+        )}
+        assert {name: stats.response_bytes for name, stats in instrumentation.operations.items()} == sizes
+        assert all(stats.batched_requests == 1 for stats in instrumentation.operations.values())
+        record, = requests.records
+        assert record.response_bytes == sum(sizes.values()) + 4
+
+    asyncio.run(run())
+
+
+def test_element_sizes_skip_brackets_in_strings():
+    body = b'[{"data": {"name": "a ]} [{ \\" b"}} , {"errors": [{"message": "\\\\"}]}]\n'
+    assert element_sizes(body) == [len(b'{"data": {"name": "a ]} [{ \\" b"}}'), len(b'{"errors": [{"message": "\\\\"}]}')]
+    assert element_sizes(b'{"data": null}') == []
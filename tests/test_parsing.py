@@ -0,0 +1,77 @@
+""" Tests of async_get_data parsing every device and cat on its own """
+from __future__ import annotations
+
+import asyncio
+
+from benchmarks.standin import PurrSongStandIn, StandInConfig
+from lavviebot import InMemoryTransport, LavviebotClient, RequestScheduler
+
+
+def client(config: StandInConfig, **overrides) -> LavviebotClient:
+    """ Client of a stand-in account, with some operations answered by other handlers """
+
+    handlers = PurrSongStandIn(config).handlers()
+    handlers.update(overrides)
+    return LavviebotClient(
+        'email', 'password', transport=InMemoryTransport(handlers), max_transient_retries=0,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+    )
+
+
+def test_malformed_litter_box_is_failed_alone():
+    async def run():
+        handlers = PurrSongStandIn(StandInConfig(litter_boxes=2)).handlers()
+        usage_log = handlers['GetIotPoopRecord']
+
+        def poop_record(variables):
+            if variables['data']['iotId'] == 2:
+                return {'data': {'getIotPoopRecord': None}}
+            return usage_log(variables)
+
+        data = await client(StandInConfig(litter_boxes=2), GetIotPoopRecord=poop_record).async_get_data()
+        assert list(data.litterboxes) == [1]
+        assert data.failed == {'litterboxes': {2}}
+        assert data.lavvie_scanners and data.lavvie_tags and data.cats
+
+    asyncio.run(run())
+
+
+def test_malformed_cat_is_failed_alone():
+    async def run():
+        handlers = PurrSongStandIn(StandInConfig(cats=2, lavvie_tags=2)).handlers()
+        health = handlers['GetCatHealthInfo']
+
+        def cat_health(variables):
+            response = health(variables)
+            if variables['petId'] == 2:
+                return {'data': dict(response['data'], todayActivity=[None])}
+            return response
+
+        data = await client(StandInConfig(cats=2, lavvie_tags=2), GetCatHealthInfo=cat_health).async_get_data()
+        assert 1 in data.cats and 2 not in data.cats
+        assert data.failed == {'cats': {2}}
+        assert len(data.litterboxes) == 1
+
+    asyncio.run(run())
+
+
+def test_invalid_value_is_failed_alone():
+    async def run():
+        handlers = PurrSongStandIn(StandInConfig(lavvie_scanners=2)).handlers()
+        details = handlers['GetLavvieScannerDetails']
+
+        def scanner_details(variables):
+            response = details(variables)
+            if variables['data']['iotId'] % 2 == 0:
+                detail = response['data']['getIotDetail']
+                scanner = dict(detail['lavvieScanner'], recentLavvieScannerLog={'creationTime': 'never'})
+                return {'data': {'getIotDetail': dict(detail, lavvieScanner=scanner)}}
+            return response
+
+        data = await client(
+            StandInConfig(lavvie_scanners=2), GetLavvieScannerDetails=scanner_details
+        ).async_get_data()
+        assert len(data.lavvie_scanners) == 1
+        assert len(data.failed['lavvie_scanners']) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+""" Tests of the client pool polling many accounts in rotating order behind a shared breaker """
+from __future__ import annotations
+
+import asyncio
+
+from benchmarks.standin import PurrSongStandIn, StandInConfig
+from lavviebot import (CircuitBreaker, InMemoryTransport, LavviebotCircuitOpen, LavviebotClientPool, LavviebotData,
+                       RequestScheduler)
+from lavviebot.transport import TransportResponse
+
+ACCOUNTS = ['a', 'b', 'c', 'd']
+
+
+def server_error(variables):
+    return TransportResponse(502, b'{"errors": [{"message": "Bad gateway"}]}')
+
+
+def pool(failing: set[str] = frozenset(), **options) -> tuple[LavviebotClientPool, dict[str, InMemoryTransport]]:
+    """ Pool of logged in stand-in accounts, the failing ones answering every query with a server error """
+
+    lavviebot_pool = LavviebotClientPool(**options)
+    transports: dict = {}
+    for email in ACCOUNTS:
+        handlers = PurrSongStandIn(StandInConfig()).handlers()
+        if email in failing:
+            handlers = {name: server_error for name in handlers}
+        transports[email] = InMemoryTransport(handlers)
+        client = lavviebot_pool.add_account(
+            email, 'password', transport=transports[email], max_transient_retries=0,
+            scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+        )
+        client.token = 'token'
+    return lavviebot_pool, transports
+
+
+def test_every_round_starts_with_the_next_account():
+    async def run():
+        lavviebot_pool, transports = pool(max_concurrent_polls=1)
+        rounds: list = []
+        for _ in range(len(ACCOUNTS) + 1):
+            order: list = []
+            results = await lavviebot_pool.async_poll_all(lambda email, result: order.append(email))
+            assert all(isinstance(result, LavviebotData) for result in results.values())
+            rounds.append(order)
+        await lavviebot_pool.async_close()
+        assert rounds == [
+            ['a', 'b', 'c', 'd'], ['b', 'c', 'd', 'a'], ['c', 'd', 'a', 'b'], ['d', 'a', 'b', 'c'],
+            ['a', 'b', 'c', 'd'],
+        ]
+        assert lavviebot_pool.stats.polls == 5 * len(ACCOUNTS)
+
+    asyncio.run(run())
+
+
+def test_polls_in_flight_are_bounded():
+    async def run():
+        lavviebot_pool, transports = pool(max_concurrent_polls=2)
+        in_flight: list = []
+
+        def callback(email, result):
+            in_flight.append(lavviebot_pool.in_flight)
+
+        results = await lavviebot_pool.async_poll_all(callback)
+        await lavviebot_pool.async_close()
+        assert set(results) == set(ACCOUNTS)
+        assert max(in_flight) <= 1
+        assert lavviebot_pool.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_failed_account_does_not_fail_the_round():
+    async def run():
+        lavviebot_pool, transports = pool(failing={'b'}, max_concurrent_polls=1)
+        results = await lavviebot_pool.async_poll_all()
+        await lavviebot_pool.async_close()
+        assert isinstance(results['b'], Exception)
+        assert all(isinstance(results[email], LavviebotData) for email in ('a', 'c', 'd'))
+        assert lavviebot_pool.stats.failed_polls == 1
+
+    asyncio.run(run())
+
+
+def test_rounds_are_skipped_while_the_shared_breaker_is_open():
+    async def run():
+        breaker = CircuitBreaker(min_requests=1, open_duration=60)
+        lavviebot_pool, transports = pool(failing={'a'}, max_concurrent_polls=1, breaker=breaker)
+        assert all(client.breaker is breaker for client in lavviebot_pool.clients.values())
+        first = await lavviebot_pool.async_poll_all()
+        # The failure of the first account opened the breaker of every account
+        assert breaker.stats.opened == 1
+        assert all(isinstance(first[email], LavviebotCircuitOpen) for email in ('b', 'c', 'd'))
+        sent = {email: transport.requests for email, transport in transports.items()}
+        polls = lavviebot_pool.stats.polls
+
+        skipped: list = []
+        second = await lavviebot_pool.async_poll_all(lambda email, result: skipped.append(email))
+        await lavviebot_pool.async_close()
+        assert all(isinstance(result, LavviebotCircuitOpen) for result in second.values())
+        assert sorted(skipped) == ACCOUNTS
+        assert {email: transport.requests for email, transport in transports.items()} == sent
+        assert lavviebot_pool.stats.polls == polls
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+""" Tests of the limit learned by RequestScheduler from rate-limit responses """
+from __future__ import annotations
+
+import asyncio
+from unittest import mock
+
+import pytest
+
+from lavviebot import RequestScheduler
+
+
+class Clock:
+    """ Monotonic clock of the scheduler, moved forward by the tests """
+
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with mock.patch('lavviebot.scheduler.time.monotonic', clock):
+        yield clock
+
+
+def send(scheduler: RequestScheduler, requests: int) -> None:
+    """ Acquire a token for a number of requests, at the current time of the clock """
+
+    async def run():
+        for _ in range(requests):
+            await scheduler.async_acquire()
+            scheduler.on_success()
+
+    asyncio.run(run())
+
+
+def test_rate_limit_after_idle_is_not_learned(clock):
+    scheduler = RequestScheduler(rate=5, burst=10, max_rate=20)
+    send(scheduler, 1)
+    clock.now += 30
+    scheduler.on_rate_limited()
+    assert scheduler.learned_limit is None
+    assert scheduler.rate == pytest.approx(2.5, abs=0.1)
+    assert scheduler.backing_off
+
+
+def test_rate_limit_at_burst_is_learned(clock):
+    scheduler = RequestScheduler(rate=20, burst=20, max_rate=20)
+    send(scheduler, 12)
+    clock.now += 2
+    scheduler.on_rate_limited()
+    assert scheduler.learned_limit == pytest.approx(6.0)
+    assert scheduler.rate == pytest.approx(3.0)
+
+
+def test_learned_limit_is_probed_back_up(clock):
+    scheduler = RequestScheduler(rate=20, burst=20, max_rate=20)
+    send(scheduler, 12)
+    clock.now += 2
+    scheduler.on_rate_limited()
+    clock.now += RequestScheduler.WINDOW
+    scheduler.on_success()
+    assert scheduler.learned_limit == pytest.approx(6.6)
+    clock.now += 3 * RequestScheduler.WINDOW
+    scheduler.on_success()
+    assert scheduler.learned_limit == pytest.approx(6.6 * 1.1 ** 3)
+    clock.now += 20 * RequestScheduler.WINDOW
+    scheduler.on_success()
+    assert scheduler.learned_limit is None
@@ -0,0 +1,107 @@
+""" Tests of the single-flight sharing of identical queries in flight """
+from __future__ import annotations
+
+import asyncio
+import gc
+
+from lavviebot import InMemoryTransport, LavviebotClient, LavviebotError, LavviebotTimeout, RequestScheduler
+from lavviebot.transport import TransportResponse
+
+DEVICE_DETAILS = {'data': {'getIotDetail': {'iotCodeTail': '1', 'latestFirmwareVersion': '1.0'}}}
+
+
+def client(handler) -> tuple[LavviebotClient, InMemoryTransport]:
+    """ Logged in client whose litter box status requests are answered by a handler """
+
+    transport = InMemoryTransport({
+        'GetLavviebotDetails': handler,
+        'GetIotPoopRecord': lambda variables: {'data': {'getIotPoopRecord': {'catUsageHistory': []}}},
+        'GetIotErrorLog': lambda variables: {'data': {'getIotErrorLog': {'errorLogs': []}}},
+    })
+    lavviebot = LavviebotClient(
+        'email', 'password', transport=transport, max_transient_retries=0,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+    )
+    lavviebot.token = 'token'
+    return lavviebot, transport
+
+
+def slow(seconds: float, response=DEVICE_DETAILS):
+    """ Handler answering with a response after some seconds """
+
+    async def handler(variables):
+        await asyncio.sleep(seconds)
+        return response
+    return handler
+
+
+def test_concurrent_callers_share_one_request():
+    async def run():
+        lavviebot, transport = client(slow(0.05))
+        responses = await asyncio.gather(*[lavviebot.async_get_litter_box_status(12) for _ in range(5)])
+        assert transport.requests == 1
+        assert lavviebot.coalesced_requests == 4
+        assert all(response is responses[0] for response in responses)
+
+    asyncio.run(run())
+
+
+def test_concurrent_callers_share_the_exception():
+    async def run():
+        lavviebot, transport = client(slow(0.05, TransportResponse(400, b'{"errors": [{"message": "Bad request"}]}')))
+        errors = await asyncio.gather(
+            *[lavviebot.async_get_litter_box_status(12) for _ in range(3)], return_exceptions=True
+        )
+        assert transport.requests == 1
+        assert all(isinstance(error, LavviebotError) and error is errors[0] for error in errors)
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_request():
+    async def run():
+        lavviebot, transport = client(slow(0.1))
+        cancelled = asyncio.ensure_future(lavviebot.async_get_litter_box_status(12))
+        waiting = asyncio.ensure_future(lavviebot.async_get_litter_box_status(12))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        assert (await waiting)[0] == DEVICE_DETAILS
+        assert cancelled.cancelled()
+        assert transport.requests == 1
+
+    asyncio.run(run())
+
+
+def test_deadline_of_one_caller_does_not_apply_to_the_others():
+    async def run():
+        lavviebot, transport = client(slow(0.3))
+
+        async def with_deadline():
+            with lavviebot.deadline(0.05):
+                return await lavviebot.async_get_litter_box_status(12)
+
+        first, second = await asyncio.gather(
+            with_deadline(), lavviebot.async_get_litter_box_status(12), return_exceptions=True
+        )
+        assert isinstance(first, LavviebotTimeout)
+        assert second[0] == DEVICE_DETAILS
+        assert transport.requests == 1
+
+    asyncio.run(run())
+
+
+def test_failure_after_every_caller_was_cancelled_is_retrieved():
+    errors = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        lavviebot, _ = client(slow(0.05, TransportResponse(400, b'{"errors": [{"message": "Bad request"}]}')))
+        caller = asyncio.ensure_future(lavviebot.async_get_litter_box_status(12))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.1)
+        assert not lavviebot._in_flight
+        gc.collect()
+
+    asyncio.run(run())
+    assert errors == []
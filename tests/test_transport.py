@@ -0,0 +1,41 @@
+""" Tests of the transports requests are sent through """
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from lavviebot import (InMemoryTransport, LavviebotClient, RecordingTransport, ReplayTransport, RequestScheduler,
+                       Transport)
+
+DEVICE_DETAILS = {'data': {'getIotDetail': {'iotCodeTail': '1', 'latestFirmwareVersion': '1.0'}}}
+
+
+def test_incomplete_transport_fails_when_instantiated():
+    class CloseOnly(Transport):
+        async def async_close(self):
+            return None
+
+    with pytest.raises(TypeError):
+        CloseOnly()
+
+
+def test_recording_is_replayed_byte_for_byte(tmp_path):
+    async def run():
+        path = tmp_path / 'recording.json'
+        recording = RecordingTransport(InMemoryTransport({
+            'GetLavvieScannerDetails': lambda variables: DEVICE_DETAILS,
+        }), path)
+        scheduler = RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+        recorded = LavviebotClient('email', 'password', transport=recording, scheduler=scheduler)
+        recorded.token = 'token'
+        response = await recorded.async_get_iot_device_status(12, 'lavvie_scanner')
+        await recording.async_close()
+
+        replay = ReplayTransport(path)
+        replayed = LavviebotClient('email', 'password', transport=replay, scheduler=scheduler)
+        replayed.token = 'token'
+        assert await replayed.async_get_iot_device_status(12, 'lavvie_scanner') == response == DEVICE_DETAILS
+        assert replay.requests == 1
+
+    asyncio.run(run())
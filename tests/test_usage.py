@@ -0,0 +1,62 @@
+""" Tests of the usage history streamed page by page by iter_litter_box_usage """
+from __future__ import annotations
+
+import asyncio
+import contextlib
+
+from lavviebot import InMemoryTransport, LavviebotClient, RequestScheduler
+
+# Pages of usage records, every record a minute older than the previous one
+PAGES = 3
+RECORDS = 5
+
+
+def client() -> tuple[LavviebotClient, InMemoryTransport, list[int]]:
+    """ Logged in client of a litter box with PAGES pages of usage records, and the pages answered """
+
+    answered: list = []
+
+    async def poop_record(variables):
+        page = int(variables['data'].get('cursor') or 0)
+        await asyncio.sleep(0.02)
+        answered.append(page)
+        return {'data': {'getIotPoopRecord': {
+            'catUsageHistory': [
+                {'petId': 1, 'creationTime': str(1717200000000 - (page * RECORDS + index) * 60_000)}
+                for index in range(RECORDS)
+            ],
+            'nextCursor': str(page + 1) if page + 1 < PAGES else None,
+        }}}
+
+    transport = InMemoryTransport({'GetIotPoopRecord': poop_record})
+    lavviebot = LavviebotClient(
+        'email', 'password', transport=transport,
+        scheduler=RequestScheduler(rate=10_000, burst=10_000, max_rate=10_000)
+    )
+    lavviebot.token = 'token'
+    return lavviebot, transport, answered
+
+
+def test_whole_history_is_streamed():
+    async def run():
+        lavviebot, transport, answered = client()
+        records = [record async for record in lavviebot.iter_litter_box_usage(12)]
+        assert len(records) == PAGES * RECORDS
+        assert answered == list(range(PAGES))
+        assert transport.requests == PAGES
+
+    asyncio.run(run())
+
+
+def test_closed_stream_left_early_sends_no_further_request():
+    async def run():
+        lavviebot, transport, answered = client()
+        async with contextlib.aclosing(lavviebot.iter_litter_box_usage(12)) as usage:
+            async for _ in usage:
+                break
+        await asyncio.sleep(0.1)
+        assert transport.requests == 1
+        assert answered == [0]
+
+    asyncio.run(run())
+